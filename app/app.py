@@ -1,44 +1,72 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, g
 import os
 import time
-import requests
+import tempfile
+import threading
+import functools
 from dotenv import load_dotenv
 import pandas as pd
+import numpy as np
 import joblib
-from sklearn.metrics import mean_squared_error
-from tensorflow.keras.models import load_model
-from datetime import datetime
+from datetime import datetime, timedelta
 from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from aqi import POLLUTANTS, aqi_levels
+from batching import MicroBatcher
+from cache import TTLCache
+from forecast_store import PollutionForecastStore
+from features import FEATURES, SEQ_LENGTH, build_feature_matrix, extract_windows, extract_past_24_hours, target_epoch
+from prediction_cache import PredictionCache, artifact_version, window_key
+from preprocessing import Preprocessor
+from registry import LoadedModel, ModelRegistry, artifact_bytes, location_key, resident_memory
+from rolling_errors import RollingErrors
+from tracing import SamplingProfiler, Tracer, server_timing
+from runners import DEFAULT_MODEL_PATHS, import_backend, load_runner, runner_is_fork_safe
+from upstream import UpstreamClient
+
+PROCESS_START_TIME = time.time()
 
 # Define metrics
 REQUEST_COUNT = Counter("app_requests_total", "Total number of requests")
 PREDICTION_TIME = Histogram("prediction_time_seconds", "Time taken for predictions")
+PREDICTION_BATCH_TIME = Histogram("prediction_batch_time_seconds", "Time taken for each batched model call")
+PREDICTION_BATCH_SIZE = Histogram("prediction_batch_size", "Number of sequences per batched model call", buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024))
+PIPELINE_STAGE_TIME = Histogram("pipeline_stage_seconds", "Time spent in each stage of the prediction pipeline", ['stage'])
+STARTUP_TIME = Gauge("app_startup_duration_seconds", "Time from process start until the model was loaded and warmed up", multiprocess_mode='max')
+MODELS_RESIDENT = Gauge("models_resident", "Number of models loaded in memory", multiprocess_mode='livesum')
+MODELS_RESIDENT_BYTES = Gauge("models_resident_bytes", "Estimated size of the models loaded in memory", multiprocess_mode='livesum')
 
 # Define metrics for data ingestion
 DATA_INGESTION_COUNT = Counter('data_ingestion_total', 'Total number of data ingestion attempts')
 DATA_INGESTION_TIME = Histogram('data_ingestion_time_seconds', 'Time taken for data ingestion')
-DATA_INGESTION_VOLUME = Gauge('data_ingestion_volume_bytes', 'Size of data ingested in bytes')
-DATA_INGESTION_LAST_SUCCESSFUL = Gauge('data_ingestion_last_successful_timestamp', 'Timestamp of the last successful data ingestion')
+DATA_INGESTION_VOLUME = Gauge('data_ingestion_volume_bytes', 'Size of data ingested in bytes', multiprocess_mode='mostrecent')
+DATA_INGESTION_LAST_SUCCESSFUL = Gauge('data_ingestion_last_successful_timestamp', 'Timestamp of the last successful data ingestion', multiprocess_mode='max')
 DATA_INGESTION_ERROR = Counter('data_ingestion_error_total', 'Total number of data ingestion errors')
-
-# New metrics for target variables
-PREDICTION_VALUE_SO2 = Gauge('prediction_value_so2', 'Predicted value for SO2')
-PREDICTION_VALUE_NO2 = Gauge('prediction_value_no2', 'Predicted value for NO2')
-PREDICTION_VALUE_PM10 = Gauge('prediction_value_pm10', 'Predicted value for PM10')
-PREDICTION_VALUE_PM2_5 = Gauge('prediction_value_pm2_5', 'Predicted value for PM2.5')
-PREDICTION_VALUE_O3 = Gauge('prediction_value_o3', 'Predicted value for O3')
-PREDICTION_VALUE_CO = Gauge('prediction_value_co', 'Predicted value for CO')
-
-# Metrics for Mean Squared Error
-PREDICTION_MSE_SO2 = Gauge('prediction_mse_so2', 'MSE for SO2 predictions')
-PREDICTION_MSE_NO2 = Gauge('prediction_mse_no2', 'MSE for NO2 predictions')
-PREDICTION_MSE_PM10 = Gauge('prediction_mse_pm10', 'MSE for PM10 predictions')
-PREDICTION_MSE_PM2_5 = Gauge('prediction_mse_pm2_5', 'MSE for PM2.5 predictions')
-PREDICTION_MSE_O3 = Gauge('prediction_mse_o3', 'MSE for O3 predictions')
-PREDICTION_MSE_CO = Gauge('prediction_mse_co', 'MSE for CO predictions')
-
-# Start Prometheus metrics server (on port 8000)
-start_http_server(8000)
+DATA_INGESTION_CACHE_HITS = Counter('data_ingestion_cache_hits_total', 'Total number of weather requests served from cache')
+DATA_INGESTION_CACHE_MISSES = Counter('data_ingestion_cache_misses_total', 'Total number of weather requests not found in cache')
+DATA_INGESTION_CACHE_EVICTIONS = Counter('data_ingestion_cache_evictions_total', 'Total number of weather cache entries evicted')
+UPSTREAM_REQUEST_TIME = Histogram('upstream_request_seconds', 'Time taken for upstream API calls, including retries', ['upstream'])
+
+# Prediction result cache metrics
+PREDICTION_CACHE_HITS = Counter('prediction_cache_hits_total', 'Total number of predictions served from the result cache', ['tier'])
+PREDICTION_CACHE_MISSES = Counter('prediction_cache_misses_total', 'Total number of predictions not found in the result cache')
+PREDICTION_CACHE_EVICTIONS = Counter('prediction_cache_evictions_total', 'Total number of in-process prediction cache entries evicted')
+
+# Prediction metrics: one family per quantity, labelled by pollutant, location and model version
+PREDICTION_LABELS = ['pollutant', 'location', 'model_version']
+PREDICTION_VALUE = Histogram('prediction_value', 'Predicted pollutant concentration', PREDICTION_LABELS, buckets=(1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000))
+
+# Errors of validated predictions on the scaled values (the sums give windowed MSE/MAE in PromQL)
+PREDICTION_SQUARED_ERROR = Histogram('prediction_squared_error', 'Squared error of validated predictions (scaled)', PREDICTION_LABELS, buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 100))
+PREDICTION_ABSOLUTE_ERROR = Histogram('prediction_absolute_error', 'Absolute error of validated predictions (scaled)', PREDICTION_LABELS, buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10))
+# Rolling MSE/MAE of the predictions validated by one worker process (one series
+# per pid under gunicorn); they cannot be combined, so aggregate from the histograms
+PREDICTION_ROLLING_MSE = Gauge('prediction_rolling_mse', 'MSE of the predictions (scaled) validated by this process over the rolling window', ['pollutant'], multiprocess_mode='liveall')
+PREDICTION_ROLLING_MAE = Gauge('prediction_rolling_mae', 'MAE of the predictions (scaled) validated by this process over the rolling window', ['pollutant'], multiprocess_mode='liveall')
+
+# Start Prometheus metrics server (on port 8000). Under gunicorn the master
+# serves the aggregated metrics of all workers instead (see gunicorn.conf.py).
+if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+    start_http_server(8000)
 
 app = Flask(__name__)
 
@@ -52,52 +80,338 @@ LATITUDE = os.getenv('LATITUDE')
 LONGITUDE = os.getenv('LONGITUDE')
 LOCATION = f"{LATITUDE},{LONGITUDE}"
 
-# Model and scaler paths
+# Upstream API base URLs (overridden to point at local stubs, e.g. benchmarks/stub_upstream.py)
+VISUAL_CROSSING_BASE_URL = os.getenv('VISUAL_CROSSING_BASE_URL', 'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline').rstrip('/')
+OPENWEATHER_BASE_URL = os.getenv('OPENWEATHER_BASE_URL', 'http://api.openweathermap.org/data/2.5').rstrip('/')
+
+# Micro-batching configuration
+BATCH_MAX_SIZE = int(os.getenv('BATCH_MAX_SIZE', '64'))
+BATCH_MAX_WAIT_MS = float(os.getenv('BATCH_MAX_WAIT_MS', '5'))
+API_MAX_ITEMS = int(os.getenv('API_MAX_ITEMS', '256'))
+FORECAST_MAX_HOURS = int(os.getenv('FORECAST_MAX_HOURS', '24'))
+
+# Weather cache configuration (TTLs in seconds)
+WEATHER_CACHE_SIZE = int(os.getenv('WEATHER_CACHE_SIZE', '1024'))
+WEATHER_CACHE_PAST_TTL = float(os.getenv('WEATHER_CACHE_PAST_TTL', str(7 * 24 * 3600)))
+WEATHER_CACHE_RECENT_TTL = float(os.getenv('WEATHER_CACHE_RECENT_TTL', '600'))
+
+# Window of the rolling MSE/MAE, in seconds
+ROLLING_ERROR_WINDOW = float(os.getenv('ROLLING_ERROR_WINDOW', '3600'))
+
+# Prediction result cache: in-process LRU entries, optional shared directory
+# holding at most PREDICTION_CACHE_DISK_ENTRIES files (0 = no limit)
+PREDICTION_CACHE_SIZE = int(os.getenv('PREDICTION_CACHE_SIZE', '4096'))
+PREDICTION_CACHE_DIR = os.getenv('PREDICTION_CACHE_DIR', '')
+PREDICTION_CACHE_DISK_ENTRIES = int(os.getenv('PREDICTION_CACHE_DISK_ENTRIES', '100000'))
+
+# Upstream HTTP client: timeouts in seconds, retries with exponential backoff
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', '3.05'))
+UPSTREAM_READ_TIMEOUT = float(os.getenv('UPSTREAM_READ_TIMEOUT', '10'))
+UPSTREAM_RETRIES = int(os.getenv('UPSTREAM_RETRIES', '2'))
+UPSTREAM_BACKOFF = float(os.getenv('UPSTREAM_BACKOFF', '0.3'))
+
+# Shared air pollution forecast, one file per location (refresh and retry
+# after a failed fetch in seconds)
+POLLUTION_FORECAST_PATH = os.getenv('POLLUTION_FORECAST_PATH', os.path.join(
+    tempfile.gettempdir(), f'pollution_forecast_{LATITUDE}_{LONGITUDE}.json'))
+POLLUTION_FORECAST_REFRESH = float(os.getenv('POLLUTION_FORECAST_REFRESH', '3600'))
+POLLUTION_FORECAST_RETRY = float(os.getenv('POLLUTION_FORECAST_RETRY', '60'))
+
+# Model and scaler paths (of the default model when there is no registry file)
 FEATURE_SCALER_PATH = "models/feature_scaler.joblib"
 TARGET_SCALER_PATH = "models/target_scaler.joblib"
-MODEL_PATH = "models/model.keras"
 
-# AQI Classification Ranges
-AQI_RANGES = [
-    {"level": "Good", "so2": (0, 20), "no2": (0, 40), "pm10": (0, 20), "pm2_5": (0, 10), "o3": (0, 60), "co": (0, 4400)},
-    {"level": "Fair", "so2": (20, 80), "no2": (40, 70), "pm10": (20, 50), "pm2_5": (10, 25), "o3": (60, 100), "co": (4400, 9400)},
-    {"level": "Moderate", "so2": (80, 250), "no2": (70, 150), "pm10": (50, 100), "pm2_5": (25, 50), "o3": (100, 140), "co": (9400, 12400)},
-    {"level": "Poor", "so2": (250, 350), "no2": (150, 200), "pm10": (100, 200), "pm2_5": (50, 75), "o3": (140, 180), "co": (12400, 15400)},
-    {"level": "Very Poor", "so2": (350, float('inf')), "no2": (200, float('inf')), "pm10": (200, float('inf')), "pm2_5": (75, float('inf')), "o3": (180, float('inf')), "co": (15400, float('inf'))},
-]
+# Model backend: 'keras' (TensorFlow) or 'onnx' (exported with src/export_model.py)
+MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'keras')
+MODEL_PATH = os.getenv('MODEL_PATH', DEFAULT_MODEL_PATHS.get(MODEL_BACKEND, "models/model.keras"))
+ONNX_THREADS = int(os.getenv('ONNX_THREADS', '0'))
+
+# Model registry: per-location model versions, a bounded set of resident models
+# (0 bytes = no size limit), re-read when the file changes
+MODEL_REGISTRY_PATH = os.getenv('MODEL_REGISTRY_PATH', 'models/registry.json')
+MODEL_REGISTRY_CHECK_INTERVAL = float(os.getenv('MODEL_REGISTRY_CHECK_INTERVAL', '5'))
+MODEL_CACHE_MAX_MODELS = int(os.getenv('MODEL_CACHE_MAX_MODELS', '4'))
+MODEL_CACHE_MAX_BYTES = int(os.getenv('MODEL_CACHE_MAX_BYTES', '0'))
+
+# Startup: 'background' loads the model after the server starts, 'eager' loads it at import,
+# 'preload' is used by gunicorn.conf.py to load in the master before forking workers
+STARTUP_MODE = os.getenv('STARTUP_MODE', 'background')
+WARMUP_BATCH_SIZES = [int(size) for size in os.getenv('WARMUP_BATCH_SIZES', '1,8,32').split(',') if size.strip()]
+
+# Tracing: Server-Timing response header with the stage timings of each request,
+# and a cProfile sample of requests while the control file holds a rate (0-1)
+SERVER_TIMING = os.getenv('SERVER_TIMING', '0') == '1'
+PROFILE_CONTROL_PATH = os.getenv('PROFILE_CONTROL_PATH', os.path.join(tempfile.gettempdir(), 'pollution_profile_rate'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'pollution_profiles'))
 
 # Define targets
 TARGETS = ['components.so2', 'components.no2', 'components.pm10', 'components.pm2_5', 'components.o3', 'components.co']
 
-# Load scalers
-if not os.path.exists(FEATURE_SCALER_PATH) or not os.path.exists(TARGET_SCALER_PATH):
-    raise FileNotFoundError("Scaler files not found. Ensure they are present in the 'models' directory.")
+# Stage timings of the prediction pipeline, and sampled request profiles
+tracer = Tracer(on_stage=lambda stage, seconds: PIPELINE_STAGE_TIME.labels(stage=stage).observe(seconds))
+profiler = SamplingProfiler(PROFILE_CONTROL_PATH, PROFILE_DIR)
+
+# Windowed errors of the validated predictions in this process
+rolling_errors = RollingErrors(len(POLLUTANTS), window_seconds=ROLLING_ERROR_WINDOW)
+ROLLING_MSE_GAUGES = [PREDICTION_ROLLING_MSE.labels(pollutant=pollutant) for pollutant in POLLUTANTS]
+ROLLING_MAE_GAUGES = [PREDICTION_ROLLING_MAE.labels(pollutant=pollutant) for pollutant in POLLUTANTS]
+
+# Model results keyed by model version and input window
+prediction_cache = PredictionCache(
+    TTLCache(maxsize=PREDICTION_CACHE_SIZE, on_evict=PREDICTION_CACHE_EVICTIONS.inc),
+    directory=PREDICTION_CACHE_DIR,
+    max_entries=PREDICTION_CACHE_DISK_ENTRIES,
+    on_hit=lambda tier: PREDICTION_CACHE_HITS.labels(tier=tier).inc(),
+    on_miss=PREDICTION_CACHE_MISSES.inc
+)
+
+# Default model state, populated by load_model_artifacts()
+model_ready = threading.Event()
+model_load_error = None
+startup_seconds = None
+
+def record_batch(batch_size, batch_time):
+    """
+    Record the size and duration of a batched model call.
+    """
+    PREDICTION_BATCH_SIZE.observe(batch_size)
+    PREDICTION_BATCH_TIME.observe(batch_time)
+
+def record_resident_models(count, nbytes):
+    """
+    Record how many models this worker holds and their estimated size.
+    """
+    MODELS_RESIDENT.set(count)
+    MODELS_RESIDENT_BYTES.set(nbytes)
+
+def warm_up(runner, micro_batcher):
+    """
+    Run dummy inputs through the model so graph tracing and allocator setup
+    happen before the first real request.
+    """
+    for batch_size in WARMUP_BATCH_SIZES:
+        runner.predict(np.zeros((batch_size, SEQ_LENGTH, len(FEATURES)), dtype=np.float32))
+    micro_batcher.predict(np.zeros((1, SEQ_LENGTH, len(FEATURES)), dtype=np.float32))
+
+def load_registered_model(name, spec):
+    """
+    Load one registry model: compile its scalers into a Preprocessor, load the
+    runner for its backend and warm up its micro-batcher.
+    """
+    paths = [spec['model'], spec['feature_scaler'], spec['target_scaler']]
+    for path in paths:
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Model artifact '{path}' of model '{name}' not found.")
+
+    # Compile the scalers into plain NumPy transforms and check them against sklearn
+    feature_scaler = joblib.load(spec['feature_scaler'])
+    target_scaler = joblib.load(spec['target_scaler'])
+    preprocessor = Preprocessor.from_scalers(feature_scaler, target_scaler)
+    preprocessor.verify(feature_scaler, target_scaler)
+
+    backend = spec['backend']
+    runner_options = {'threads': ONNX_THREADS} if backend == 'onnx' else {}
+    import_backend(backend)
+    memory_before = resident_memory()
+    runner = load_runner(backend, spec['model'], **runner_options)
+
+    # Coalesce concurrent requests into one model.predict call
+    micro_batcher = MicroBatcher(
+        runner.predict,
+        max_batch_size=BATCH_MAX_SIZE,
+        max_wait_ms=BATCH_MAX_WAIT_MS,
+        on_batch=record_batch
+    )
+    warm_up(runner, micro_batcher)
+
+    # Resident memory is what the load and warm-up added to the process (an
+    # estimate when other models load at the same time), never less than the artifacts
+    nbytes = artifact_bytes(paths)
+    memory_after = resident_memory()
+    if memory_before is not None and memory_after is not None:
+        nbytes = max(nbytes, memory_after - memory_before)
+
+    # The version keys cached results, so a new model or scalers never serve old ones
+    version = artifact_version(paths)
+    prediction_cache.retire(name, version)
+    print(f"Model '{name}' ({backend}, version {version}) loaded from {spec['model']}, {nbytes / 2**20:.1f} MiB")
+    return LoadedModel(name, version, backend, runner, preprocessor, micro_batcher, nbytes)
+
+# Location -> model versions, loaded on first use and kept in a bounded LRU
+registry = ModelRegistry(
+    MODEL_REGISTRY_PATH,
+    {'backend': MODEL_BACKEND, 'model': MODEL_PATH, 'feature_scaler': FEATURE_SCALER_PATH, 'target_scaler': TARGET_SCALER_PATH},
+    load_registered_model,
+    max_models=MODEL_CACHE_MAX_MODELS,
+    max_bytes=MODEL_CACHE_MAX_BYTES,
+    check_interval=MODEL_REGISTRY_CHECK_INTERVAL,
+    on_change=record_resident_models
+)
+
+def load_model_artifacts():
+    """
+    Load the model of the default location, warm it up and mark the app ready.
+    Other locations' models are loaded on their first request.
+    """
+    global startup_seconds
+
+    registry.get(LOCATION)
+
+    startup_seconds = time.time() - PROCESS_START_TIME
+    STARTUP_TIME.set(startup_seconds)
+    model_ready.set()
+    print(f"Model ready ({registry.default_backend()}) after {startup_seconds:.2f}s")
+
+def try_load_model_artifacts():
+    """
+    Load the model, recording the error for /readyz instead of raising.
+    """
+    global model_load_error
+    try:
+        load_model_artifacts()
+    except Exception as e:
+        model_load_error = str(e)
+        print(f"Error loading the model for {LOCATION}: {e}")
+
+def load_model_artifacts_in_background():
+    """
+    Load the model on a background thread so the server can answer health
+    checks while TensorFlow imports and the model warms up.
+    """
+    threading.Thread(target=try_load_model_artifacts, name="model-loader", daemon=True).start()
+
+def start_worker():
+    """
+    Called in every gunicorn worker before it accepts requests (see
+    gunicorn.conf.py). Models that could not be loaded in the master are
+    loaded here, synchronously, so a worker only serves once its model is
+    ready and /readyz never answers for a worker that is still loading.
+    """
+    if not model_ready.is_set():
+        try_load_model_artifacts()
+
+if STARTUP_MODE == 'eager':
+    load_model_artifacts()
+elif STARTUP_MODE == 'preload':
+    # gunicorn preload_app: load what survives fork in the master so workers
+    # share it copy-on-write. TensorFlow does not, so Keras loads per worker.
+    if runner_is_fork_safe(registry.default_backend()):
+        load_model_artifacts()
+else:
+    load_model_artifacts_in_background()
+
+@tracer.traced('model_lookup')
+def location_model(location):
+    """
+    The LoadedModel serving a location, or None (logged) if it cannot be loaded.
+    """
+    try:
+        return registry.get(location)
+    except Exception as e:
+        print(f"Error loading the model for {location}: {e}")
+        return None
+
+def metric_location(location):
+    """
+    Location label for metrics. Only configured locations (the default one and
+    those in the model registry) get their own series, so arbitrary lat/lon
+    queries cannot grow the number of series without bound.
+    """
+    key = location_key(location)
+    if key == location_key(LOCATION) or key in registry.locations:
+        return key
+    return 'other'
 
-feature_scaler = joblib.load(FEATURE_SCALER_PATH)
-target_scaler = joblib.load(TARGET_SCALER_PATH)
+@functools.lru_cache(maxsize=1024)
+def pollutant_series(metric, location, model_version):
+    """
+    The labelled child of a metric for every pollutant, in POLLUTANTS order,
+    resolved once per (location, model version) instead of on every update.
+    """
+    return tuple(metric.labels(pollutant=pollutant, location=location, model_version=model_version) for pollutant in POLLUTANTS)
 
-# Load the local model
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError("Model directory not found. Ensure the model is saved in the 'MLModel' directory.")
+def record_predictions(y_pred, location, loaded):
+    """
+    Observe the predicted pollutant values, shaped (6,) or (N, 6), in one pass.
+    """
+    series = pollutant_series(PREDICTION_VALUE, metric_location(location), loaded.version)
+    for row in np.asarray(y_pred, dtype=np.float64).reshape(-1, len(POLLUTANTS)).tolist():
+        for child, value in zip(series, row):
+            child.observe(value)
 
-try:
-    model = load_model(MODEL_PATH)
-except Exception as e:
-    print(f"Error loading model from {MODEL_PATH}: {e}")
-    model = None
+def record_errors(y_pred_scaled, y_actual_scaled, location, loaded):
+    """
+    Observe the errors of validated predictions (scaled, (N, 6)) and refresh the rolling MSE/MAE.
+    """
+    errors = np.asarray(y_pred_scaled, dtype=np.float64) - np.asarray(y_actual_scaled, dtype=np.float64)
+    labels = (metric_location(location), loaded.version)
+    squared_series = pollutant_series(PREDICTION_SQUARED_ERROR, *labels)
+    absolute_series = pollutant_series(PREDICTION_ABSOLUTE_ERROR, *labels)
+    for row in errors.reshape(-1, len(POLLUTANTS)).tolist():
+        for squared, absolute, error in zip(squared_series, absolute_series, row):
+            squared.observe(error * error)
+            absolute.observe(abs(error))
+
+    rolling_errors.add(errors)
+    mse, mae, _ = rolling_errors.snapshot()
+    for gauge, value in zip(ROLLING_MSE_GAUGES, mse.tolist()):
+        gauge.set(value)
+    for gauge, value in zip(ROLLING_MAE_GAUGES, mae.tolist()):
+        gauge.set(value)
+
+def model_unavailable_message():
+    """
+    User-facing reason the model cannot serve predictions yet.
+    """
+    if model_load_error is not None:
+        return "Model failed to load."
+    return "Model is still loading. Please try again shortly."
+
+# Pooled, concurrent access to Visual Crossing and OpenWeather
+upstream = UpstreamClient(
+    connect_timeout=UPSTREAM_CONNECT_TIMEOUT,
+    read_timeout=UPSTREAM_READ_TIMEOUT,
+    retries=UPSTREAM_RETRIES,
+    backoff_factor=UPSTREAM_BACKOFF,
+    on_request=lambda name, seconds: UPSTREAM_REQUEST_TIME.labels(upstream=name).observe(seconds)
+)
+
+# Weather windows keyed by (location, start_date, end_date)
+weather_cache = TTLCache(
+    maxsize=WEATHER_CACHE_SIZE,
+    on_hit=DATA_INGESTION_CACHE_HITS.inc,
+    on_miss=DATA_INGESTION_CACHE_MISSES.inc,
+    on_evict=DATA_INGESTION_CACHE_EVICTIONS.inc
+)
+
+def weather_cache_ttl(end_date):
+    """
+    Days that are over everywhere on Earth no longer change, so they are kept for
+    the long TTL; anything that may still be "today" somewhere expires quickly.
+    """
+    settled_before = datetime.utcnow().date() - timedelta(days=1)
+    if datetime.strptime(end_date, '%Y-%m-%d').date() < settled_before:
+        return WEATHER_CACHE_PAST_TTL
+    return WEATHER_CACHE_RECENT_TTL
 
-def fetch_weather_data(start_date, end_date):
+@tracer.traced('weather_fetch')
+def fetch_weather_data(start_date, end_date, location=LOCATION):
     """
     Fetch historical weather data between start_date and end_date.
+    Responses are served from the weather cache when available.
     """
+    cache_key = (location, start_date, end_date)
+    data = weather_cache.get(cache_key)
+    if data is not None:
+        return data
+
     DATA_INGESTION_COUNT.inc()  # Increment data ingestion attempts
     start_time = time.time()     # Start timing data ingestion
 
-    url = f'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{LOCATION}/{start_date}/{end_date}?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=hours&elements=datetime,temp,dew,humidity,windspeed,windgust,winddir,pressure,solarenergy,cloudcover,solarradiation,uvindex'
+    url = f'{VISUAL_CROSSING_BASE_URL}/{location}/{start_date}/{end_date}?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=hours&elements=datetime,datetimeEpoch,temp,dew,humidity,windspeed,windgust,winddir,pressure,solarenergy,cloudcover,solarradiation,uvindex'
 
     try:
-        response = requests.get(url)
-        response.raise_for_status()
+        response = upstream.get('visual_crossing', url)
         data = response.json()
 
         ingestion_time = time.time() - start_time  # Time taken for data ingestion
@@ -110,6 +424,8 @@ def fetch_weather_data(start_date, end_date):
         # Record the timestamp of successful ingestion
         DATA_INGESTION_LAST_SUCCESSFUL.set(time.time())
 
+        weather_cache.set(cache_key, data, ttl=weather_cache_ttl(end_date))
+
         return data
     except Exception as e:
         DATA_INGESTION_ERROR.inc()  # Increment error count
@@ -120,7 +436,7 @@ def fetch_actual_pollution_data():
     """
     Fetch actual air pollution data from the OpenWeatherMap API.
     """
-    api_url = "http://api.openweathermap.org/data/2.5/air_pollution/forecast"
+    api_url = f"{OPENWEATHER_BASE_URL}/air_pollution/forecast"
     params = {
         "lat": LATITUDE,
         "lon": LONGITUDE,
@@ -128,8 +444,7 @@ def fetch_actual_pollution_data():
     }
 
     try:
-        response = requests.get(api_url, params=params)
-        response.raise_for_status()
+        response = upstream.get('openweather', api_url, params=params)
         data = response.json()
 
         return data
@@ -137,127 +452,98 @@ def fetch_actual_pollution_data():
         print(f'Error fetching actual pollution data: {e}')
         return None
 
-def extract_actual_pollutants(actual_data, target_timestamp):
-    """
-    Extract actual pollutant values for the target timestamp from the API data.
-    """
-    list_data = actual_data.get('list', [])
-    for entry in list_data:
-        entry_timestamp = datetime.utcfromtimestamp(entry['dt'])
-        if entry_timestamp == target_timestamp:
-            pollutants = {
-                'so2': entry['components'].get('so2', 0.0),
-                'no2': entry['components'].get('no2', 0.0),
-                'pm10': entry['components'].get('pm10', 0.0),
-                'pm2_5': entry['components'].get('pm2_5', 0.0),
-                'o3': entry['components'].get('o3', 0.0),
-                'co': entry['components'].get('co', 0.0)
-            }
-            return pollutants
-    print("Specified timestamp not found in actual data.")
-    return None
-
-def extract_past_24_hours(data, target_date, target_hour):
-    """
-    Extract the past 24 hours of data up to the target_date and target_hour.
-    """
-    # Combine hours from both days
-    all_hours = []
-    for day in data.get('days', []):
-        for hour_data in day.get('hours', []):
-            # Combine date and time
-            datetime_str = f"{day['datetime']}T{hour_data['datetime']}"
-            timestamp = pd.to_datetime(datetime_str)
-            all_hours.append({**hour_data, 'timestamp': timestamp})
-    
-    # Sort all_hours by timestamp
-    all_hours = sorted(all_hours, key=lambda x: x['timestamp'])
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(all_hours)
-    
-    # Convert target_date and target_hour to timestamp
-    target_datetime_str = f"{target_date}T{target_hour:02d}:00:00"
-    target_timestamp = pd.to_datetime(target_datetime_str)
-    
-    # Find the index where timestamp == target_timestamp
-    target_index = df.index[df['timestamp'] == target_timestamp].tolist()
-    if not target_index:
-        print("Specified datetime not found in the fetched data.")
-        return None
-    target_index = target_index[0]
-    
-    # Extract the past 24 hours
-    start_index = target_index - 23  # inclusive of target_index
-    if start_index < 0:
-        print("Not enough historical data to extract past 24 hours.")
+# Forecast is fetched once per refresh interval and shared across workers
+pollution_store = PollutionForecastStore(
+    fetch_actual_pollution_data,
+    POLLUTION_FORECAST_PATH,
+    refresh_interval=POLLUTION_FORECAST_REFRESH,
+    retry_interval=POLLUTION_FORECAST_RETRY,
+    location=LOCATION
+)
+get_pollution_index = tracer.traced('pollution_fetch')(pollution_store.get_index)
+
+@tracer.traced('validation')
+def extract_actual_pollutants(actual_index, target_timestamp):
+    """
+    Extract actual pollutant values for the target timestamp from the
+    dt-indexed forecast.
+    """
+    pollutants = actual_index.get(int(target_timestamp.timestamp()))
+    if pollutants is None:
+        print("Specified timestamp not found in actual data.")
         return None
-    past_24_hours = df.iloc[start_index:target_index + 1]
-    
-    return past_24_hours
+    return dict(pollutants)
 
+@tracer.traced('validation')
 def calculate_mse(predicted_scaled, actual_scaled):
     """
     Calculate Mean Squared Error between predicted and actual pollutant values.
     """
-    mse = {}
-    pollutants = ['so2', 'no2', 'pm10', 'pm2_5', 'o3', 'co']
-    
-    for i, pollutant in enumerate(pollutants):
-        mse_value = mean_squared_error([actual_scaled[0][i]], [predicted_scaled[0][i]])
-        mse[pollutant] = mse_value
-    
-    return mse
+    squared_errors = np.square(np.asarray(predicted_scaled, dtype=np.float64)[0] - np.asarray(actual_scaled, dtype=np.float64)[0])
+    return dict(zip(POLLUTANTS, squared_errors.tolist()))
 
-def preprocess_data(past_24_hours):
+@tracer.traced('preprocess')
+def preprocess_data(past_24_hours, preprocessor, out=None):
     """
-    Preprocess the past 24 hours data:
-    - Select required features
-    - Scale features
-    - Reshape for model input
+    Preprocess past 24 hours windows, shaped (24, 8) or (N, 24, 8):
+    - Scale features with the model's feature scaler
+    - Reshape for model input, (N, 24, 8)
     """
-    required_features = ['temp', 'dew', 'humidity', 'windspeed', 'windgust', 'winddir', 'pressure', 'solarenergy']
-    if not all(feature in past_24_hours.columns for feature in required_features):
-        print("Missing required features in the data.")
-        return None
-    
-    X = past_24_hours[required_features].values  # Shape: (24, 8)
-    
-    # Scale features
-    X_scaled = feature_scaler.transform(X)  # Shape: (24, 8)
-    
-    # Reshape to (1, 24, 8)
-    X_scaled = X_scaled.reshape(1, 24, 8)
-    
-    return X_scaled
+    return preprocessor.transform_features(past_24_hours, out=out)
 
-def determine_aqi(pollutant_values):
+def predict_scaled(loaded, X_scaled):
     """
-    Determine AQI level based on pollutant values.
-    Assigns AQI based on the highest pollutant concentration.
+    Predict pollutant values (N, 6) and AQI levels for scaled windows (N, 24, 8)
+    with a LoadedModel. Windows seen before are served from the prediction
+    cache; only the others go to the model, as one batch.
     """
-    max_aqi_level = "Good"
-    highest_aqi_index = -1  # Initialize to lowest AQI level
-    
-    # Iterate over each pollutant and determine its AQI level
-    for pollutant, value in pollutant_values.items():
-        for idx, aqi in enumerate(AQI_RANGES):
-            lower, upper = aqi[pollutant]
-            if lower <= value < upper:
-                if idx > highest_aqi_index:
-                    highest_aqi_index = idx
-                    max_aqi_level = aqi["level"]
-                break
-            elif value >= aqi[pollutant][1]:
-                continue
-    
-    return max_aqi_level
+    with tracer.stage('prediction_cache'):
+        keys = [window_key(window) for window in X_scaled]
+        results = [prediction_cache.get(loaded.version, key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+    if missing:
+        with tracer.stage('inference'):
+            y_pred = loaded.preprocessor.inverse_targets(loaded.batcher.predict(X_scaled[missing]))
+        # AQI is classified on the values as they are returned (rounded)
+        with tracer.stage('aqi'):
+            levels = aqi_levels(np.round(y_pred, 2))
+        for row, i in enumerate(missing):
+            prediction_cache.set(loaded.version, keys[i], y_pred[row], levels[row])
+            results[i] = (y_pred[row], levels[row])
+    return np.array([result[0] for result in results]).reshape(-1, len(POLLUTANTS)), [result[1] for result in results]
+
+@app.before_request
+def start_request_trace():
+    g.request_start = time.perf_counter()
+    tracer.start_request()
+    g.profile = profiler.start()
+
+@app.after_request
+def finish_request_trace(response):
+    """
+    Record the request time (probes excluded) and attach the stage timings.
+    """
+    if request.endpoint not in ('healthz', 'readyz'):
+        tracer.record('request', time.perf_counter() - g.request_start)
+    timings = tracer.request_timings()
+    if SERVER_TIMING and timings:
+        response.headers['Server-Timing'] = server_timing(timings)
+    return response
+
+@app.teardown_request
+def stop_request_profile(exc):
+    profile = g.pop('profile', None)
+    if profile is not None:
+        profiler.stop(profile, request.endpoint or 'request')
 
 @app.route('/', methods=['GET', 'POST'])
 def index():
     current_date = datetime.today().strftime('%Y-%m-%d')
     
     if request.method == 'POST':
+        if not model_ready.is_set():
+            return render_template('index.html', error=model_unavailable_message(), current_date=current_date)
+
         target_date = request.form.get('date')
         target_hour = request.form.get('hour')
         
@@ -277,41 +563,47 @@ def index():
         if not (0 <= target_hour <= 23):
             return render_template('index.html', error="Hour must be between 0 and 23.", current_date=current_date)
         
+        # Normalize the date for cache keys and window lookup
+        target_date = prediction_datetime.strftime('%Y-%m-%d')
+        
         # Fetch weather data for the target date and the previous date
         end_date = target_date
         start_date = (prediction_datetime - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
         
-        data = fetch_weather_data(start_date, end_date)
+        # Fetch weather and the validation forecast concurrently
+        weather_future = upstream.submit(fetch_weather_data, start_date, end_date)
+        pollution_future = upstream.submit(get_pollution_index)
+
+        data = weather_future.result()
         if data is None:
             return render_template('index.html', error="Error fetching weather data.", current_date=current_date)
         
         # Extract past 24 hours
-        past_24_hours = extract_past_24_hours(data, target_date, target_hour)
+        with tracer.stage('window_extraction'):
+            past_24_hours = extract_past_24_hours(data, target_date, target_hour)
         if past_24_hours is None:
             return render_template('index.html', error="Error extracting past 24 hours data.", current_date=current_date)
         
+        # Model and scalers of the monitored location
+        loaded = location_model(LOCATION)
+        if loaded is None:
+            return render_template('index.html', error="Error loading the model.", current_date=current_date)
+
         # Preprocess data
-        X_scaled = preprocess_data(past_24_hours)
+        X_scaled = preprocess_data(past_24_hours, loaded.preprocessor)
         if X_scaled is None:
             return render_template('index.html', error="Error preprocessing data.", current_date=current_date)
         
         # Start time before making the prediction
         start_time = time.time()  # Track the time when prediction starts
         
-        # Make prediction
+        # Make prediction (cached, or batched with any concurrent requests)
         try:
-            y_pred_scaled = model.predict(X_scaled)
+            y_pred, levels = predict_scaled(loaded, X_scaled)
         except Exception as e:
             print(f"Error during prediction: {e}")
             return render_template('index.html', error="Error during prediction.", current_date=current_date)
         
-        # Inverse transform predictions
-        try:
-            y_pred = target_scaler.inverse_transform(y_pred_scaled)
-        except Exception as e:
-            print(f"Error during inverse scaling: {e}")
-            return render_template('index.html', error="Error processing prediction results.", current_date=current_date)
-        
         # Track the prediction time
         prediction_time = time.time() - start_time  # Calculate time taken for prediction
         PREDICTION_TIME.observe(prediction_time)  # Log this time in the histogram
@@ -325,18 +617,13 @@ def index():
         }
 
         # Record prediction values
-        PREDICTION_VALUE_SO2.set(pollutant_values['so2'])
-        PREDICTION_VALUE_NO2.set(pollutant_values['no2'])
-        PREDICTION_VALUE_PM10.set(pollutant_values['pm10'])
-        PREDICTION_VALUE_PM2_5.set(pollutant_values['pm2_5'])
-        PREDICTION_VALUE_O3.set(pollutant_values['o3'])
-        PREDICTION_VALUE_CO.set(pollutant_values['co'])
+        record_predictions(y_pred, LOCATION, loaded)
         
-        # Determine AQI
-        aqi_level = determine_aqi(pollutant_values)
+        # AQI of the prediction
+        aqi_level = levels[0]
         
-        # Fetch actual pollution data
-        actual_data = fetch_actual_pollution_data()
+        # Fetch actual pollution data (served from the shared forecast store)
+        actual_data = pollution_future.result()
         if actual_data is None:
             return render_template('index.html', error="Error fetching actual pollution data for validation.", current_date=current_date)
         
@@ -360,24 +647,20 @@ def index():
         ]
 
         # Scale actual pollutants
-        y_actual_scaled = target_scaler.transform([actual_values])  # Shape: (1, 6)
+        y_actual_scaled = loaded.preprocessor.transform_targets([actual_values])  # Shape: (1, 6)
         
         # Calculate MSE on scaled data
+        y_pred_scaled = loaded.preprocessor.transform_targets(y_pred)
         mse_values = calculate_mse(y_pred_scaled, y_actual_scaled)
         # Round the MSE values
         mse_values = {k: round(v, 3) for k, v in mse_values.items()}
         
-        # Record MSE as Prometheus metrics
-        PREDICTION_MSE_SO2.set(mse_values.get('so2', 0))
-        PREDICTION_MSE_NO2.set(mse_values.get('no2', 0))
-        PREDICTION_MSE_PM10.set(mse_values.get('pm10', 0))
-        PREDICTION_MSE_PM2_5.set(mse_values.get('pm2_5', 0))
-        PREDICTION_MSE_O3.set(mse_values.get('o3', 0))
-        PREDICTION_MSE_CO.set(mse_values.get('co', 0))
+        # Record the errors and the rolling MSE/MAE as Prometheus metrics
+        record_errors(y_pred_scaled, y_actual_scaled, LOCATION, loaded)
 
         # Inverse transform actual pollutants for display
         try:
-            y_actual = target_scaler.inverse_transform(y_actual_scaled)
+            y_actual = loaded.preprocessor.inverse_targets(y_actual_scaled)
         except Exception as e:
             print(f"Error during inverse scaling of actual pollutants: {e}")
             return render_template('index.html', error="Error processing actual pollution results.", current_date=current_date)
@@ -392,19 +675,249 @@ def index():
             'co': round(y_actual[0][5], 2)
         }
 
-        return render_template(
-            'index.html',
-            pollutants=pollutant_values,
-            actual_pollutants=actual_pollutants_display,
-            mse=mse_values,
-            aqi=aqi_level,
-            current_date=current_date
-        )
+        with tracer.stage('render'):
+            return render_template(
+                'index.html',
+                pollutants=pollutant_values,
+                actual_pollutants=actual_pollutants_display,
+                mse=mse_values,
+                aqi=aqi_level,
+                current_date=current_date
+            )
     
     return render_template('index.html', current_date=current_date)
 
+def parse_prediction_item(item):
+    """
+    Validate one /api/predict item and return (target_date, target_hour, location).
+    Raises ValueError with a user-facing message if the item is invalid.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Each item must be an object with 'date' and 'hour'.")
+
+    try:
+        prediction_datetime = pd.to_datetime(str(item.get('date')), format='%Y-%m-%d')
+    except ValueError:
+        raise ValueError("Invalid date format. Use 'YYYY-MM-DD'.")
+
+    try:
+        target_hour = int(item.get('hour'))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid hour value. Please enter an integer between 0 and 23.")
+    if not (0 <= target_hour <= 23):
+        raise ValueError("Hour must be between 0 and 23.")
+
+    location = LOCATION
+    if item.get('lat') is not None or item.get('lon') is not None:
+        try:
+            location = f"{float(item['lat'])},{float(item['lon'])}"
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("'lat' and 'lon' must both be numbers.")
+
+    return prediction_datetime.strftime('%Y-%m-%d'), target_hour, location
+
+@app.route('/api/predict', methods=['POST'])
+def api_predict():
+    """
+    Predict pollutant levels for many (date, hour[, lat, lon]) items in one call.
+    All valid items served by the same model are sent to it as a single batch.
+    """
+    if not model_ready.is_set():
+        return jsonify(error=model_unavailable_message()), 503
+
+    payload = request.get_json(silent=True)
+    items = payload.get('items') if isinstance(payload, dict) else None
+    if not isinstance(items, list) or not items:
+        return jsonify(error="Request body must be a JSON object with a non-empty 'items' list."), 400
+    if len(items) > API_MAX_ITEMS:
+        return jsonify(error=f"At most {API_MAX_ITEMS} items are allowed per request."), 400
+
+    results = [None] * len(items)
+    groups = {}
+
+    for i, item in enumerate(items):
+        try:
+            target_date, target_hour, location = parse_prediction_item(item)
+        except ValueError as e:
+            results[i] = {'error': str(e)}
+            continue
+        results[i] = {'date': target_date, 'hour': target_hour, 'location': location}
+
+        # Items for the same location and day share one weather fetch
+        start_date = (pd.to_datetime(target_date) - pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+        groups.setdefault((location, start_date, target_date), []).append(i)
+
+    # Fetch the weather for every group concurrently
+    weather_futures = {
+        (location, start_date, end_date): upstream.submit(fetch_weather_data, start_date, end_date, location)
+        for location, start_date, end_date in groups
+    }
+
+    windows = {}
+    for (location, start_date, end_date), indices in groups.items():
+        data = weather_futures[(location, start_date, end_date)].result()
+        if data is None:
+            for i in indices:
+                results[i]['error'] = "Error fetching weather data."
+            continue
+
+        with tracer.stage('window_extraction'):
+            matrix = build_feature_matrix(data)
+        if matrix is None:
+            for i in indices:
+                results[i]['error'] = "Error preprocessing data."
+            continue
+
+        # Extract every requested window from the payload in one call
+        epochs, X = matrix
+        targets = [target_epoch(results[i]['date'], results[i]['hour']) for i in indices]
+        with tracer.stage('window_extraction'):
+            group_windows, valid = extract_windows(epochs, X, targets)
+        valid_indices = [i for i, ok in zip(indices, valid) if ok]
+        for i, ok in zip(indices, valid):
+            if not ok:
+                results[i]['error'] = "Error extracting past 24 hours data."
+        for i, window in zip(valid_indices, group_windows):
+            windows[i] = window
+
+    # Group the windows by the model serving their location
+    location_models = {}
+    model_groups = {}
+    for i in windows:
+        location = results[i]['location']
+        if location not in location_models:
+            location_models[location] = location_model(location)
+        loaded = location_models[location]
+        if loaded is None:
+            results[i]['error'] = "Error loading the model."
+            continue
+        model_groups.setdefault(loaded, []).append(i)
+
+    batch_time = 0.0
+    for loaded, indices in model_groups.items():
+        start_time = time.time()
+        try:
+            # Stack the raw windows once and scale them in place
+            X_batch = np.stack([windows[i] for i in indices], dtype=loaded.preprocessor.dtype)
+            X_scaled = preprocess_data(X_batch, loaded.preprocessor, out=X_batch)
+            y_pred, levels = predict_scaled(loaded, X_scaled)
+        except Exception as e:
+            print(f"Error during batch prediction: {e}")
+            return jsonify(error="Error during prediction."), 500
+        group_time = time.time() - start_time
+        batch_time += group_time
+        y_pred = np.round(y_pred, 2)
+
+        # Spread the batch time across the items it served
+        item_time = group_time / len(indices)
+        for row, i in enumerate(indices):
+            PREDICTION_TIME.observe(item_time)
+            record_predictions(y_pred[row], results[i]['location'], loaded)
+            pollutant_values = dict(zip(POLLUTANTS, y_pred[row].tolist()))
+            results[i].update(
+                pollutants=pollutant_values,
+                aqi=levels[row],
+                model=loaded.name,
+                prediction_time=item_time
+            )
+
+    REQUEST_COUNT.inc()
+
+    return jsonify(results=results, prediction_time=batch_time)
+
+@app.route('/api/forecast', methods=['GET'])
+def api_forecast():
+    """
+    Predict the hourly pollutant and AQI series for `hours` consecutive hours
+    starting at (date, hour), from one weather fetch and one batched model call.
+    """
+    if not model_ready.is_set():
+        return jsonify(error=model_unavailable_message()), 503
+
+    args = request.args.to_dict()
+    args.setdefault('hour', 0)
+    try:
+        target_date, target_hour, location = parse_prediction_item(args)
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    try:
+        hours = int(args.get('hours', FORECAST_MAX_HOURS))
+    except ValueError:
+        hours = 0  # Not a number: reported by the range check below
+    if not (1 <= hours <= FORECAST_MAX_HOURS):
+        return jsonify(error=f"'hours' must be between 1 and {FORECAST_MAX_HOURS}."), 400
+
+    # Every window falls between the day before the first hour and the day of the last one
+    first_hour = pd.to_datetime(target_date) + pd.Timedelta(hours=target_hour)
+    start_date = (first_hour - pd.Timedelta(days=1)).strftime('%Y-%m-%d')
+    end_date = (first_hour + pd.Timedelta(hours=hours - 1)).strftime('%Y-%m-%d')
+
+    loaded = location_model(location)
+    if loaded is None:
+        return jsonify(error="Error loading the model."), 500
+
+    data = fetch_weather_data(start_date, end_date, location)
+    if data is None:
+        return jsonify(error="Error fetching weather data."), 502
+    with tracer.stage('window_extraction'):
+        matrix = build_feature_matrix(data)
+    if matrix is None:
+        return jsonify(error="Error preprocessing data."), 502
+
+    epochs, X = matrix
+    targets = target_epoch(target_date, target_hour) + np.arange(hours, dtype=np.int64) * 3600
+    with tracer.stage('window_extraction'):
+        windows, valid = extract_windows(epochs, X, targets)
+
+    batch_time = 0.0
+    y_pred, levels = np.empty((0, len(TARGETS))), []
+    if len(windows):
+        start_time = time.time()
+        try:
+            X_scaled = preprocess_data(windows, loaded.preprocessor)
+            y_pred, levels = predict_scaled(loaded, X_scaled)
+        except Exception as e:
+            print(f"Error during forecast prediction: {e}")
+            return jsonify(error="Error during prediction."), 500
+        batch_time = time.time() - start_time
+        for _ in range(len(windows)):
+            PREDICTION_TIME.observe(batch_time / len(windows))
+        record_predictions(y_pred, location, loaded)
+
+    rows = iter(zip(np.round(y_pred, 2).tolist(), levels))
+    series = []
+    for target, ok in zip(pd.to_datetime(targets, unit='s'), valid):
+        entry = {'date': target.strftime('%Y-%m-%d'), 'hour': target.hour}
+        if ok:
+            values, level = next(rows)
+            entry.update(pollutants=dict(zip(POLLUTANTS, values)), aqi=level)
+        else:
+            entry['error'] = "Error extracting past 24 hours data."
+        series.append(entry)
+
+    REQUEST_COUNT.inc()
+
+    return jsonify(location=location, model=loaded.name, series=series, prediction_time=batch_time)
+
+@app.route('/healthz')
+def healthz():
+    """
+    Liveness probe: the process is up and serving HTTP.
+    """
+    return jsonify(status="ok")
+
+@app.route('/readyz')
+def readyz():
+    """
+    Readiness probe: the default location's model is loaded and warmed up.
+    Also lists the models this worker holds.
+    """
+    if model_ready.is_set():
+        models = {name: {'version': version, 'bytes': nbytes} for name, (version, nbytes) in registry.resident().items()}
+        return jsonify(status="ready", backend=registry.default_backend(), startup_seconds=round(startup_seconds, 3), models=models)
+    if model_load_error is not None:
+        return jsonify(status="failed", error=model_load_error), 503
+    return jsonify(status="loading"), 503
+
 if __name__ == '__main__':
-    if model is None:
-        print("Model is not loaded. Please check the model path.")
-    else:
-        app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
@@ -0,0 +1,50 @@
+import numpy as np
+
+# Define AQI ranges for each pollutant
+AQI_RANGES = [
+    {"level": "Good", "so2": (0, 20), "no2": (0, 40), "pm10": (0, 20), "pm2_5": (0, 10), "o3": (0, 60), "co": (0, 4400)},
+    {"level": "Fair", "so2": (20, 80), "no2": (40, 70), "pm10": (20, 50), "pm2_5": (10, 25), "o3": (60, 100), "co": (4400, 9400)},
+    {"level": "Moderate", "so2": (80, 250), "no2": (70, 150), "pm10": (50, 100), "pm2_5": (25, 50), "o3": (100, 140), "co": (9400, 12400)},
+    {"level": "Poor", "so2": (250, 350), "no2": (150, 200), "pm10": (100, 200), "pm2_5": (50, 75), "o3": (140, 180), "co": (12400, 15400)},
+    {"level": "Very Poor", "so2": (350, float('inf')), "no2": (200, float('inf')), "pm10": (200, float('inf')), "pm2_5": (75, float('inf')), "o3": (180, float('inf')), "co": (15400, float('inf'))},
+]
+
+AQI_LEVELS = [aqi["level"] for aqi in AQI_RANGES]
+POLLUTANTS = ['so2', 'no2', 'pm10', 'pm2_5', 'o3', 'co']
+
+# Lower bound of every level, shaped (pollutants, levels); the ranges are contiguous
+LOWER_BOUNDS = np.array([[aqi[pollutant][0] for aqi in AQI_RANGES] for pollutant in POLLUTANTS], dtype=np.float64)
+UPPER_BOUND = np.array([AQI_RANGES[-1][pollutant][1] for pollutant in POLLUTANTS], dtype=np.float64)
+
+
+def aqi_indices(values):
+    """
+    AQI level index of each row of pollutant values shaped (N, 6) in POLLUTANTS order.
+
+    Each pollutant is placed in its level with searchsorted, and a row takes
+    its highest level. Values that fall in no range (negative, inf, NaN) do
+    not count, as in the original per-pollutant loop; a row with no match is
+    "Good" (index 0).
+    """
+    values = np.asarray(values, dtype=np.float64).reshape(-1, len(POLLUTANTS))
+    levels = np.empty(values.shape, dtype=np.int64)
+    for i in range(len(POLLUTANTS)):
+        levels[:, i] = np.searchsorted(LOWER_BOUNDS[i], values[:, i], side='right') - 1
+    levels[~(values < UPPER_BOUND)] = -1  # inf and NaN match no range
+    return np.maximum(levels.max(axis=1), 0)
+
+
+def aqi_levels(values):
+    """
+    AQI level name of each row of pollutant values shaped (N, 6).
+    """
+    return [AQI_LEVELS[index] for index in aqi_indices(values)]
+
+
+def determine_aqi(pollutant_values):
+    """
+    Determine AQI level based on a {pollutant: value} dict.
+    Assigns AQI based on the highest pollutant concentration; missing pollutants are ignored.
+    """
+    row = [pollutant_values.get(pollutant, np.nan) for pollutant in POLLUTANTS]
+    return AQI_LEVELS[aqi_indices(row)[0]]
@@ -0,0 +1,137 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+# Queued by close() to stop the worker thread
+_CLOSE = object()
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent prediction requests into a single batched model call.
+
+    Callers submit arrays shaped (n, 24, 8) and get back a Future. A single
+    worker thread collects submissions until max_batch_size rows are queued or
+    max_wait_ms has passed since the first one arrived, runs predict_fn once on
+    the stacked batch and hands every caller its own slice of the output.
+    close() stops the worker, so the batcher and its model can be freed.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=5, on_batch=None):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.on_batch = on_batch  # Called as on_batch(batch_size, seconds) after each model call
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._pid = None
+        self._buffer = None  # Reused input buffer, only touched by the worker thread
+        self._closed = False
+
+    def submit(self, X):
+        """
+        Queue X for prediction and return a Future resolving to its predictions.
+        """
+        future = Future()
+        with self._lock:
+            if not self._closed:
+                self._ensure_worker()
+                self._queue.put((X, future))
+                return future
+        # Closed (e.g. its model was evicted): callers still holding it run unbatched
+        self._run_batch([(X, future)])
+        return future
+
+    def predict(self, X, timeout=None):
+        """
+        Blocking helper: submit X and wait for its predictions.
+        """
+        return self.submit(X).result(timeout)
+
+    def close(self, timeout=None):
+        """
+        Stop the worker thread once the requests already queued are done and wait for it.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            worker = self._worker if self._pid == os.getpid() else None
+            if worker is not None and worker.is_alive():
+                self._queue.put(_CLOSE)
+        if worker is not None and worker is not threading.current_thread():
+            worker.join(timeout)
+
+    def _ensure_worker(self):
+        # Called with the lock held
+        if self._pid != os.getpid():
+            # Threads do not survive fork (e.g. gunicorn preload_app), so a
+            # forked child starts its own worker with a fresh queue
+            self._queue = queue.Queue()
+            self._worker = None
+            self._pid = os.getpid()
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, args=(self._queue,), name="micro-batcher", daemon=True)
+            self._worker.start()
+
+    def _run(self, work_queue):
+        while True:
+            item = work_queue.get()
+            if item is _CLOSE:
+                return
+            pending = [item]
+            rows = len(item[0])
+            deadline = time.monotonic() + self.max_wait
+
+            # Keep collecting until the batch is full or the window closes
+            while rows < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = work_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is _CLOSE:
+                    self._run_batch(pending)
+                    return
+                pending.append(item)
+                rows += len(item[0])
+
+            self._run_batch(pending)
+
+    def _run_batch(self, pending):
+        if len(pending) == 1:
+            batch = pending[0][0]
+        else:
+            batch = self._stack([X for X, _ in pending])
+
+        start_time = time.time()
+        try:
+            y = self.predict_fn(batch)
+        except Exception as e:
+            for _, future in pending:
+                future.set_exception(e)
+            return
+
+        if self.on_batch is not None:
+            self.on_batch(len(batch), time.time() - start_time)
+
+        # Fan the batched output back out in submission order
+        offset = 0
+        for X, future in pending:
+            future.set_result(y[offset:offset + len(X)])
+            offset += len(X)
+
+    def _stack(self, arrays):
+        rows = sum(len(X) for X in arrays)
+        shape, dtype = arrays[0].shape[1:], arrays[0].dtype
+        if (self._buffer is None or len(self._buffer) < rows
+                or self._buffer.shape[1:] != shape or self._buffer.dtype != dtype):
+            self._buffer = np.empty((max(rows, self.max_batch_size),) + shape, dtype=dtype)
+        return np.concatenate(arrays, out=self._buffer[:rows])
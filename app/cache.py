@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache whose entries expire after a per-entry TTL.
+
+    Entries set with ttl=None never expire and are only dropped when the cache
+    is full. The optional on_hit/on_miss/on_evict callbacks are invoked without
+    arguments so they can be wired straight to Prometheus counters.
+    """
+
+    def __init__(self, maxsize=256, on_hit=None, on_miss=None, on_evict=None):
+        self.maxsize = maxsize
+        self.on_hit = on_hit
+        self.on_miss = on_miss
+        self.on_evict = on_evict
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """
+        Return the cached value for key, or default if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._data.move_to_end(key)
+                    hit = True
+                else:
+                    del self._data[key]
+                    hit = False
+            else:
+                hit = False
+
+        if hit:
+            if self.on_hit is not None:
+                self.on_hit()
+            return value
+        if self.on_miss is not None:
+            self.on_miss()
+        return default
+
+    def set(self, key, value, ttl=None):
+        """
+        Store value under key for ttl seconds (forever if ttl is None).
+        """
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        evicted = 0
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                evicted += 1
+
+        if self.on_evict is not None:
+            for _ in range(evicted):
+                self.on_evict()
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
@@ -0,0 +1,92 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Model input features, in training order
+FEATURES = ['temp', 'dew', 'humidity', 'windspeed', 'windgust', 'winddir', 'pressure', 'solarenergy']
+SEQ_LENGTH = 24  # Past 24 hours per prediction
+
+
+def target_epoch(target_date, target_hour):
+    """
+    Wall-clock epoch seconds for target_date (YYYY-MM-DD) at target_hour.
+    """
+    return int(np.datetime64(f"{target_date}T{target_hour:02d}", 's').astype(np.int64))
+
+
+def build_feature_matrix(data, features=FEATURES):
+    """
+    Flatten a Visual Crossing timeline payload into columnar arrays:
+    - epochs: (T,) int64 wall-clock epoch seconds of each hour, sorted
+    - X: (T, F) float64 feature matrix in the same order
+    Wall-clock epochs are parsed from each day's and hour's local 'datetime',
+    so they line up with the local date and hour a user asks for, also
+    across daylight saving changes.
+    Returns None if the payload has no hours or any hour lacks a required field.
+    """
+    days = data.get('days', [])
+    hours = [hour for day in days for hour in day.get('hours', [])]
+    required = ['datetime', *features]
+    if not hours or not all('datetime' in day for day in days) or not all(
+            field in hour for hour in hours for field in required):
+        print("Missing required features in the data.")
+        return None
+
+    local_times = [f"{day['datetime']}T{hour['datetime']}" for day in days for hour in day.get('hours', [])]
+    try:
+        epochs = np.array(local_times, dtype='datetime64[s]').astype(np.int64)
+    except ValueError:
+        print("Invalid datetime in the data.")
+        return None
+    X = np.array([[hour[feature] for feature in features] for hour in hours], dtype=np.float64)
+
+    # Visual Crossing returns hours in order; only sort when it did not
+    if np.any(epochs[1:] < epochs[:-1]):
+        order = np.argsort(epochs, kind='stable')
+        epochs, X = epochs[order], X[order]
+
+    return epochs, X
+
+
+def extract_windows(epochs, X, target_epochs, seq_length=SEQ_LENGTH):
+    """
+    Extract the seq_length rows ending at each target epoch in one pass.
+    Returns (windows, valid): windows is (n_valid, seq_length, F) for the
+    targets that were found with enough history, valid is an (N,) bool mask.
+    """
+    target_epochs = np.asarray(target_epochs, dtype=np.int64)
+    idx = np.searchsorted(epochs, target_epochs)
+    found = idx < len(epochs)
+    found[found] = epochs[idx[found]] == target_epochs[found]
+    valid = found & (idx >= seq_length - 1)
+
+    if len(X) < seq_length:
+        return np.empty((0, seq_length, X.shape[1]), dtype=X.dtype), valid
+
+    # (T - seq_length + 1, seq_length, F) view, window k covers rows k..k+seq_length-1
+    all_windows = sliding_window_view(X, seq_length, axis=0).transpose(0, 2, 1)
+    return all_windows[idx[valid] - (seq_length - 1)], valid
+
+
+def extract_past_24_hours(data, target_date, target_hour):
+    """
+    Extract the past 24 hours of data up to the target_date and target_hour.
+    Returns a (24, 8) view of the payload's feature matrix, or None.
+    """
+    matrix = build_feature_matrix(data)
+    if matrix is None:
+        return None
+    epochs, X = matrix
+
+    target = target_epoch(target_date, target_hour)
+    target_index = int(np.searchsorted(epochs, target))
+    if target_index >= len(epochs) or epochs[target_index] != target:
+        print("Specified datetime not found in the fetched data.")
+        return None
+
+    # Extract the past 24 hours, inclusive of target_index
+    start_index = target_index - (SEQ_LENGTH - 1)
+    if start_index < 0:
+        print("Not enough historical data to extract past 24 hours.")
+        return None
+
+    return X[start_index:target_index + 1]
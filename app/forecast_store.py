@@ -0,0 +1,149 @@
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to per-process coalescing only
+    fcntl = None
+
+POLLUTANTS = ['so2', 'no2', 'pm10', 'pm2_5', 'o3', 'co']
+
+
+def build_index(data):
+    """
+    Index an /air_pollution/forecast payload by its 'dt' epoch seconds.
+    """
+    return {
+        int(entry['dt']): {p: entry['components'].get(p, 0.0) for p in POLLUTANTS}
+        for entry in data.get('list', [])
+    }
+
+
+class PollutionForecastStore:
+    """
+    Air pollution forecast fetched at most once per refresh interval.
+
+    The dt-indexed forecast is kept in memory and mirrored to a JSON file so
+    every worker process on the host can reuse the last fetch. The file records
+    the location it was fetched for and is ignored for any other location.
+    Concurrent misses are coalesced: one thread per process refreshes while the
+    others are served the stale forecast (or wait if there is none yet), and
+    processes queue on a file lock so only the first one through calls fetch_fn.
+    After a failed fetch, no new attempt is made for retry_interval seconds.
+    """
+
+    def __init__(self, fetch_fn, path, refresh_interval=3600, retry_interval=60, location=None):
+        self.fetch_fn = fetch_fn
+        self.path = path
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        self.location = location
+        self._index = None
+        self._fetched_at = 0.0
+        self._failed_at = None
+        self._refreshing = False
+        self._cond = threading.Condition()
+
+    def get_index(self):
+        """
+        Return the forecast as {dt: pollutants}, refreshing it if it is stale.
+        Falls back to the last known forecast (or None) if the refresh fails.
+        """
+        if self._is_fresh(self._fetched_at) or self._backing_off():
+            return self._index
+
+        with self._cond:
+            while self._refreshing:
+                if self._index is not None:
+                    return self._index
+                self._cond.wait()
+            if self._is_fresh(self._fetched_at) or self._backing_off():
+                return self._index
+            self._refreshing = True
+
+        try:
+            self._refresh()
+        finally:
+            with self._cond:
+                self._refreshing = False
+                self._cond.notify_all()
+        return self._index
+
+    def _refresh(self):
+        # Another worker may already have refreshed the shared copy
+        if self._load_shared():
+            return
+
+        with self._file_lock():
+            if self._load_shared():
+                return
+
+            data = self.fetch_fn()
+            if data is None:
+                self._failed_at = time.time()
+                return
+
+            self._index = build_index(data)
+            self._fetched_at = time.time()
+            self._failed_at = None
+            self._write_shared()
+
+    def _backing_off(self):
+        return self._failed_at is not None and time.time() - self._failed_at < self.retry_interval
+
+    def _is_fresh(self, fetched_at):
+        return time.time() - fetched_at < self.refresh_interval
+
+    def _load_shared(self):
+        try:
+            with open(self.path) as f:
+                shared = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if shared.get('location') != self.location or not self._is_fresh(shared.get('fetched_at', 0.0)):
+            return False
+        self._index = {int(dt): values for dt, values in shared['entries'].items()}
+        self._fetched_at = shared['fetched_at']
+        return True
+
+    def _write_shared(self):
+        # Write to a temp file and rename so readers never see a partial file
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'location': self.location, 'fetched_at': self._fetched_at, 'entries': self._index}, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f'Error writing shared pollution forecast: {e}')
+
+    def _file_lock(self):
+        return _FileLock(self.path + '.lock')
+
+
+class _FileLock:
+    """
+    Exclusive advisory lock on a side file, a no-op where fcntl is unavailable.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            try:
+                self._file = open(self.path, 'a')
+                fcntl.flock(self._file, fcntl.LOCK_EX)
+            except OSError:
+                self._file = None
+        return self
+
+    def __exit__(self, *exc):
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
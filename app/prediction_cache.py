@@ -0,0 +1,195 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+# Bytes hashed per read when fingerprinting model artifacts
+HASH_CHUNK_BYTES = 1 << 20
+
+# Pruning removes the least recently used disk entries down to this share of the cap
+PRUNE_TARGET = 0.9
+
+# Names the model a version directory belongs to
+MODEL_MARKER = 'model'
+
+
+def artifact_version(paths):
+    """
+    Short content hash of the files (or directories) that determine the model
+    output, so a retrained or re-exported model gets a new version.
+    """
+    digest = hashlib.sha256()
+    for path in paths:
+        files = [path]
+        if os.path.isdir(path):
+            files = sorted(os.path.join(root, name) for root, _, names in os.walk(path) for name in names)
+        for file_path in files:
+            digest.update(os.path.relpath(file_path, path).encode())
+            with open(file_path, 'rb') as f:
+                for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b''):
+                    digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def window_key(window):
+    """
+    Fingerprint of one scaled model input window.
+    """
+    window = np.ascontiguousarray(window)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f'{window.dtype.str}{window.shape}'.encode())
+    digest.update(window.tobytes())
+    return digest.hexdigest()
+
+
+class PredictionCache:
+    """
+    Model results keyed by model version and the fingerprint of the scaled input window.
+
+    The same window always gives the same output for a given model, so entries
+    never expire; they are only dropped when the in-process LRU (a TTLCache) is
+    full. With a directory, entries are also kept as one small JSON file each
+    under <directory>/<version>/, shared by every worker on the host and
+    surviving restarts. The disk tier holds at most max_entries files (0 = no
+    limit): every max_entries / 10 writes, a background thread removes the
+    least recently used ones (by mtime, bumped on every hit). When a model
+    loads, retire() removes the directories of its other versions.
+    """
+
+    def __init__(self, memory, directory=None, max_entries=0, on_hit=None, on_miss=None):
+        self.memory = memory
+        self.directory = directory or None
+        self.max_entries = max_entries
+        self.on_hit = on_hit  # Called as on_hit(tier) with 'memory' or 'disk'
+        self.on_miss = on_miss
+        self._writes = 0
+        self._pruning = threading.Lock()
+
+    def get(self, version, key):
+        """
+        Return the cached (pollutants, aqi) of a model version for a window key, or None.
+        """
+        value = self.memory.get((version, key))
+        if value is not None:
+            self._record_hit('memory')
+            return value
+
+        if self.directory is not None:
+            value = self._read(version, key)
+            if value is not None:
+                self.memory.set((version, key), value)
+                self._record_hit('disk')
+                return value
+
+        if self.on_miss is not None:
+            self.on_miss()
+        return None
+
+    def set(self, version, key, pollutants, aqi):
+        value = (np.asarray(pollutants, dtype=np.float64), aqi)
+        self.memory.set((version, key), value)
+        if self.directory is not None:
+            self._write(version, key, value)
+            self._writes += 1
+            if self.max_entries and self._writes >= max(1, self.max_entries // 10):
+                self._writes = 0
+                self._prune_in_background()
+
+    def retire(self, name, version):
+        """
+        Mark the disk directory of a model version as belonging to the named
+        model and remove that model's other versions. Called when a model loads.
+        """
+        if self.directory is None:
+            return
+        try:
+            os.makedirs(os.path.join(self.directory, version), exist_ok=True)
+            with open(os.path.join(self.directory, version, MODEL_MARKER), 'w') as f:
+                f.write(name)
+            versions = os.listdir(self.directory)
+        except OSError as e:
+            print(f'Error marking prediction cache version {version}: {e}')
+            return
+
+        for other in versions:
+            if other == version:
+                continue
+            try:
+                with open(os.path.join(self.directory, other, MODEL_MARKER)) as f:
+                    owner = f.read()
+            except OSError:
+                continue
+            if owner == name:
+                shutil.rmtree(os.path.join(self.directory, other), ignore_errors=True)
+                print(f"Removed cached predictions of model '{name}' version {other}")
+        self._prune_in_background()
+
+    def prune(self):
+        """
+        Remove the least recently used disk entries of every version while there
+        are more than max_entries.
+        """
+        if self.directory is None or not self.max_entries:
+            return
+        entries = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith('.json'):
+                    path = os.path.join(root, name)
+                    try:
+                        entries.append((os.stat(path).st_mtime, path))
+                    except OSError:
+                        pass  # Removed by another worker
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        excess = len(entries) - int(self.max_entries * PRUNE_TARGET)
+        for _, path in entries[:excess]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _prune_in_background(self):
+        # At most one pruning thread per process
+        if self.max_entries and self._pruning.acquire(blocking=False):
+            threading.Thread(target=self._run_prune, daemon=True).start()
+
+    def _run_prune(self):
+        try:
+            self.prune()
+        finally:
+            self._pruning.release()
+
+    def _record_hit(self, tier):
+        if self.on_hit is not None:
+            self.on_hit(tier)
+
+    def _path(self, version, key):
+        return os.path.join(self.directory, version, key[:2], f'{key}.json')
+
+    def _read(self, version, key):
+        path = self._path(version, key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            value = np.asarray(entry['pollutants'], dtype=np.float64), entry['aqi']
+            os.utime(path)  # Recently used, so pruned last
+            return value
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write(self, version, key, value):
+        path = self._path(version, key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'pollutants': value[0].tolist(), 'aqi': value[1]}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f'Error writing prediction cache entry: {e}')
@@ -0,0 +1,96 @@
+import numpy as np
+
+from features import FEATURES, SEQ_LENGTH
+
+
+def _affine(scaler):
+    """
+    Return (mean, scale) of a fitted StandardScaler as float64 arrays.
+    """
+    n = scaler.n_features_in_
+    mean = scaler.mean_ if scaler.with_mean else np.zeros(n)
+    scale = scaler.scale_ if scaler.with_std else np.ones(n)
+    return np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+
+
+class Preprocessor:
+    """
+    Feature and target scaling compiled down to precomputed NumPy arrays.
+
+    StandardScaler.transform is x * (1 / scale) - mean / scale, so the
+    coefficients are computed once and every call becomes two in-place ufuncs
+    with no sklearn validation. All methods accept batches and an optional
+    preallocated out buffer.
+    """
+
+    def __init__(self, feature_mean, feature_scale, target_mean, target_scale, dtype=np.float32):
+        self.dtype = dtype
+        self.feature_mean = feature_mean
+        self.feature_scale = feature_scale
+        self.target_mean = target_mean
+        self.target_scale = target_scale
+
+        self._feature_mul = 1.0 / feature_scale
+        self._feature_add = -feature_mean / feature_scale
+        self._target_mul = 1.0 / target_scale
+        self._target_add = -target_mean / target_scale
+
+    @classmethod
+    def from_scalers(cls, feature_scaler, target_scaler, dtype=np.float32):
+        feature_mean, feature_scale = _affine(feature_scaler)
+        target_mean, target_scale = _affine(target_scaler)
+        return cls(feature_mean, feature_scale, target_mean, target_scale, dtype=dtype)
+
+    def transform_features(self, X, out=None):
+        """
+        Scale raw windows shaped (24, 8) or (N, 24, 8) into an (N, 24, 8) model input.
+        """
+        X = np.asarray(X).reshape(-1, SEQ_LENGTH, len(FEATURES))
+        if out is None:
+            out = np.empty(X.shape, dtype=self.dtype)
+        # Cast first, so a window scales to the same bytes whatever dtype it
+        # arrives in (the prediction cache is keyed on them)
+        np.copyto(out, X, casting='same_kind')
+        np.multiply(out, self._feature_mul, out=out, casting='same_kind')
+        np.add(out, self._feature_add, out=out, casting='same_kind')
+        return out
+
+    def transform_targets(self, y, out=None):
+        """
+        Scale raw pollutant values shaped (N, 6).
+        """
+        y = np.asarray(y, dtype=np.float64)
+        if out is None:
+            out = np.empty(y.shape, dtype=np.float64)
+        np.multiply(y, self._target_mul, out=out)
+        np.add(out, self._target_add, out=out)
+        return out
+
+    def inverse_targets(self, y_scaled, out=None):
+        """
+        Map scaled model outputs shaped (N, 6) back to pollutant concentrations.
+        """
+        y_scaled = np.asarray(y_scaled)
+        if out is None:
+            out = np.empty(y_scaled.shape, dtype=np.float64)
+        np.multiply(y_scaled, self.target_scale, out=out, casting='same_kind')
+        np.add(out, self.target_mean, out=out, casting='same_kind')
+        return out
+
+    def verify(self, feature_scaler, target_scaler, rtol=1e-5, atol=1e-5):
+        """
+        Check the compiled transforms against sklearn on a probe input.
+        Raises ValueError if they disagree.
+        """
+        rng = np.random.default_rng(0)
+        X = self.feature_mean + rng.standard_normal((SEQ_LENGTH, len(FEATURES))) * self.feature_scale
+        y = self.target_mean + rng.standard_normal((4, len(self.target_mean))) * self.target_scale
+
+        checks = [
+            (self.transform_features(X)[0], feature_scaler.transform(X)),
+            (self.transform_targets(y), target_scaler.transform(y)),
+            (self.inverse_targets(y), target_scaler.inverse_transform(y)),
+        ]
+        for ours, reference in checks:
+            if not np.allclose(ours, reference, rtol=rtol, atol=atol):
+                raise ValueError("Compiled preprocessing does not match the fitted scalers.")
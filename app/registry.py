@@ -0,0 +1,236 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+def location_key(location):
+    """
+    Normalize a 'lat,lon' location so '33.60,73.0' and '33.6,73' match.
+    Other strings (e.g. site names) are used as they are.
+    """
+    try:
+        latitude, longitude = location.split(',')
+        return f"{float(latitude)},{float(longitude)}"
+    except (AttributeError, ValueError):
+        return location
+
+
+def artifact_bytes(paths):
+    """
+    Size on disk of a model's artifacts, the lower bound of its resident memory.
+    """
+    total = 0
+    for path in paths:
+        if os.path.isdir(path):
+            total += sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+        else:
+            total += os.path.getsize(path)
+    return total
+
+
+def resident_memory():
+    """
+    Resident memory of this process in bytes, or None where /proc is not available.
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class LoadedModel:
+    """
+    One resident model version with everything needed to serve it.
+    """
+
+    def __init__(self, name, version, backend, runner, preprocessor, batcher, nbytes):
+        self.name = name
+        self.version = version  # Content hash of the artifacts
+        self.backend = backend
+        self.runner = runner
+        self.preprocessor = preprocessor
+        self.batcher = batcher
+        self.nbytes = nbytes
+
+    def close(self):
+        """
+        Stop the batcher thread and drop the runner, so the model is freed once
+        the requests still holding this LoadedModel finish.
+        """
+        if self.batcher is not None:
+            self.batcher.close()
+        self.runner = None
+
+
+class ModelRegistry:
+    """
+    Maps locations to model versions and keeps the versions in use loaded.
+
+    The registry file is JSON:
+
+        {"default": "v1",
+         "models": {"v1": {"backend": "keras", "model": "models/model.keras",
+                           "feature_scaler": "...", "target_scaler": "..."}},
+         "locations": {"33.6844,73.0479": "v1"}}
+
+    Model fields left out fall back to default_spec, and locations not listed
+    use the default model. Without the file there is a single model,
+    default_spec, named 'default'.
+
+    Models are loaded with load_fn(name, spec) on first use and kept in an LRU
+    bounded by max_models and by max_bytes of resident memory (LoadedModel.nbytes),
+    so a worker only holds the models of the sites it serves. The file is
+    re-read when its mtime changes (checked at most every check_interval
+    seconds); models whose entry changed are dropped and reloaded on their
+    next use. Dropped models are closed, which frees them once in-flight
+    requests are done with them.
+    """
+
+    def __init__(self, path, default_spec, load_fn, max_models=4, max_bytes=0, check_interval=5.0, on_change=None):
+        self.path = path
+        self.default_spec = default_spec
+        self.load_fn = load_fn
+        self.max_models = max(1, max_models)
+        self.max_bytes = max_bytes
+        self.check_interval = check_interval
+        self.on_change = on_change  # Called as on_change(resident_models, resident_bytes)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._resident = OrderedDict()
+        self._mtime = None
+        self._checked_at = 0.0
+        self.default, self.models, self.locations = self._parse(None)
+        self._reload()
+
+    def model_name(self, location):
+        """
+        Name of the model version serving a location.
+        """
+        self._maybe_reload()
+        return self.locations.get(location_key(location), self.default)
+
+    def get(self, location):
+        """
+        Return the LoadedModel serving a location, loading it if needed.
+        """
+        return self.get_model(self.model_name(location))
+
+    def get_model(self, name):
+        with self._lock:
+            loaded = self._resident.get(name)
+            if loaded is not None:
+                self._resident.move_to_end(name)
+                return loaded
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # One thread loads each model; the others wait for it instead of loading it again
+        with load_lock:
+            with self._lock:
+                loaded = self._resident.get(name)
+                spec = self.models.get(name)
+            if loaded is not None:
+                return loaded
+            if spec is None:
+                raise KeyError(f"Model '{name}' is not in the registry.")
+
+            loaded = self.load_fn(name, spec)
+            with self._lock:
+                # The entry may have been replaced while loading; serve it but do not keep it
+                if self.models.get(name) == spec:
+                    self._resident[name] = loaded
+                    dropped = self._evict(keep=name)
+                else:
+                    dropped = [loaded]
+                resident = self._usage()
+        self._close(dropped)
+        self._notify(resident)
+        return loaded
+
+    def resident(self):
+        """
+        {name: (version, bytes)} of the models currently loaded, least recently used first.
+        """
+        with self._lock:
+            return {name: (loaded.version, loaded.nbytes) for name, loaded in self._resident.items()}
+
+    def default_backend(self):
+        return self.models[self.default]['backend']
+
+    def _evict(self, keep):
+        # Called with the lock held; returns the evicted models, to be closed after releasing it
+        evicted = []
+        total = sum(loaded.nbytes for loaded in self._resident.values())
+        while len(self._resident) > 1 and (
+                len(self._resident) > self.max_models or (self.max_bytes and total > self.max_bytes)):
+            name = next(iter(self._resident))
+            if name == keep:
+                self._resident.move_to_end(name)
+                continue
+            evicted.append(self._resident.pop(name))
+            total -= evicted[-1].nbytes
+        return evicted
+
+    def _close(self, dropped):
+        # Waits for each batcher to finish its queued requests, so never called with the lock held
+        for loaded in dropped:
+            loaded.close()
+
+    def _usage(self):
+        return len(self._resident), sum(loaded.nbytes for loaded in self._resident.values())
+
+    def _notify(self, usage):
+        if self.on_change is not None:
+            self.on_change(*usage)
+
+    def _maybe_reload(self):
+        if time.monotonic() - self._checked_at >= self.check_interval:
+            self._reload()
+
+    def _reload(self):
+        self._checked_at = time.monotonic()
+        try:
+            mtime = os.path.getmtime(self.path) if self.path else None
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+
+        try:
+            if mtime is None:
+                config = None
+            else:
+                with open(self.path) as f:
+                    config = json.load(f)
+            default, models, locations = self._parse(config)
+        except (OSError, ValueError) as e:
+            print(f'Error reading model registry {self.path}, keeping the current one: {e}')
+            self._mtime = mtime
+            return
+
+        with self._lock:
+            # Drop the models whose entry changed or disappeared; they reload on next use
+            dropped = [self._resident.pop(name) for name in list(self._resident)
+                       if models.get(name) != self.models.get(name)]
+            self.default, self.models, self.locations = default, models, locations
+            self._mtime = mtime
+            usage = self._usage()
+        self._close(dropped)
+        self._notify(usage)
+        if config is not None:
+            print(f'Model registry loaded: {len(models)} models, {len(locations)} locations, default {default}')
+
+    def _parse(self, config):
+        if config is None:
+            return 'default', {'default': dict(self.default_spec)}, {}
+        models = {name: {**self.default_spec, **spec} for name, spec in config.get('models', {}).items()}
+        default = config.get('default', next(iter(models), None))
+        if default not in models:
+            raise ValueError(f"default model '{default}' is not defined under 'models'.")
+        locations = {location_key(location): name for location, name in config.get('locations', {}).items()}
+        unknown = sorted(set(locations.values()) - set(models))
+        if unknown:
+            raise ValueError(f"locations refer to undefined models: {', '.join(unknown)}.")
+        return default, models, locations
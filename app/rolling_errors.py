@@ -0,0 +1,58 @@
+import threading
+import time
+
+import numpy as np
+
+
+class RollingErrors:
+    """
+    MSE and MAE per output over a sliding time window.
+
+    Errors are summed into a ring of bucket_seconds-wide time buckets covering
+    window_seconds; a bucket is reset when the ring comes back round to it, so
+    memory is fixed and add() costs the same however much traffic there is.
+    The window therefore slides in steps of bucket_seconds.
+    """
+
+    def __init__(self, n_outputs, window_seconds=3600, bucket_seconds=60):
+        self.n_outputs = n_outputs
+        self.bucket_seconds = bucket_seconds
+        self.n_buckets = max(1, int(window_seconds // bucket_seconds))
+        self._bucket_ids = np.full(self.n_buckets, -1, dtype=np.int64)
+        self._squared = np.zeros((self.n_buckets, n_outputs))
+        self._absolute = np.zeros((self.n_buckets, n_outputs))
+        self._counts = np.zeros(self.n_buckets, dtype=np.int64)
+        self._lock = threading.Lock()
+
+    def add(self, errors, now=None):
+        """
+        Add the errors (predicted - actual) of one or more predictions, shaped (n_outputs,) or (N, n_outputs).
+        """
+        errors = np.asarray(errors, dtype=np.float64).reshape(-1, self.n_outputs)
+        squared = np.square(errors).sum(axis=0)
+        absolute = np.abs(errors).sum(axis=0)
+        bucket_id = int((time.time() if now is None else now) // self.bucket_seconds)
+        slot = bucket_id % self.n_buckets
+        with self._lock:
+            if self._bucket_ids[slot] != bucket_id:
+                self._bucket_ids[slot] = bucket_id
+                self._squared[slot] = 0.0
+                self._absolute[slot] = 0.0
+                self._counts[slot] = 0
+            self._squared[slot] += squared
+            self._absolute[slot] += absolute
+            self._counts[slot] += len(errors)
+
+    def snapshot(self, now=None):
+        """
+        Return (mse, mae, count) over the window; mse and mae are NaN while it is empty.
+        """
+        bucket_id = int((time.time() if now is None else now) // self.bucket_seconds)
+        with self._lock:
+            live = self._bucket_ids > bucket_id - self.n_buckets
+            count = int(self._counts[live].sum())
+            squared = self._squared[live].sum(axis=0)
+            absolute = self._absolute[live].sum(axis=0)
+        if count == 0:
+            return np.full(self.n_outputs, np.nan), np.full(self.n_outputs, np.nan), 0
+        return squared / count, absolute / count, count
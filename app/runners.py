@@ -0,0 +1,82 @@
+import importlib
+
+import numpy as np
+
+
+class KerasRunner:
+    """
+    Runs the original Keras model with full TensorFlow.
+    """
+
+    backend = 'keras'
+    library = 'tensorflow'
+    fork_safe = False  # TensorFlow hangs in a forked child once it has run in the parent
+
+    def __init__(self, path):
+        # Imported here so the exported backends never pay for TensorFlow
+        from tensorflow.keras.models import load_model
+        self.path = path
+        self.model = load_model(path)
+
+    def predict(self, X):
+        return np.asarray(self.model.predict_on_batch(X))
+
+
+class OnnxRunner:
+    """
+    Runs a model exported with src/export_model.py on ONNX Runtime (CPU only).
+    """
+
+    backend = 'onnx'
+    library = 'onnxruntime'
+    fork_safe = True
+
+    def __init__(self, path, threads=None):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.path = path
+        self.session = ort.InferenceSession(path, sess_options=options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, X):
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        return self.session.run(None, {self.input_name: X})[0]
+
+
+RUNNERS = {
+    KerasRunner.backend: KerasRunner,
+    OnnxRunner.backend: OnnxRunner,
+}
+
+# Default artifact for each backend, relative to the project root
+DEFAULT_MODEL_PATHS = {
+    KerasRunner.backend: "models/model.keras",
+    OnnxRunner.backend: "models/model.onnx",
+}
+
+
+def runner_is_fork_safe(backend):
+    """
+    Whether a runner of this backend can be loaded before forking workers.
+    """
+    return backend in RUNNERS and RUNNERS[backend].fork_safe
+
+
+def import_backend(backend):
+    """
+    Import a backend's library ahead of loading a model, so the memory measured
+    for the model does not include the library itself.
+    """
+    if backend in RUNNERS:
+        importlib.import_module(RUNNERS[backend].library)
+
+
+def load_runner(backend, path, **kwargs):
+    """
+    Create the model runner for the given backend name.
+    """
+    if backend not in RUNNERS:
+        raise ValueError(f"Unknown model backend '{backend}'. Choose one of: {', '.join(RUNNERS)}.")
+    return RUNNERS[backend](path, **kwargs)
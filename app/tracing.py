@@ -0,0 +1,130 @@
+import contextvars
+import cProfile
+import functools
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+# (stage, seconds) pairs of the current request; None outside a request
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+class Tracer:
+    """
+    Stage timings for the prediction pipeline.
+
+    Code is timed with the stage() context manager or the traced() decorator.
+    Every timing is passed to on_stage(stage, seconds), e.g. a Prometheus
+    histogram with a stage label, and, inside a request started with
+    start_request(), also collected for that request. Requests are tracked in
+    a context variable, so work submitted to the upstream thread pool (which
+    copies the caller's context) is attributed to the request that submitted it.
+    """
+
+    def __init__(self, on_stage=None):
+        self.on_stage = on_stage
+
+    def start_request(self):
+        _request_timings.set([])
+
+    def request_timings(self):
+        return _request_timings.get() or []
+
+    def record(self, stage, seconds):
+        if self.on_stage is not None:
+            self.on_stage(stage, seconds)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, seconds))
+
+    @contextmanager
+    def stage(self, name):
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start_time)
+
+    def traced(self, name):
+        """
+        Decorator timing every call of a function as the given stage.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(name):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+def server_timing(timings):
+    """
+    Format (stage, seconds) pairs as a Server-Timing header value, summing repeated stages.
+    """
+    totals = {}
+    for stage, seconds in timings:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ', '.join(f'{stage};dur={seconds * 1000:.2f}' for stage, seconds in totals.items())
+
+
+class SamplingProfiler:
+    """
+    Profiles a random sample of requests with cProfile while switched on.
+
+    Sampling is controlled at runtime, without a restart, by the file at
+    control_path: it holds the share of requests to profile (0 to 1, empty
+    means all of them), and deleting it switches profiling off. The file is
+    checked at most every check_interval seconds, so every worker process
+    follows it. Each sampled request is saved as
+    <directory>/<time>-<pid>-<name>.prof for pstats or snakeviz. At most one
+    request per process is profiled at a time.
+    """
+
+    def __init__(self, control_path, directory, check_interval=1.0):
+        self.control_path = control_path
+        self.directory = directory
+        self.check_interval = check_interval
+        self._rate = 0.0
+        self._checked_at = None
+        self._active = threading.Lock()
+
+    def rate(self):
+        now = time.monotonic()
+        if self._checked_at is None or now - self._checked_at >= self.check_interval:
+            self._checked_at = now
+            try:
+                with open(self.control_path) as f:
+                    self._rate = min(max(float(f.read().strip() or 1.0), 0.0), 1.0)
+            except (OSError, ValueError):
+                self._rate = 0.0
+        return self._rate
+
+    def start(self):
+        """
+        Return a running profile if this request is sampled, else None.
+        """
+        if not self.control_path:
+            return None
+        rate = self.rate()
+        if rate <= 0.0 or random.random() >= rate or not self._active.acquire(blocking=False):
+            return None
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile
+
+    def stop(self, profile, name):
+        """
+        Stop a profile returned by start() and save it.
+        """
+        profile.disable()
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}-{name}.prof")
+            profile.dump_stats(path)
+        except OSError as e:
+            print(f'Error saving request profile: {e}')
+        finally:
+            self._active.release()
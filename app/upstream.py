@@ -0,0 +1,80 @@
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class UpstreamClient:
+    """
+    Pooled HTTP client for the upstream weather and pollution APIs.
+
+    A single requests.Session keeps keep-alive connections to each host, every
+    call has connect/read timeouts and retries with exponential backoff on
+    connection errors and 429/5xx responses, and a small thread pool lets the
+    app issue independent upstream calls concurrently. Session and pool are
+    created lazily per process so they are never shared across a fork.
+    """
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10, retries=2, backoff_factor=0.3,
+                 pool_size=16, max_workers=8, on_request=None):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.pool_size = pool_size
+        self.max_workers = max_workers
+        self.on_request = on_request  # Called as on_request(upstream, seconds) after each call
+        self._lock = threading.Lock()
+        self._pid = None
+        self._session = None
+        self._executor = None
+
+    def get(self, upstream, url, params=None):
+        """
+        GET url through the pooled session and return the response.
+        Raises requests exceptions on failure, including non-2xx statuses.
+        """
+        session, _ = self._resources()
+        start_time = time.time()
+        try:
+            response = session.get(url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            return response
+        finally:
+            if self.on_request is not None:
+                self.on_request(upstream, time.time() - start_time)
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) on the I/O thread pool and return a Future.
+        fn runs in a copy of the caller's context (e.g. its request tracing).
+        """
+        _, executor = self._resources()
+        return executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
+
+    def _resources(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._session = self._build_session()
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="upstream")
+                    self._pid = os.getpid()
+        return self._session, self._executor
+
+    def _build_session(self):
+        retry = Retry(
+            total=self.retries,
+            backoff_factor=self.backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset(['GET']),
+            raise_on_status=False
+        )
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size, max_retries=retry)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
@@ -0,0 +1,88 @@
+"""
+Benchmark the table-driven AQI classification against the app's original loop
+and check that both give the same level for every row.
+
+    python benchmarks/bench_aqi.py --rows 100000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from aqi import AQI_LEVELS, AQI_RANGES, LOWER_BOUNDS, POLLUTANTS, aqi_indices, aqi_levels, determine_aqi
+
+
+def legacy_determine_aqi(pollutant_values):
+    # The original per-pollutant loop from app/app.py
+    max_aqi_level = "Good"
+    highest_aqi_index = -1  # Initialize to lowest AQI level
+
+    # Iterate over each pollutant and determine its AQI level
+    for pollutant, value in pollutant_values.items():
+        for idx, aqi in enumerate(AQI_RANGES):
+            lower, upper = aqi[pollutant]
+            if lower <= value < upper:
+                if idx > highest_aqi_index:
+                    highest_aqi_index = idx
+                    max_aqi_level = aqi["level"]
+                break
+            elif value >= aqi[pollutant][1]:
+                continue
+
+    return max_aqi_level
+
+
+def sample_values(rows, seed=0):
+    """
+    Random concentrations across all levels, plus every breakpoint exactly,
+    values just below it, and negative, inf and NaN values.
+    """
+    rng = np.random.default_rng(seed)
+    top = LOWER_BOUNDS[:, -1] * 1.5
+    values = rng.uniform(0, 1, size=(rows, len(POLLUTANTS))) * top
+
+    edges = LOWER_BOUNDS.T
+    special = np.concatenate([
+        edges,
+        np.nextafter(edges, -np.inf),
+        np.full((1, len(POLLUTANTS)), -1.0),
+        np.full((1, len(POLLUTANTS)), np.inf),
+        np.full((1, len(POLLUTANTS)), np.nan),
+    ])
+    # Put each special value into otherwise random rows, one pollutant at a time
+    mixed = np.repeat(values[:len(special)], len(POLLUTANTS), axis=0)
+    for i in range(len(POLLUTANTS)):
+        mixed[i::len(POLLUTANTS), i] = special[:, i]
+    return np.concatenate([values, special, mixed])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100000)
+    args = parser.parse_args()
+
+    values = sample_values(args.rows)
+    rows = [dict(zip(POLLUTANTS, row)) for row in values.tolist()]
+
+    start = time.perf_counter()
+    expected = [legacy_determine_aqi(row) for row in rows]
+    legacy_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    indices = aqi_indices(values)
+    vectorized_time = time.perf_counter() - start
+
+    assert [AQI_LEVELS[i] for i in indices] == expected, 'aqi_indices differs from the original loop'
+    assert aqi_levels(values) == expected, 'aqi_levels differs from the original loop'
+    assert [determine_aqi(row) for row in rows[-200:]] == expected[-200:], 'determine_aqi differs from the original loop'
+
+    print(f'{len(values)} rows, identical levels')
+    print(f'loop:       {legacy_time * 1000:10.2f} ms')
+    print(f'vectorized: {vectorized_time * 1000:10.2f} ms ({legacy_time / vectorized_time:.0f}x)')
+
+
+if __name__ == '__main__':
+    main()
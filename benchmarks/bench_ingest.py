@@ -0,0 +1,96 @@
+"""
+Benchmark the streaming history parsers against loading whole responses with
+json.load and pd.json_normalize, checking that both give the same rows.
+
+    python benchmarks/bench_ingest.py --days 365
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from air_collector import AIR_QUALITY_COLUMNS, AIR_QUALITY_TIMESTAMP, air_quality_record_chunks
+from history_store import PARQUET_COMPRESSION
+from stub_upstream import RecordedPayloads
+from weather_collector import WEATHER_COLUMNS, WEATHER_TIMESTAMP, weather_record_chunks
+
+
+def legacy_weather_records(data):
+    # The collectors' original flattening
+    hours = pd.json_normalize(data.get('days', []), 'hours')
+    records = hours.reindex(columns=[WEATHER_TIMESTAMP] + WEATHER_COLUMNS)
+    records[WEATHER_COLUMNS] = records[WEATHER_COLUMNS].astype(float)
+    return records[records[WEATHER_TIMESTAMP] <= time.time()]
+
+
+def legacy_air_quality_records(data):
+    return pd.json_normalize(data.get('list', []))
+
+
+def profiled(fn):
+    """
+    Run fn, returning (seconds, peak traced memory in bytes, result).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, result
+
+
+def count_rows(chunks):
+    # Only a running total is kept, as when each chunk goes straight to the store
+    return sum(len(chunk) for chunk in chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--days', type=int, default=365, help='Days of hourly history per response.')
+    args = parser.parse_args()
+
+    payloads = RecordedPayloads.synthetic()
+    end = datetime.date(2024, 12, 31)
+    start = end - datetime.timedelta(days=args.days - 1)
+    start_epoch = int(datetime.datetime(start.year, start.month, start.day, tzinfo=datetime.timezone.utc).timestamp())
+    responses = {
+        'weather': (json.dumps(payloads.weather('33.6844,73.0479', start, end, tzoffset=0.0)).encode(),
+                    legacy_weather_records, weather_record_chunks, WEATHER_TIMESTAMP, WEATHER_COLUMNS),
+        'air_quality': (json.dumps(payloads.pollution(33.6844, 73.0479, start_epoch, start_epoch + args.days * 86400 - 1)).encode(),
+                        legacy_air_quality_records, air_quality_record_chunks, AIR_QUALITY_TIMESTAMP, AIR_QUALITY_COLUMNS),
+    }
+
+    for name, (body, legacy, streaming, timestamp, columns) in responses.items():
+        legacy_time, legacy_peak, expected = profiled(lambda: legacy(json.load(io.BytesIO(body))))
+        stream_time, stream_peak, rows = profiled(lambda: count_rows(streaming(io.BytesIO(body))))
+
+        chunks = pd.concat(list(streaming(io.BytesIO(body))), ignore_index=True)
+        assert np.array_equal(chunks[timestamp].to_numpy(), expected[timestamp].to_numpy()), f'{name}: timestamps differ'
+        assert np.allclose(chunks[columns].to_numpy(np.float64), expected[columns].to_numpy(np.float64).astype(np.float32),
+                           equal_nan=True), f'{name}: values differ'
+
+        pretty = len(json.dumps(json.loads(body), indent=4).encode())
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'data.parquet')
+            chunks.to_parquet(path, index=False, compression=PARQUET_COMPRESSION)
+            stored = os.path.getsize(path)
+
+        print(f'{name}: {rows} hours, {len(body) / 2**20:.1f} MiB response')
+        print(f'  json.load + json_normalize: {legacy_time * 1000:8.1f} ms  peak {legacy_peak / 2**20:7.1f} MiB')
+        print(f'  streaming chunks:           {stream_time * 1000:8.1f} ms  peak {stream_peak / 2**20:7.1f} MiB')
+        print(f'  on disk: indented JSON {pretty / 2**20:.1f} MiB, {PARQUET_COMPRESSION} Parquet {stored / 2**20:.2f} MiB')
+
+
+if __name__ == '__main__':
+    main()
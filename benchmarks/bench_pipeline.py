@@ -0,0 +1,130 @@
+"""
+Microbenchmarks of the prediction pipeline stages at batch sizes 1 to 1024.
+
+    python benchmarks/bench_pipeline.py --models-dir models --output benchmarks/results/pipeline.json
+
+Stages, run on the app's own modules with stub weather payloads:
+- extract_past_24_hours: one window from a two-day timeline, as / fetches it
+- extract_windows: N windows from one timeline, as /api/predict and /api/forecast do
+- preprocess_data: feature scaling (Preprocessor.transform_features) of N windows
+- determine_aqi: one dict, and aqi_levels over an (N, 6) batch
+- predict_<backend>: model.predict of N windows, for every backend whose model file exists
+"""
+import argparse
+import datetime
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from aqi import POLLUTANTS, aqi_levels, determine_aqi
+from features import FEATURES, SEQ_LENGTH, build_feature_matrix, extract_past_24_hours, extract_windows, target_epoch
+from preprocessing import Preprocessor
+from results import summarize, write_results
+from runners import DEFAULT_MODEL_PATHS, load_runner
+from stub_upstream import RecordedPayloads
+
+DEFAULT_BATCH_SIZES = '1,2,4,8,16,32,64,128,256,512,1024'
+
+
+def measure(fn, min_time, min_calls):
+    """
+    Call fn once to warm up, then until both min_time seconds and min_calls have passed.
+    Returns the duration of every timed call.
+    """
+    fn()
+    samples = []
+    start = time.perf_counter()
+    while len(samples) < min_calls or time.perf_counter() - start < min_time:
+        call_start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - call_start)
+    return samples
+
+
+def result(name, batch_size, samples):
+    summary = summarize(samples)
+    summary['rows_per_s'] = round(batch_size * len(samples) / sum(samples), 1)
+    print(f"{name:<24} {batch_size:>5}  p50 {summary['p50_ms']:>10.4f} ms  p99 {summary['p99_ms']:>10.4f} ms"
+          f"  {summary['rows_per_s']:>14,.0f} rows/s")
+    return {'name': f'{name}/{batch_size}', 'stage': name, 'batch_size': batch_size, **summary}
+
+
+def timeline(payloads, days, end=datetime.date(2024, 12, 31)):
+    start = end - datetime.timedelta(days=days - 1)
+    return payloads.weather('33.6844,73.0479', start, end, tzoffset=5.0,
+                            elements={'datetime', 'datetimeEpoch', *FEATURES})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--models-dir', default='models', help='Directory with the model and scaler files.')
+    parser.add_argument('--backends', default='keras,onnx', help='Model backends to time, if their model file exists.')
+    parser.add_argument('--batch-sizes', default=DEFAULT_BATCH_SIZES)
+    parser.add_argument('--min-time', type=float, default=0.5, help='Seconds to time each case for, at least.')
+    parser.add_argument('--min-calls', type=int, default=20)
+    parser.add_argument('--output', default='benchmarks/results/pipeline.json')
+    args = parser.parse_args()
+
+    batch_sizes = [int(size) for size in args.batch_sizes.split(',')]
+    payloads = RecordedPayloads.synthetic()
+    results = []
+
+    def run(name, batch_size, fn):
+        results.append(result(name, batch_size, measure(fn, args.min_time, args.min_calls)))
+
+    # One window from the two days / fetches (the target day and the day before)
+    two_days = timeline(payloads, 2)
+    run('extract_past_24_hours', 1, lambda: extract_past_24_hours(two_days, '2024-12-31', 15))
+
+    # N windows ending at consecutive hours of a timeline covering them all
+    for batch_size in batch_sizes:
+        data = timeline(payloads, (batch_size + SEQ_LENGTH - 1) // 24 + 1)
+        last = target_epoch('2024-12-31', 23)
+        targets = last - 3600 * np.arange(batch_size)[::-1]
+
+        def windows(data=data, targets=targets):
+            epochs, X = build_feature_matrix(data)
+            return extract_windows(epochs, X, targets)
+
+        run('extract_windows', batch_size, windows)
+
+    rng = np.random.default_rng(0)
+    raw_windows = {size: rng.normal(10, 3, (size, SEQ_LENGTH, len(FEATURES))) for size in batch_sizes}
+
+    feature_scaler_path = os.path.join(args.models_dir, 'feature_scaler.joblib')
+    target_scaler_path = os.path.join(args.models_dir, 'target_scaler.joblib')
+    if os.path.exists(feature_scaler_path) and os.path.exists(target_scaler_path):
+        preprocessor = Preprocessor.from_scalers(joblib.load(feature_scaler_path), joblib.load(target_scaler_path))
+        for batch_size in batch_sizes:
+            run('preprocess_data', batch_size, lambda X=raw_windows[batch_size]: preprocessor.transform_features(X))
+    else:
+        print(f'Scalers not found in {args.models_dir}, skipping preprocess_data.')
+
+    # Concentrations spread over every AQI level
+    concentrations = {size: rng.lognormal(3, 1.5, (size, len(POLLUTANTS))) for size in batch_sizes}
+    single = dict(zip(POLLUTANTS, concentrations[batch_sizes[0]][0].tolist()))
+    run('determine_aqi', 1, lambda: determine_aqi(single))
+    for batch_size in batch_sizes:
+        run('aqi_levels', batch_size, lambda values=concentrations[batch_size]: aqi_levels(values))
+
+    for backend in args.backends.split(','):
+        model_path = os.path.join(args.models_dir, os.path.basename(DEFAULT_MODEL_PATHS[backend]))
+        if not os.path.exists(model_path):
+            print(f'{model_path} not found, skipping the {backend} backend.')
+            continue
+        runner = load_runner(backend, model_path)
+        for batch_size in batch_sizes:
+            X = raw_windows[batch_size].astype(np.float32)
+            run(f'predict_{backend}', batch_size, lambda X=X: runner.predict(X))
+
+    write_results(args.output, 'pipeline', results, batch_sizes=batch_sizes, min_time=args.min_time,
+                  min_calls=args.min_calls, models_dir=args.models_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark the compiled Preprocessor against sklearn's StandardScaler and check
+that both give the same values for batched, float32 and in-place inputs.
+
+    python benchmarks/bench_preprocessing.py --rows 4096
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from aqi import POLLUTANTS
+from features import FEATURES, SEQ_LENGTH
+from preprocessing import Preprocessor
+
+# Model inputs are float32, so scaled features are compared at float32 precision
+RTOL = 1e-5
+ATOL = 1e-5
+
+
+def fitted_scalers(seed=0):
+    """
+    StandardScalers fitted on random data with per-column means and scales of
+    very different magnitudes, like the weather features and pollutants.
+    """
+    rng = np.random.default_rng(seed)
+    features = rng.uniform(-50, 1000, len(FEATURES)) + rng.standard_normal((5000, len(FEATURES))) * rng.uniform(0.1, 200, len(FEATURES))
+    targets = rng.uniform(0, 500, len(POLLUTANTS)) + rng.standard_normal((5000, len(POLLUTANTS))) * rng.uniform(0.5, 300, len(POLLUTANTS))
+    return StandardScaler().fit(features), StandardScaler().fit(targets)
+
+
+def check(name, ours, reference):
+    assert ours.shape == reference.shape, f'{name}: shape {ours.shape}, expected {reference.shape}'
+    assert np.allclose(ours, reference, rtol=RTOL, atol=ATOL), \
+        f'{name}: max difference {np.max(np.abs(ours - reference)):.3g}'
+
+
+def timed(fn, repeat=20):
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=4096, help='Windows per batch.')
+    args = parser.parse_args()
+
+    feature_scaler, target_scaler = fitted_scalers()
+    preprocessor = Preprocessor.from_scalers(feature_scaler, target_scaler)
+    preprocessor.verify(feature_scaler, target_scaler)
+
+    rng = np.random.default_rng(1)
+    X = feature_scaler.mean_ + rng.standard_normal((args.rows, SEQ_LENGTH, len(FEATURES))) * feature_scaler.scale_
+    y = target_scaler.mean_ + rng.standard_normal((args.rows, len(POLLUTANTS))) * target_scaler.scale_
+
+    def sklearn_features(X):
+        return feature_scaler.transform(X.reshape(-1, len(FEATURES))).reshape(-1, SEQ_LENGTH, len(FEATURES))
+
+    expected = sklearn_features(X)
+    for dtype in (np.float64, np.float32):
+        X_in = X.astype(dtype)
+        # The reference sees the same rounded inputs
+        reference = sklearn_features(X_in.astype(np.float64))
+        check(f'transform_features {dtype.__name__}', preprocessor.transform_features(X_in), reference)
+        check(f'transform_features {dtype.__name__} window', preprocessor.transform_features(X_in[0]), reference[:1])
+
+        buffer = np.empty((args.rows, SEQ_LENGTH, len(FEATURES)), dtype=np.float32)
+        result = preprocessor.transform_features(X_in, out=buffer)
+        assert result is buffer, 'transform_features did not write into out'
+        check(f'transform_features {dtype.__name__} out=', buffer, reference)
+
+        check(f'transform_targets {dtype.__name__}', preprocessor.transform_targets(y.astype(dtype)),
+              target_scaler.transform(y.astype(dtype).astype(np.float64)))
+
+        y_scaled = target_scaler.transform(y).astype(dtype)  # Model outputs are float32
+        out = np.empty(y_scaled.shape, dtype=np.float64)
+        result = preprocessor.inverse_targets(y_scaled, out=out)
+        assert result is out, 'inverse_targets did not write into out'
+        reference = target_scaler.inverse_transform(y_scaled.astype(np.float64))
+        check(f'inverse_targets {dtype.__name__}', preprocessor.inverse_targets(y_scaled), reference)
+        check(f'inverse_targets {dtype.__name__} out=', out, reference)
+
+    # In place, as /api/predict scales its float32 batch buffer
+    X_batch = X.astype(np.float32)
+    preprocessor.transform_features(X_batch, out=X_batch)
+    check('transform_features in place', X_batch, sklearn_features(X.astype(np.float32).astype(np.float64)))
+
+    buffer = np.empty((args.rows, SEQ_LENGTH, len(FEATURES)), dtype=np.float32)
+    sklearn_time = timed(lambda: sklearn_features(X))
+    compiled_time = timed(lambda: preprocessor.transform_features(X, out=buffer))
+    print(f'{args.rows} windows, {expected.size} values, same results as StandardScaler')
+    print(f'StandardScaler.transform: {sklearn_time * 1000:8.3f} ms')
+    print(f'transform_features:       {compiled_time * 1000:8.3f} ms ({sklearn_time / compiled_time:.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Benchmark the vectorized create_sequences against the notebook's row loop.
+
+    python benchmarks/bench_sequences.py --hours 2000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src'))
+from sequences import create_sequences
+
+FEATURES = ['temp', 'dew', 'humidity', 'windspeed', 'windgust', 'winddir', 'pressure', 'solarenergy']
+TARGETS = ['components.so2', 'components.no2', 'components.pm10', 'components.pm2_5', 'components.o3', 'components.co']
+SEQ_LENGTH = 24
+
+
+def legacy_create_sequences(df, seq_length, features, targets):
+    # The original loop from src/lstm.ipynb
+    X = []
+    y = []
+
+    for i in range(len(df) - seq_length):
+        X_seq = df[features].iloc[i:i+seq_length].values
+        y_seq = df[targets].iloc[i+seq_length].values
+        X.append(X_seq)
+        y.append(y_seq)
+
+    return np.array(X), np.array(y)
+
+
+def synthetic_history(hours, gap_fraction, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.normal(size=(hours, len(FEATURES) + len(TARGETS))), columns=FEATURES + TARGETS)
+    df.insert(0, 'datetime', pd.date_range('2022-01-01', periods=hours, freq='h'))
+    # Drop random hours, like the notebook's outlier removal does
+    keep = rng.random(hours) >= gap_fraction
+    return df[keep].reset_index(drop=True)
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--hours', type=int, default=2000,
+                        help='Rows of synthetic hourly history (the loop copies the frame per row, so it grows quadratically).')
+    parser.add_argument('--gap-fraction', type=float, default=0.01, help='Fraction of hours removed.')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs of the vectorized version (best is reported).')
+    args = parser.parse_args()
+
+    df = synthetic_history(args.hours, args.gap_fraction)
+    print(f'{len(df)} rows, {SEQ_LENGTH}-hour windows, {len(FEATURES)} features')
+
+    legacy_time, (X_legacy, y_legacy) = timed(lambda: legacy_create_sequences(df, SEQ_LENGTH, FEATURES, TARGETS), 1)
+    view_time, (X_view, y_view) = timed(lambda: create_sequences(df, SEQ_LENGTH, FEATURES, TARGETS), args.repeat)
+    copy_time, _ = timed(lambda: create_sequences(df, SEQ_LENGTH, FEATURES, TARGETS, copy=True), args.repeat)
+    gap_time, (X_gap, _) = timed(
+        lambda: create_sequences(df, SEQ_LENGTH, FEATURES, TARGETS, timestamp_column='datetime'), args.repeat)
+
+    # Without a timestamp column the windows must match the loop exactly
+    assert np.array_equal(X_view, X_legacy) and np.array_equal(y_view, y_legacy), 'create_sequences differs from the loop'
+
+    print(f'legacy loop:                {legacy_time * 1000:10.1f} ms  {X_legacy.shape}')
+    print(f'vectorized (view):          {view_time * 1000:10.1f} ms  {X_view.shape}  {legacy_time / view_time:.0f}x')
+    print(f'vectorized (copy):          {copy_time * 1000:10.1f} ms  {legacy_time / copy_time:.0f}x')
+    print(f'vectorized (skip gaps):     {gap_time * 1000:10.1f} ms  {X_gap.shape}  {legacy_time / gap_time:.0f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Compare a benchmark results file with a baseline and flag regressions.
+
+    python benchmarks/compare.py baseline.json benchmarks/results/pipeline.json --threshold 10
+
+Results are matched by name. Latency percentiles regress when they grow and
+throughput when it drops, by more than --threshold percent; the exit code is
+1 if anything regressed, so this can gate CI.
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from results import load_results
+
+# Metric -> True if higher is better
+METRICS = {'p50_ms': False, 'p99_ms': False, 'throughput': True, 'rows_per_s': True}
+
+
+def compare(baseline, current, threshold):
+    """
+    Return rows of (name, metric, baseline, current, change %, regressed).
+    """
+    baseline_results = {result['name']: result for result in baseline['results']}
+    rows = []
+    for result in current['results']:
+        reference = baseline_results.get(result['name'])
+        if reference is None:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            if metric not in result or not reference.get(metric):
+                continue
+            change = (result[metric] - reference[metric]) / reference[metric] * 100
+            regressed = -change > threshold if higher_is_better else change > threshold
+            rows.append((result['name'], metric, reference[metric], result[metric], change, regressed))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=10.0, help='Allowed change in percent.')
+    args = parser.parse_args()
+
+    baseline, current = load_results(args.baseline), load_results(args.current)
+    if baseline['suite'] != current['suite']:
+        print(f"Warning: comparing a '{current['suite']}' run with a '{baseline['suite']}' baseline.")
+    print(f"baseline {baseline['environment'].get('commit')} ({baseline['environment']['time']}), "
+          f"current {current['environment'].get('commit')} ({current['environment']['time']})")
+
+    rows = compare(baseline, current, args.threshold)
+    for name, metric, before, after, change, regressed in rows:
+        flag = '  REGRESSION' if regressed else ''
+        print(f'{name:<28} {metric:<11} {before:>14.4f} {after:>14.4f} {change:>+8.1f}%{flag}')
+
+    regressions = sum(row[-1] for row in rows)
+    print(f'{len(rows)} comparisons, {regressions} regressions beyond {args.threshold}%')
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+End-to-end load test of the Flask app against the stub upstream APIs.
+
+    python benchmarks/load_test.py --scenarios predict,forecast --concurrency 8 --duration 20
+
+Unless --url points at an app that is already running (and configured for
+the upstreams it should use), this starts benchmarks/stub_upstream.py and the
+app with python app/app.py (or gunicorn with --server gunicorn) from
+--workdir, which must hold the models/ directory, and stops them afterwards.
+
+Scenarios:
+- index:    POST / (prediction and validation against the pollution forecast)
+- predict:  POST /api/predict with one item
+- batch:    POST /api/predict with --items items
+- forecast: GET /api/forecast for --hours hours
+Requests pick random hours of the --days days starting today, so the caches
+warm up as they would for a real audience asking about the coming days.
+"""
+import argparse
+import datetime
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from results import REPO_ROOT, summarize, write_results
+from stub_upstream import PAYLOAD_DIR, RecordedPayloads, StubUpstream
+
+SCENARIOS = ['index', 'predict', 'batch', 'forecast']
+
+
+def scenario_request(scenario, rng, dates, items, hours):
+    """
+    (method, path, kwargs) of one request of the scenario.
+    """
+    date = rng.choice(dates)
+    if scenario == 'index':
+        return 'POST', '/', {'data': {'date': date, 'hour': rng.randrange(24)}}
+    if scenario == 'predict':
+        return 'POST', '/api/predict', {'json': {'items': [{'date': date, 'hour': rng.randrange(24)}]}}
+    if scenario == 'batch':
+        batch = [{'date': rng.choice(dates), 'hour': rng.randrange(24)} for _ in range(items)]
+        return 'POST', '/api/predict', {'json': {'items': batch}}
+    if scenario == 'forecast':
+        return 'GET', '/api/forecast', {'params': {'date': date, 'hour': rng.randrange(24), 'hours': hours}}
+    raise ValueError(f"Unknown scenario '{scenario}'. Choose from: {', '.join(SCENARIOS)}.")
+
+
+def run_scenario(url, scenario, args, dates):
+    """
+    Send requests from args.concurrency threads for args.warmup then args.duration
+    seconds; only the requests started after the warm-up are counted.
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    measure_from = started + args.warmup
+    stop_at = measure_from + args.duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        session = requests.Session()
+        while True:
+            method, path, kwargs = scenario_request(scenario, rng, dates, args.items, args.hours)
+            request_start = time.perf_counter()
+            if request_start >= stop_at:
+                break
+            try:
+                response = session.request(method, url + path, timeout=args.timeout, **kwargs)
+                error = None if response.status_code < 400 else f'HTTP {response.status_code}'
+            except requests.RequestException as e:
+                error = type(e).__name__
+            latency = time.perf_counter() - request_start
+            if request_start >= measure_from:
+                with lock:
+                    latencies.append(latency)
+                    if error is not None:
+                        errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(args.seed + i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    summary = summarize(latencies)
+    result = {
+        'name': scenario,
+        'concurrency': args.concurrency,
+        'duration_s': args.duration,
+        'requests': len(latencies),
+        'errors': len(errors),
+        'throughput': round((len(latencies) - len(errors)) / args.duration, 2),
+        **summary,
+    }
+    if errors:
+        result['error_kinds'] = {kind: errors.count(kind) for kind in sorted(set(errors))}
+    print(f"{scenario:<10} {result['throughput']:>9.1f} req/s  {len(errors)} errors"
+          f"  p50 {summary.get('p50_ms', 0):.1f} ms  p90 {summary.get('p90_ms', 0):.1f} ms"
+          f"  p99 {summary.get('p99_ms', 0):.1f} ms")
+    return result
+
+
+def start_app(args, stub):
+    """
+    Start the app against the stub and wait until /readyz answers. Returns (process, url).
+    """
+    port = args.port
+    env = {
+        **os.environ,
+        **stub.environ(),
+        'LATITUDE': os.getenv('LATITUDE', '33.6844'),
+        'LONGITUDE': os.getenv('LONGITUDE', '73.0479'),
+        'VISUAL_CROSSING_API_KEY': 'stub',
+        'OPENWEATHER_API_KEY': 'stub',
+        'POLLUTION_FORECAST_PATH': os.path.join(tempfile.mkdtemp(prefix='load-test-'), 'pollution_forecast.json'),
+        'PORT': str(port),
+    }
+    if args.server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', '-c', os.path.join(REPO_ROOT, 'gunicorn.conf.py'),
+                   '--chdir', args.workdir, '--pythonpath', os.path.join(REPO_ROOT, 'app')]
+    else:
+        # The development server always listens on port 5000
+        port = 5000
+        command = [sys.executable, os.path.join(REPO_ROOT, 'app', 'app.py')]
+    log = open(os.path.join(tempfile.gettempdir(), 'load-test-app.log'), 'w')
+    process = subprocess.Popen(command, cwd=args.workdir, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + args.startup_timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'The app exited with code {process.returncode}, see {log.name}.')
+        try:
+            if requests.get(f'{url}/readyz', timeout=1).status_code == 200:
+                return process, url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f'The app was not ready after {args.startup_timeout}s, see {log.name}.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', help='Base URL of a running app; by default the stub and the app are started here.')
+    parser.add_argument('--server', choices=['flask', 'gunicorn'], default='flask')
+    parser.add_argument('--port', type=int, default=5000, help='Port of the gunicorn server.')
+    parser.add_argument('--workdir', default=REPO_ROOT, help='Working directory of the app (with models/).')
+    parser.add_argument('--startup-timeout', type=float, default=180)
+    parser.add_argument('--payloads', default=PAYLOAD_DIR, help='Directory of recorded upstream payloads.')
+    parser.add_argument('--upstream-latency-ms', type=float, default=0.0, help='Delay added by the stub upstreams.')
+    parser.add_argument('--scenarios', default='predict,forecast', help=f"Comma-separated: {', '.join(SCENARIOS)}.")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds per scenario.')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before each scenario.')
+    parser.add_argument('--days', type=int, default=3)
+    parser.add_argument('--items', type=int, default=32, help='Items per batch request.')
+    parser.add_argument('--hours', type=int, default=24, help='Hours per forecast request.')
+    parser.add_argument('--timeout', type=float, default=30)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='benchmarks/results/load.json')
+    args = parser.parse_args()
+
+    today = datetime.date.today()
+    dates = [(today + datetime.timedelta(days=i)).isoformat() for i in range(args.days)]
+
+    stub = process = None
+    url = args.url.rstrip('/') if args.url else None
+    try:
+        if url is None:
+            payloads = RecordedPayloads.load(args.payloads) or RecordedPayloads.synthetic()
+            stub = StubUpstream(payloads, latency_ms=args.upstream_latency_ms).start()
+            process, url = start_app(args, stub)
+            print(f'App ready at {url}, upstreams stubbed at {stub.url}')
+
+        results = [run_scenario(url, scenario, args, dates) for scenario in args.scenarios.split(',')]
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+        if stub is not None:
+            stub.stop()
+
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'workdir', 'payloads')}
+    if stub is not None:
+        config['upstream_requests'] = stub.requests
+    write_results(args.output, 'load', results, **config)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Timing summaries and the JSON results file shared by the benchmark scripts.
+
+A results file holds the environment it was measured in and a list of
+results, each with a unique 'name' and its metrics, so two runs can be
+compared with benchmarks/compare.py.
+"""
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+
+import numpy as np
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def summarize(seconds):
+    """
+    Latency summary, in milliseconds, of a list of durations in seconds.
+    """
+    ms = np.asarray(seconds, dtype=np.float64) * 1000
+    if len(ms) == 0:
+        return {'calls': 0}
+    p50, p90, p99 = np.percentile(ms, [50, 90, 99])
+    return {
+        'calls': len(ms),
+        'mean_ms': round(float(ms.mean()), 4),
+        'p50_ms': round(float(p50), 4),
+        'p90_ms': round(float(p90), 4),
+        'p99_ms': round(float(p99), 4),
+        'max_ms': round(float(ms.max()), 4),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        'time': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'argv': sys.argv[1:],
+    }
+
+
+def write_results(path, suite, results, **config):
+    """
+    Write a results file and print where it went.
+    """
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump({'suite': suite, 'environment': environment(), 'config': config, 'results': results}, f, indent=2)
+    print(f'Results written to {path}')
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
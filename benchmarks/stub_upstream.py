@@ -0,0 +1,352 @@
+"""
+Local stand-ins for the Visual Crossing timeline and OpenWeather air pollution
+APIs, replaying recorded payloads so the app and the collectors can be
+benchmarked offline.
+
+    python benchmarks/stub_upstream.py --port 8100 --latency-ms 50
+    python benchmarks/stub_upstream.py --record   # save payloads from the live APIs
+
+Then point the app (or the collectors) at it:
+
+    VISUAL_CROSSING_BASE_URL=http://127.0.0.1:8100/visualcrossing/timeline
+    OPENWEATHER_BASE_URL=http://127.0.0.1:8100/openweather
+
+The recorded hours are replayed cyclically onto whatever dates are asked for,
+keyed on the hour, so the same date and hour always get the same values.
+Without recordings in --payloads, a week of synthetic hours is used instead.
+"""
+import argparse
+import datetime
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+PAYLOAD_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'payloads')
+WEATHER_PAYLOAD = 'visual_crossing.json'
+POLLUTION_PAYLOAD = 'openweather.json'
+
+WEATHER_ELEMENTS = ['temp', 'dew', 'humidity', 'windgust', 'windspeed', 'winddir', 'pressure',
+                    'cloudcover', 'visibility', 'solarradiation', 'solarenergy', 'uvindex']
+COMPONENTS = ['co', 'no', 'no2', 'o3', 'so2', 'pm2_5', 'pm10', 'nh3']
+FORECAST_DAYS = 15  # Visual Crossing timeline without dates
+POLLUTION_FORECAST_HOURS = 96
+
+
+class RecordedPayloads:
+    """
+    Hourly weather and pollution records, replayed onto any requested range.
+
+    weather_hours are the hours of whole recorded days starting at local
+    midnight (without 'datetime' and 'datetimeEpoch'), pollution_entries the
+    'main' and 'components' of hourly air pollution records, where entry i is
+    replayed at the hours h with h % len(pollution_entries) == i.
+    """
+
+    def __init__(self, weather_hours, pollution_entries, tzoffset=0.0):
+        self.weather_hours = weather_hours
+        self.pollution_entries = pollution_entries
+        self.tzoffset = tzoffset
+
+    @classmethod
+    def load(cls, directory):
+        """
+        Load recordings saved by record(), or None if there are none.
+        """
+        try:
+            with open(os.path.join(directory, WEATHER_PAYLOAD)) as f:
+                weather = json.load(f)
+            with open(os.path.join(directory, POLLUTION_PAYLOAD)) as f:
+                pollution = json.load(f)
+        except FileNotFoundError:
+            return None
+        hours = [{key: value for key, value in hour.items() if key not in ('datetime', 'datetimeEpoch')}
+                 for day in weather['days'] for hour in day.get('hours', [])]
+        # Rotate the pollution records so each replays at its recorded hour of the day
+        # (entry i is replayed at the hours h with h % len(entries) == i)
+        entries = sorted(pollution['list'], key=lambda entry: entry['dt'])
+        shift = (entries[0]['dt'] // 3600) % len(entries)
+        entries = [{'main': entry['main'], 'components': entry['components']} for entry in entries]
+        entries = entries[-shift:] + entries[:-shift] if shift else entries
+        return cls(hours, entries, float(weather.get('tzoffset', 0.0)))
+
+    @classmethod
+    def synthetic(cls, days=7, seed=0):
+        """
+        Plausible hourly records with a daily cycle, for running without recordings.
+        """
+        rng = np.random.default_rng(seed)
+        n = days * 24
+        hour = np.arange(n) % 24
+        daylight = np.clip(np.sin((hour - 6) / 12 * np.pi), 0, None)
+        temp = 12 + 8 * daylight + rng.normal(0, 1, n)
+        columns = {
+            'temp': temp,
+            'dew': temp - 6 + rng.normal(0, 1, n),
+            'humidity': np.clip(70 - 30 * daylight + rng.normal(0, 5, n), 5, 100),
+            'windgust': np.abs(rng.normal(15, 6, n)),
+            'windspeed': np.abs(rng.normal(8, 3, n)),
+            'winddir': rng.uniform(0, 360, n),
+            'pressure': 1013 + rng.normal(0, 3, n),
+            'cloudcover': rng.uniform(0, 100, n),
+            'visibility': np.clip(rng.normal(8, 2, n), 0.5, 24),
+            'solarradiation': 600 * daylight,
+            'solarenergy': 2.2 * daylight,
+            'uvindex': np.round(8 * daylight),
+        }
+        weather_hours = [{name: round(float(values[i]), 1) for name, values in columns.items()} for i in range(n)]
+
+        traffic = 1 + 0.5 * np.cos((hour - 8) / 12 * np.pi)
+        components = {
+            'co': 250 * traffic * rng.lognormal(0, 0.3, n),
+            'no': 2 * traffic * rng.lognormal(0, 0.5, n),
+            'no2': 20 * traffic * rng.lognormal(0, 0.4, n),
+            'o3': 40 + 50 * daylight * rng.lognormal(0, 0.3, n),
+            'so2': 8 * rng.lognormal(0, 0.5, n),
+            'pm2_5': 30 * traffic * rng.lognormal(0, 0.5, n),
+            'pm10': 50 * traffic * rng.lognormal(0, 0.5, n),
+            'nh3': 5 * rng.lognormal(0, 0.4, n),
+        }
+        # OpenWeather's AQI index (1-5) from its PM2.5 bands
+        aqi = 1 + np.searchsorted([10, 25, 50, 75], components['pm2_5'], side='right')
+        pollution_entries = [{'main': {'aqi': int(aqi[i])},
+                              'components': {name: round(float(values[i]), 2) for name, values in components.items()}}
+                             for i in range(n)]
+        return cls(weather_hours, pollution_entries)
+
+    def weather(self, location, start_date, end_date, tzoffset=None, elements=None, include_current=False):
+        """
+        A Visual Crossing timeline response for start_date..end_date (datetime.date).
+        """
+        tzoffset = self.tzoffset if tzoffset is None else tzoffset
+        tz_seconds = int(round(tzoffset * 3600))
+        n = len(self.weather_hours)
+        days = []
+        day = start_date
+        while day <= end_date:
+            midnight = int(datetime.datetime(day.year, day.month, day.day, tzinfo=datetime.timezone.utc).timestamp())
+            hours = []
+            for h in range(24):
+                local = midnight + h * 3600
+                hours.append(_select({'datetime': f'{h:02d}:00:00', 'datetimeEpoch': local - tz_seconds,
+                                      **self.weather_hours[(local // 3600) % n]}, elements))
+            days.append({**_select({'datetime': day.isoformat(), 'datetimeEpoch': midnight - tz_seconds}, elements),
+                         'hours': hours})
+            day += datetime.timedelta(days=1)
+
+        latitude, _, longitude = location.partition(',')
+        response = {'queryCost': len(days) * 24, 'latitude': _number(latitude), 'longitude': _number(longitude),
+                    'resolvedAddress': location, 'address': location, 'tzoffset': tzoffset, 'days': days}
+        if include_current:
+            now = int(time.time()) // 3600 * 3600
+            response['currentConditions'] = _select({'datetimeEpoch': now, **self.weather_hours[((now + tz_seconds) // 3600) % n]},
+                                                    elements)
+        return response
+
+    def pollution(self, latitude, longitude, start_epoch, end_epoch):
+        """
+        An OpenWeather air pollution response with hourly records from start_epoch to end_epoch.
+        """
+        n = len(self.pollution_entries)
+        first = -(-int(start_epoch) // 3600) * 3600
+        entries = [{'dt': epoch, **self.pollution_entries[(epoch // 3600) % n]}
+                   for epoch in range(first, int(end_epoch) + 1, 3600)]
+        return {'coord': {'lon': _number(longitude), 'lat': _number(latitude)}, 'list': entries}
+
+
+def _select(record, elements):
+    # Like the real API, only the requested elements are returned, timestamps included
+    if not elements:
+        return record
+    return {key: value for key, value in record.items() if key in elements}
+
+
+def _number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _date(value, today):
+    # Visual Crossing accepts dates and a few named periods
+    if value in ('today', 'yesterday', 'tomorrow'):
+        return today + datetime.timedelta(days={'today': 0, 'yesterday': -1, 'tomorrow': 1}[value])
+    return datetime.date.fromisoformat(value)
+
+
+class StubUpstream:
+    """
+    Serves RecordedPayloads over HTTP on a background thread.
+
+    Routes:
+        /visualcrossing/timeline/<location>[/<start>[/<end>]]
+        /openweather/air_pollution[/forecast|/history]
+    Every response is delayed by latency_ms, to stand in for the real network.
+    """
+
+    def __init__(self, payloads, host='127.0.0.1', port=0, latency_ms=0.0):
+        self.payloads = payloads
+        self.latency = latency_ms / 1000
+        self.requests = {'visual_crossing': 0, 'openweather': 0}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def environ(self):
+        """
+        Environment variables pointing the app and the collectors at this stub.
+        """
+        return {
+            'VISUAL_CROSSING_BASE_URL': f'{self.url}/visualcrossing/timeline',
+            'OPENWEATHER_BASE_URL': f'{self.url}/openweather',
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='stub-upstream', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def respond(self, path, query):
+        """
+        Return (status, body) for a request.
+        """
+        parts = [part for part in path.split('/') if part]
+        params = {key: values[-1] for key, values in parse_qs(query).items()}
+        today = datetime.datetime.now(datetime.timezone.utc).date()
+
+        if parts[:2] == ['visualcrossing', 'timeline'] and len(parts) >= 3:
+            upstream = 'visual_crossing'
+            period = parts[3:]
+            try:
+                if not period:
+                    start, end = today, today + datetime.timedelta(days=FORECAST_DAYS - 1)
+                elif len(period) == 1:
+                    start = end = _date(period[0], today)
+                else:
+                    start, end = _date(period[0], today), _date(period[1], today)
+            except ValueError:
+                return 400, {'message': f'Invalid period: {"/".join(period)}'}
+            elements = set(params['elements'].split(',')) if params.get('elements') else None
+            tzoffset = 0.0 if params.get('timezone') == 'Z' else None
+            include_current = 'current' in params.get('include', '')
+            body = self.payloads.weather(parts[2], start, end, tzoffset, elements, include_current)
+
+        elif parts[:2] == ['openweather', 'air_pollution']:
+            upstream = 'openweather'
+            now = int(time.time()) // 3600 * 3600
+            kind = parts[2] if len(parts) > 2 else 'current'
+            if kind == 'current':
+                start, end = now, now
+            elif kind == 'forecast':
+                start, end = now, now + (POLLUTION_FORECAST_HOURS - 1) * 3600
+            elif kind == 'history' and 'start' in params and 'end' in params:
+                start, end = int(params['start']), int(params['end'])
+            else:
+                return 400, {'message': f'Unsupported request: {path}'}
+            body = self.payloads.pollution(params.get('lat'), params.get('lon'), start, end)
+
+        else:
+            return 404, {'message': f'Unknown path: {path}'}
+
+        with self._lock:
+            self.requests[upstream] += 1
+        return 200, body
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                status, body = stub.respond(url.path, url.query)
+                if stub.latency:
+                    time.sleep(stub.latency)
+                content = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def record(directory, days):
+    """
+    Save a few days of real responses (keys and location from .env) for replaying.
+    """
+    import requests
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    location = f"{os.getenv('LATITUDE')},{os.getenv('LONGITUDE')}"
+    end = datetime.datetime.now(datetime.timezone.utc).date() - datetime.timedelta(days=1)
+    start = end - datetime.timedelta(days=days - 1)
+    weather_url = (f'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/'
+                   f'{location}/{start}/{end}')
+    weather = requests.get(weather_url, params={'unitGroup': 'metric', 'include': 'hours',
+                                                'key': os.getenv('VISUAL_CROSSING_API_KEY')}, timeout=30)
+    weather.raise_for_status()
+
+    start_epoch = int(datetime.datetime(start.year, start.month, start.day, tzinfo=datetime.timezone.utc).timestamp())
+    pollution = requests.get('http://api.openweathermap.org/data/2.5/air_pollution/history', params={
+        'lat': os.getenv('LATITUDE'), 'lon': os.getenv('LONGITUDE'), 'start': start_epoch,
+        'end': start_epoch + days * 86400 - 1, 'appid': os.getenv('OPENWEATHER_API_KEY')}, timeout=30)
+    pollution.raise_for_status()
+
+    os.makedirs(directory, exist_ok=True)
+    for name, response in [(WEATHER_PAYLOAD, weather), (POLLUTION_PAYLOAD, pollution)]:
+        with open(os.path.join(directory, name), 'w') as f:
+            json.dump(response.json(), f)
+    print(f'Recorded {start} to {end} for {location} in {directory}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8100)
+    parser.add_argument('--payloads', default=PAYLOAD_DIR, help='Directory of recorded payloads.')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='Delay added to every response.')
+    parser.add_argument('--record', action='store_true', help='Record payloads from the live APIs and exit.')
+    parser.add_argument('--record-days', type=int, default=7)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.payloads, args.record_days)
+        return
+
+    payloads = RecordedPayloads.load(args.payloads)
+    if payloads is None:
+        print(f'No recordings in {args.payloads}, serving synthetic payloads.')
+        payloads = RecordedPayloads.synthetic()
+    stub = StubUpstream(payloads, args.host, args.port, args.latency_ms)
+    for name, value in stub.environ().items():
+        print(f'{name}={value}')
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
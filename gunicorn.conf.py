@@ -0,0 +1,48 @@
+import multiprocessing
+import os
+import shutil
+
+# Metrics from every worker are written here and aggregated by the master.
+# This must be set before prometheus_client is imported by the app, and the
+# directory is cleared here because the app is preloaded before any hook runs.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus_multiproc')
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+# Load fork-safe models once in the master so workers share them copy-on-write
+os.environ.setdefault('STARTUP_MODE', 'preload')
+
+from prometheus_client import CollectorRegistry, multiprocess, start_http_server
+
+# Server socket and WSGI app (app/app.py)
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+pythonpath = 'app'
+wsgi_app = 'app:app'
+preload_app = True
+
+# Worker processes and threads per worker (threads let the micro-batcher coalesce requests)
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count())))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+
+METRICS_PORT = int(os.getenv('METRICS_PORT', '8000'))
+
+
+def when_ready(server):
+    # Serve the metrics of all workers, aggregated, from the master process
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    start_http_server(METRICS_PORT, registry=registry)
+
+
+def post_worker_init(worker):
+    # Finish loading in the worker (e.g. Keras models, which cannot be forked)
+    # before it accepts connections; until then the other workers take them.
+    # Loading must finish within GUNICORN_TIMEOUT.
+    import app
+    app.start_worker()
+
+
+def child_exit(server, worker):
+    multiprocess.mark_process_dead(worker.pid)
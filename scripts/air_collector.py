@@ -1,74 +1,117 @@
 import os
-import requests
-import json
+import time
+import pandas as pd
 from dotenv import load_dotenv
+from feature_store import target_matrix, write_records
+from history_store import append_records, location_root, read_watermark
+from stream_records import iter_records, record_chunks, response_body
+from sweep import RateLimitedSession, SWEEP_WORKERS, load_locations, run_sweep, save_snapshot
 
 # Load environment variables from .env file
 load_dotenv()
 
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY')
-LATITUDE = os.getenv('LATITUDE')
-LONGITUDE = os.getenv('LONGITUDE')
 
-# OpenWeatherMap Air Pollution API URLs
-AIR_POLLUTION_CURRENT_URL = f'http://api.openweathermap.org/data/2.5/air_pollution?lat={LATITUDE}&lon={LONGITUDE}&appid={OPENWEATHER_API_KEY}'
-AIR_POLLUTION_FORECAST_URL = f'http://api.openweathermap.org/data/2.5/air_pollution/forecast?lat={LATITUDE}&lon={LONGITUDE}&appid={OPENWEATHER_API_KEY}'
-AIR_POLLUTION_HISTORY_URL = 'http://api.openweathermap.org/data/2.5/air_pollution/history'
+# OpenWeatherMap Air Pollution API URLs (base overridable, e.g. to point at benchmarks/stub_upstream.py)
+OPENWEATHER_BASE_URL = os.getenv('OPENWEATHER_BASE_URL', 'http://api.openweathermap.org/data/2.5').rstrip('/')
+AIR_POLLUTION_CURRENT_URL = f'{OPENWEATHER_BASE_URL}/air_pollution'
+AIR_POLLUTION_FORECAST_URL = f'{OPENWEATHER_BASE_URL}/air_pollution/forecast'
+AIR_POLLUTION_HISTORY_URL = f'{OPENWEATHER_BASE_URL}/air_pollution/history'
 
-# Directories
+# Requests per second shared by all workers (the free plan allows 60 calls per minute)
+OPENWEATHER_RATE_LIMIT = float(os.getenv('OPENWEATHER_RATE_LIMIT', '1'))
+session = RateLimitedSession(OPENWEATHER_RATE_LIMIT, burst=SWEEP_WORKERS)
+
+# First timestamp to collect when the historical store is empty
+HISTORY_START = os.getenv('HISTORY_START', '2024-11-01')
+
+# Directories, with one location=<name> subdirectory per site
 AIR_QUALITY_CURRENT_DIR = 'data/air_quality/current/'
 AIR_QUALITY_FORECAST_DIR = 'data/air_quality/forecast/'
 AIR_QUALITY_HISTORICAL_DIR = 'data/air_quality/historical/'
 
-# Ensure directories exist
-for directory in [AIR_QUALITY_CURRENT_DIR, AIR_QUALITY_FORECAST_DIR, AIR_QUALITY_HISTORICAL_DIR]:
-    os.makedirs(directory, exist_ok=True)
+# Historical records are stored in day partitions keyed on 'dt' (epoch seconds)
+AIR_QUALITY_TIMESTAMP = 'dt'
+AIR_QUALITY_COLUMNS = ['main.aqi', 'components.co', 'components.no', 'components.no2', 'components.o3',
+                       'components.so2', 'components.pm2_5', 'components.pm10', 'components.nh3']
 
-def fetch_air_quality_current():
+def location_url(url, location, **params):
+    query = '&'.join(f'{key}={value}' for key, value in params.items())
+    url = f"{url}?lat={location['latitude']}&lon={location['longitude']}&appid={OPENWEATHER_API_KEY}"
+    return f'{url}&{query}' if query else url
+
+def fetch_air_quality_current(location):
     try:
-        response = requests.get(AIR_POLLUTION_CURRENT_URL)
+        response = session.get(location_url(AIR_POLLUTION_CURRENT_URL, location))
         response.raise_for_status()
         data = response.json()
-        filename = f'air_quality_current.json'
-        filepath = os.path.join(AIR_QUALITY_CURRENT_DIR, filename)
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
+        filepath = save_snapshot(data, AIR_QUALITY_CURRENT_DIR, location, 'air_quality_current.json')
         print(f'Air Quality current data saved to {filepath}')
     except Exception as e:
-        print(f'Error fetching current air quality data: {e}')
+        print(f"Error fetching current air quality data for {location['name']}: {e}")
 
-def fetch_air_quality_forecast():
+def fetch_air_quality_forecast(location):
     try:
-        response = requests.get(AIR_POLLUTION_FORECAST_URL)
+        response = session.get(location_url(AIR_POLLUTION_FORECAST_URL, location))
         response.raise_for_status()
         data = response.json()
-        filename = f'air_quality_forecast.json'
-        filepath = os.path.join(AIR_QUALITY_FORECAST_DIR, filename)
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
+        filepath = save_snapshot(data, AIR_QUALITY_FORECAST_DIR, location, 'air_quality_forecast.json')
         print(f'Air Quality forecast data saved to {filepath}')
     except Exception as e:
-        print(f'Error fetching air quality forecast data: {e}')
+        print(f"Error fetching air quality forecast data for {location['name']}: {e}")
+
+def historical_air_quality_url(location, start_timestamp, end_timestamp):
+    return location_url(AIR_POLLUTION_HISTORY_URL, location, start=start_timestamp, end=end_timestamp)
+
+def air_quality_record_chunks(body):
+    """
+    Parse an air pollution history response body (a binary file-like object)
+    incrementally into chunks of hourly rows with a fixed, typed schema.
+    """
+    return record_chunks(iter_records(body, 'list.item'), AIR_QUALITY_TIMESTAMP, AIR_QUALITY_COLUMNS)
+
+def store_historical_air_quality(location, records):
+    """
+    Append records to the location's historical store and write the pollutant
+    targets to its memory-mapped feature store. Returns the number of new hours.
+    """
+    new_rows = append_records(location_root(AIR_QUALITY_HISTORICAL_DIR, location['name']), records, AIR_QUALITY_TIMESTAMP)
+    write_records(target_matrix(location['name']), records, AIR_QUALITY_TIMESTAMP)
+    return new_rows
 
-def fetch_historical_air_quality(start_timestamp, end_timestamp):
+def fetch_historical_air_quality(location, start_timestamp, end_timestamp):
     """
-    Fetch historical air quality data between start_timestamp and end_timestamp.
+    Fetch historical air quality data between start_timestamp and end_timestamp
+    and append it to the location's partitioned historical store.
     Timestamps should be in Unix format.
     """
-    url = f'{AIR_POLLUTION_HISTORY_URL}?lat={LATITUDE}&lon={LONGITUDE}&start={start_timestamp}&end={end_timestamp}&appid={OPENWEATHER_API_KEY}'
+    url = historical_air_quality_url(location, start_timestamp, end_timestamp)
+    root = location_root(AIR_QUALITY_HISTORICAL_DIR, location['name'])
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        filename = f'air_quality_historical.json'
-        filepath = os.path.join(AIR_QUALITY_HISTORICAL_DIR, filename)
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
-        print(f'Historical Air Quality data saved to {filepath}')
+        new_rows = 0
+        with session.get(url, stream=True) as response:
+            response.raise_for_status()
+            for records in air_quality_record_chunks(response_body(response)):
+                new_rows += store_historical_air_quality(location, records)
+        print(f'Historical Air Quality data: {new_rows} new hours appended to {root}')
     except Exception as e:
-        print(f'Error fetching historical air quality data: {e}')
+        print(f"Error fetching historical air quality data for {location['name']}: {e}")
+
+def update_historical_air_quality(location):
+    """
+    Fetch only the hours after the location's last stored timestamp (the watermark).
+    """
+    watermark = read_watermark(location_root(AIR_QUALITY_HISTORICAL_DIR, location['name']), AIR_QUALITY_TIMESTAMP)
+    if watermark is None:
+        start_timestamp = int(pd.Timestamp(HISTORY_START, tz='UTC').timestamp())
+    else:
+        start_timestamp = watermark + 1
+    end_timestamp = int(time.time())
+
+    if start_timestamp >= end_timestamp:
+        print(f"Historical Air Quality data for {location['name']} is up to date.")
+        return
+    fetch_historical_air_quality(location, start_timestamp, end_timestamp)
 
 if __name__ == '__main__':
-    fetch_air_quality_current()
-    fetch_air_quality_forecast()
-    fetch_historical_air_quality(1730419200, 1733011200)  # 2024-11-01 to 2024-12-01
+    run_sweep([fetch_air_quality_current, fetch_air_quality_forecast, update_historical_air_quality], load_locations())
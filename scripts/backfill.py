@@ -0,0 +1,153 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import air_collector
+import weather_collector
+from stream_records import response_body
+from sweep import SWEEP_WORKERS, load_locations
+
+# Checkpoint of completed chunks (not data, so kept out of DVC and git)
+BACKFILL_DIR = os.getenv('BACKFILL_DIR', '.backfill')
+
+SOURCES = {
+    'air_quality': {
+        'session': air_collector.session,
+        'url': lambda location, first, last: air_collector.historical_air_quality_url(
+            location, int(first.timestamp()), int((last + pd.Timedelta(days=1)).timestamp()) - 1),
+        'records': air_collector.air_quality_record_chunks,
+        'store': air_collector.store_historical_air_quality,
+    },
+    'weather': {
+        'session': weather_collector.session,
+        'url': lambda location, first, last: weather_collector.historical_weather_url(
+            location, first.strftime('%Y-%m-%d'), last.strftime('%Y-%m-%d')),
+        'records': weather_collector.weather_record_chunks,
+        'store': weather_collector.store_historical_weather,
+    },
+}
+
+
+def split_range(start_date, end_date, chunk_days):
+    """
+    Split the inclusive UTC date range into (first_day, last_day) chunks of at most chunk_days days.
+    Chunks never share a day, so concurrent chunks never rewrite the same partition.
+    """
+    days = pd.date_range(start_date, end_date, freq='D', tz='UTC')
+    return [(days[i], days[min(i + chunk_days, len(days)) - 1]) for i in range(0, len(days), chunk_days)]
+
+
+def chunk_key(source, location, first, last):
+    return f"{source}/{location['name']}/{first:%Y-%m-%d}/{last:%Y-%m-%d}"
+
+
+class Checkpoint:
+    """
+    Set of completed chunk keys, saved atomically to a JSON file after each chunk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.completed = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self.completed = set(json.load(f).get('completed', []))
+
+    def __contains__(self, key):
+        return key in self.completed
+
+    def mark_done(self, key):
+        with self._lock:
+            self.completed.add(key)
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.', suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'completed': sorted(self.completed)}, f, indent=4)
+            os.replace(tmp_path, self.path)
+
+
+def backfill_chunk(source, location, first, last, checkpoint, store_lock):
+    """
+    Stream one chunk, append its records to the location's store as they are
+    parsed and mark it done. Returns False if the chunk failed; it will be
+    retried on the next run (rows already stored are simply replaced). A chunk
+    reaching today is never marked done, since today's hours are still coming in.
+    """
+    key = chunk_key(source, location, first, last)
+    config = SOURCES[source]
+    try:
+        new_rows = 0
+        with config['session'].get(config['url'](location, first, last), stream=True) as response:
+            response.raise_for_status()
+            for records in config['records'](response_body(response)):
+                with store_lock:
+                    new_rows += config['store'](location, records)
+        if last < pd.Timestamp.now(tz='UTC').normalize():
+            checkpoint.mark_done(key)
+        print(f'Backfilled {key}: {new_rows} new hours')
+        return True
+    except Exception as e:
+        print(f'Error backfilling {key}: {e}')
+        return False
+
+
+def backfill(sources, locations, start_date, end_date, chunk_days, max_workers=SWEEP_WORKERS):
+    """
+    Backfill every source and location over the date range, skipping chunks
+    already recorded in the checkpoint. Returns the number of failed chunks.
+    """
+    checkpoint = Checkpoint(os.path.join(BACKFILL_DIR, 'checkpoint.json'))
+    chunks = split_range(start_date, end_date, chunk_days)
+
+    # Chunks never share a day partition, but each location's feature store matrix needs a single writer
+    store_locks = {(source, location['name']): threading.Lock() for source in sources for location in locations}
+    jobs = [
+        (source, location, first, last)
+        for source in sources
+        for location in locations
+        for first, last in chunks
+        if chunk_key(source, location, first, last) not in checkpoint
+    ]
+    skipped = len(sources) * len(locations) * len(chunks) - len(jobs)
+    print(f'Backfilling {len(jobs)} chunks ({skipped} already done) from {start_date} to {end_date}')
+
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='backfill') as executor:
+        futures = [
+            executor.submit(backfill_chunk, source, location, first, last, checkpoint,
+                            store_locks[(source, location['name'])])
+            for source, location, first, last in jobs
+        ]
+        failed = sum(not future.result() for future in futures)
+
+    print(f'Backfill finished in {time.time() - start_time:.1f}s: {len(jobs) - failed} chunks done, {failed} failed')
+    if failed:
+        print('Run the same command again to retry the failed chunks.')
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Backfill the historical stores over a date range, resumably.')
+    parser.add_argument('--start', required=True, help='First UTC day to backfill (YYYY-MM-DD).')
+    parser.add_argument('--end', default=pd.Timestamp.now(tz='UTC').strftime('%Y-%m-%d'),
+                        help='Last UTC day to backfill, inclusive (YYYY-MM-DD, default: today).')
+    parser.add_argument('--source', choices=['all'] + list(SOURCES), default='all',
+                        help='Which historical store to backfill.')
+    parser.add_argument('--chunk-days', type=int, default=7, help='Days fetched per request.')
+    parser.add_argument('--workers', type=int, default=SWEEP_WORKERS, help='Chunks downloaded concurrently.')
+    args = parser.parse_args()
+
+    sources = list(SOURCES) if args.source == 'all' else [args.source]
+    failed = backfill(sources, load_locations(), args.start, args.end, args.chunk_days, args.workers)
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
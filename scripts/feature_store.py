@@ -0,0 +1,221 @@
+import argparse
+import json
+import os
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from history_store import list_locations, list_partitions, location_root, partition_path
+
+# Model inputs (weather) and targets (pollutants), in the order the model uses them
+FEATURE_COLUMNS = ['temp', 'dew', 'humidity', 'windspeed', 'windgust', 'winddir', 'pressure', 'solarenergy']
+TARGET_COLUMNS = ['components.so2', 'components.no2', 'components.pm10', 'components.pm2_5', 'components.o3', 'components.co']
+
+# Layout: <root>/location=<name>/{features,targets}.json and the data files they
+# name. Each matrix is a dense hourly grid: row i holds the hour
+# start_epoch + i * STEP_SECONDS as raw float32 values (C order), and hours never
+# written are NaN. The JSON header stores the data file, start_epoch, rows and
+# columns, so the timestamp index is implicit.
+FEATURE_STORE_DIR = 'data/feature_store'
+STEP_SECONDS = 3600
+DTYPE = np.float32
+
+
+class HourlyMatrix:
+    """
+    One float32 matrix of the store (features or targets of one location).
+
+    Writers extend the file and fill rows in place; readers map it with
+    np.memmap, so every process opening the store shares the same pages.
+    Prepending older hours shifts every row, so it writes a new data file
+    (<name>.<start_epoch>.f32) and only then switches the header to it; readers
+    keep the file they mapped. There must be a single writer per matrix at a time.
+    """
+
+    def __init__(self, directory, name, columns):
+        self.directory = directory
+        self.name = name
+        self.header_path = os.path.join(directory, f'{name}.json')
+        self.columns = columns
+
+    def data_path(self, header):
+        """
+        Path of the data file a header refers to.
+        """
+        filename = f'{self.name}.f32' if header is None else header.get('file', f'{self.name}.f32')
+        return os.path.join(self.directory, filename)
+
+    def header(self):
+        if not os.path.exists(self.header_path):
+            return None
+        with open(self.header_path) as f:
+            return json.load(f)
+
+    def open(self):
+        """
+        Return (start_epoch, read-only memmap of shape (rows, columns)), or (None, None) if empty.
+        """
+        for attempt in range(3):
+            header = self.header()
+            if header is None or header['rows'] == 0:
+                return None, None
+            path = self.data_path(header)
+            try:
+                size = os.path.getsize(path)
+            except FileNotFoundError:
+                continue  # Replaced by a prepend since the header was read
+            expected = header['rows'] * len(header['columns']) * DTYPE().itemsize
+            if size < expected:
+                raise ValueError(f'{path} holds {size} bytes, its header {self.header_path} needs {expected}.')
+            array = np.memmap(path, dtype=DTYPE, mode='r', shape=(header['rows'], len(header['columns'])))
+            return header['start_epoch'], array
+        raise RuntimeError(f'{self.header_path} kept changing while opening it.')
+
+    def write(self, epochs, values):
+        """
+        Store values (n, columns) at the given epoch seconds (aligned to the hour),
+        growing the grid as needed. Existing hours are overwritten.
+        """
+        epochs = np.asarray(epochs, dtype=np.int64)
+        values = np.asarray(values, dtype=DTYPE).reshape(len(epochs), len(self.columns))
+        if len(epochs) == 0:
+            return
+
+        header = self.header()
+        first = int(epochs.min()) - int(epochs.min()) % STEP_SECONDS
+        start = first if header is None else header['start_epoch']
+        rows = 0 if header is None else header['rows']
+        if header is not None and header['columns'] != self.columns:
+            raise ValueError(f'{self.header_path} has columns {header["columns"]}, expected {self.columns}.')
+
+        path = self.data_path(header)
+        replaced = None
+        if first < start:
+            # Older history than anything stored: shift the grid into a new file
+            # (rare, e.g. a backfill further back)
+            shift = (start - first) // STEP_SECONDS
+            start -= shift * STEP_SECONDS
+            replaced, path = path, self._prepend(path, shift, rows, start)
+            rows += shift
+
+        index = (epochs - start) // STEP_SECONDS
+        new_rows = max(rows, int(index.max()) + 1)
+        if new_rows > rows:
+            self._extend(path, rows, new_rows)
+
+        array = np.memmap(path, dtype=DTYPE, mode='r+', shape=(new_rows, len(self.columns)))
+        array[index] = values
+        array.flush()
+        del array
+        # The header is written last so readers never map rows that are not on disk yet
+        self._write_header(os.path.basename(path), int(start), new_rows)
+        if replaced is not None:
+            # Readers that mapped the old file keep it until they close it
+            os.remove(replaced)
+
+    def _extend(self, path, rows, new_rows):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(path, 'ab') as f:
+            f.truncate(rows * len(self.columns) * DTYPE().itemsize)
+            np.full((new_rows - rows, len(self.columns)), np.nan, dtype=DTYPE).tofile(f)
+
+    def _prepend(self, path, shift, rows, start):
+        new_path = os.path.join(self.directory, f'{self.name}.{start}.f32')
+        with open(new_path, 'wb') as f:
+            np.full((shift, len(self.columns)), np.nan, dtype=DTYPE).tofile(f)
+            if rows:
+                np.fromfile(path, dtype=DTYPE, count=rows * len(self.columns)).tofile(f)
+        return new_path
+
+    def _write_header(self, filename, start, rows):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'file': filename, 'start_epoch': start, 'step': STEP_SECONDS, 'rows': rows,
+                       'columns': self.columns}, f)
+        os.replace(tmp_path, self.header_path)
+
+
+def feature_matrix(location, root=FEATURE_STORE_DIR):
+    return HourlyMatrix(location_root(root, location), 'features', FEATURE_COLUMNS)
+
+
+def target_matrix(location, root=FEATURE_STORE_DIR):
+    return HourlyMatrix(location_root(root, location), 'targets', TARGET_COLUMNS)
+
+
+def write_records(matrix, records, timestamp_column):
+    """
+    Write the matrix's columns of a DataFrame of hourly records keyed on timestamp_column.
+    """
+    if records.empty:
+        return
+    matrix.write(records[timestamp_column].to_numpy(), records.reindex(columns=matrix.columns).to_numpy())
+
+
+def open_location(location, root=FEATURE_STORE_DIR):
+    """
+    Aligned read-only views over the hours where both matrices exist:
+    (epochs int64 (n,), features memmap (n, F), targets memmap (n, T)).
+    Missing hours are NaN rows. Returns None if either matrix is empty.
+    """
+    feature_start, features = feature_matrix(location, root).open()
+    target_start, targets = target_matrix(location, root).open()
+    if features is None or targets is None:
+        return None
+
+    start = max(feature_start, target_start)
+    end = min(feature_start + len(features) * STEP_SECONDS, target_start + len(targets) * STEP_SECONDS)
+    if end <= start:
+        return None
+    features = features[(start - feature_start) // STEP_SECONDS:(end - feature_start) // STEP_SECONDS]
+    targets = targets[(start - target_start) // STEP_SECONDS:(end - target_start) // STEP_SECONDS]
+    return np.arange(start, end, STEP_SECONDS, dtype=np.int64), features, targets
+
+
+def valid_window_starts(features, targets, seq_length, row_mask=None):
+    """
+    Start rows of the windows whose seq_length + 1 rows (inputs and target
+    hour) all have features and targets (no NaN) and are allowed by row_mask.
+    """
+    complete = ~np.isnan(features).any(axis=1) & ~np.isnan(targets).any(axis=1)
+    if row_mask is not None:
+        complete &= row_mask
+    if len(complete) <= seq_length:
+        return np.empty(0, dtype=np.int64)
+    # Number of incomplete rows before each row; a window is valid if none fall inside it
+    missing = np.concatenate(([0], np.cumsum(~complete)))
+    return np.flatnonzero(missing[seq_length + 1:] == missing[:-seq_length - 1])
+
+
+def store_locations(root=FEATURE_STORE_DIR):
+    """
+    Locations with data in the feature store.
+    """
+    return list_locations(root)
+
+
+def rebuild(location, air_quality_root, weather_root, root=FEATURE_STORE_DIR):
+    """
+    Write the whole partitioned history of a location into its feature store,
+    one day partition at a time (e.g. for history collected before the store existed).
+    """
+    for matrix, history_root, timestamp_column in [
+        (feature_matrix(location, root), weather_root, 'datetimeEpoch'),
+        (target_matrix(location, root), air_quality_root, 'dt'),
+    ]:
+        history_root = location_root(history_root, location)
+        for day in list_partitions(history_root):
+            write_records(matrix, pd.read_parquet(partition_path(history_root, day)), timestamp_column)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Rebuild the memory-mapped feature store from the partitioned history.')
+    parser.add_argument('--air-quality', default='data/air_quality/historical')
+    parser.add_argument('--weather', default='data/weather/historical')
+    parser.add_argument('--output', default=FEATURE_STORE_DIR)
+    args = parser.parse_args()
+
+    for name in sorted(set(list_locations(args.air_quality)) | set(list_locations(args.weather))):
+        rebuild(name, args.air_quality, args.weather, args.output)
+        print(f'Feature store rebuilt for {name}')
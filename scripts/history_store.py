@@ -0,0 +1,120 @@
+import os
+import tempfile
+
+import pandas as pd
+
+# Layout: <root>/date=YYYY-MM-DD/data.parquet, one file per UTC day.
+# Multi-location stores nest one such root per site under <dir>/location=<name>/
+LOCATION_PREFIX = 'location='
+PARTITION_PREFIX = 'date='
+PARTITION_FILE = 'data.parquet'
+PARQUET_COMPRESSION = 'zstd'
+
+def location_root(root, location):
+    """
+    Directory holding the data of one location under root.
+    """
+    return os.path.join(root, f'{LOCATION_PREFIX}{location}')
+
+def list_locations(root):
+    """
+    Sorted list of the location names stored under root.
+    """
+    if not os.path.isdir(root):
+        return []
+    return sorted(name[len(LOCATION_PREFIX):] for name in os.listdir(root) if name.startswith(LOCATION_PREFIX))
+
+def partition_path(root, day):
+    """
+    Path of the Parquet file holding the given UTC day (YYYY-MM-DD).
+    """
+    return os.path.join(root, f'{PARTITION_PREFIX}{day}', PARTITION_FILE)
+
+def list_partitions(root):
+    """
+    Sorted list of the days stored under root.
+    """
+    if not os.path.isdir(root):
+        return []
+    return sorted(
+        name[len(PARTITION_PREFIX):]
+        for name in os.listdir(root)
+        if name.startswith(PARTITION_PREFIX) and os.path.exists(os.path.join(root, name, PARTITION_FILE))
+    )
+
+def _write_atomic(df, path):
+    # Write next to the target and rename so readers never see a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        df.to_parquet(tmp_path, index=False, compression=PARQUET_COMPRESSION)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+
+def append_records(root, df, timestamp_column):
+    """
+    Append rows to their day partitions, deduplicated on timestamp_column
+    (epoch seconds, UTC). Newer rows replace stored rows with the same
+    timestamp. Only the partitions touched by df are rewritten, with df's
+    column types (e.g. float32 values from the streaming parsers).
+    Returns the number of rows that were not stored before.
+    """
+    if df.empty:
+        return 0
+
+    df = df.drop_duplicates(subset=timestamp_column, keep='last')
+    days = pd.to_datetime(df[timestamp_column], unit='s').dt.strftime('%Y-%m-%d')
+
+    new_rows = 0
+    for day, part in df.groupby(days):
+        path = partition_path(root, day)
+        if os.path.exists(path):
+            existing = pd.read_parquet(path)
+            new_rows += int((~part[timestamp_column].isin(existing[timestamp_column])).sum())
+            part = pd.concat([existing, part], ignore_index=True).drop_duplicates(subset=timestamp_column, keep='last')
+            part = part.astype(df.dtypes.to_dict())
+        else:
+            new_rows += len(part)
+        _write_atomic(part.sort_values(timestamp_column), path)
+
+    return new_rows
+
+def read_watermark(root, timestamp_column):
+    """
+    Latest stored timestamp (epoch seconds), or None if the store is empty.
+    """
+    days = list_partitions(root)
+    if not days:
+        return None
+    latest = pd.read_parquet(partition_path(root, days[-1]), columns=[timestamp_column])
+    return int(latest[timestamp_column].max())
+
+def read_range(root, timestamp_column, start=None, end=None, columns=None):
+    """
+    Read rows with start <= timestamp < end (epoch seconds, either bound may be
+    None). Only the partitions overlapping the range are opened.
+    """
+    days = list_partitions(root)
+    if start is not None:
+        start_day = pd.to_datetime(start, unit='s').strftime('%Y-%m-%d')
+        days = [day for day in days if day >= start_day]
+    if end is not None:
+        end_day = pd.to_datetime(end, unit='s').strftime('%Y-%m-%d')
+        days = [day for day in days if day <= end_day]
+
+    if columns is not None and timestamp_column not in columns:
+        columns = [timestamp_column] + list(columns)
+    frames = [pd.read_parquet(partition_path(root, day), columns=columns) for day in days]
+    if not frames:
+        return pd.DataFrame(columns=columns)
+
+    df = pd.concat(frames, ignore_index=True)
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df[timestamp_column] >= start
+    if end is not None:
+        mask &= df[timestamp_column] < end
+    return df[mask].reset_index(drop=True)
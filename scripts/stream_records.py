@@ -0,0 +1,72 @@
+import os
+
+import ijson
+import numpy as np
+import pandas as pd
+
+# Records collected per chunk; memory is bounded by this, not by the response size
+STREAM_CHUNK_ROWS = int(os.getenv('STREAM_CHUNK_ROWS', '8192'))
+
+# Bytes read from the response at a time
+STREAM_READ_BYTES = 1 << 16
+
+# Stored value type (timestamps are int64 epoch seconds)
+VALUE_DTYPE = np.float32
+
+
+def response_body(response):
+    """
+    File-like view of a streamed (stream=True) response body, decompressed
+    if the provider gzipped it.
+    """
+    response.raw.decode_content = True
+    return response.raw
+
+
+def iter_records(body, prefix):
+    """
+    Yield the records under prefix (an ijson path such as 'list.item' or
+    'days.item.hours.item') of a JSON body one at a time, without loading the body.
+    """
+    return ijson.items(body, prefix, use_float=True, buf_size=STREAM_READ_BYTES)
+
+
+def _field(record, path):
+    for key in path:
+        if not isinstance(record, dict):
+            return np.nan
+        record = record.get(key)
+    return np.nan if record is None else record
+
+
+def record_chunks(records, timestamp_column, columns, chunk_rows=STREAM_CHUNK_ROWS):
+    """
+    Collect records into typed DataFrames of at most chunk_rows rows:
+    timestamp_column as int64 epoch seconds and every column as float32, NaN
+    where a record lacks it. Nested fields are named with dots, as
+    pd.json_normalize names them (e.g. 'components.co').
+    Records without a timestamp are skipped.
+    """
+    paths = [column.split('.') for column in columns]
+    timestamps = np.empty(chunk_rows, dtype=np.int64)
+    values = np.empty((chunk_rows, len(columns)), dtype=VALUE_DTYPE)
+    rows = 0
+    for record in records:
+        timestamp = record.get(timestamp_column)
+        if timestamp is None:
+            continue
+        timestamps[rows] = timestamp
+        values[rows] = [_field(record, path) for path in paths]
+        rows += 1
+        if rows == chunk_rows:
+            yield _frame(timestamp_column, timestamps, columns, values, rows)
+            rows = 0
+    if rows:
+        yield _frame(timestamp_column, timestamps, columns, values, rows)
+
+
+def _frame(timestamp_column, timestamps, columns, values, rows):
+    # Copies, so the buffers can be refilled for the next chunk
+    df = pd.DataFrame(values[:rows].copy(), columns=columns)
+    df.insert(0, timestamp_column, timestamps[:rows].copy())
+    return df
@@ -0,0 +1,128 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+from history_store import location_root
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Sites to collect, e.g. [{"name": "islamabad", "latitude": 33.68, "longitude": 73.05}]
+LOCATIONS_FILE = os.getenv('LOCATIONS_FILE', 'config/locations.json')
+
+# Number of requests in flight at once during a sweep
+SWEEP_WORKERS = int(os.getenv('SWEEP_WORKERS', '8'))
+
+# Seconds to wait for a connection and between bytes of a response (history
+# ranges can take the provider a while to produce)
+SWEEP_CONNECT_TIMEOUT = float(os.getenv('SWEEP_CONNECT_TIMEOUT', '3.05'))
+SWEEP_READ_TIMEOUT = float(os.getenv('SWEEP_READ_TIMEOUT', '60'))
+
+LOCATION_NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all threads calling one provider.
+
+    acquire() blocks until a token is available. Tokens refill at `rate` per
+    second up to `burst`, so short bursts go out immediately while the long-run
+    request rate never exceeds the provider's limit.
+    """
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class RateLimitedSession:
+    """
+    Pooled requests session whose GETs wait for a token from a RateLimiter.
+    GETs time out after the sweep timeouts unless given their own.
+    """
+
+    def __init__(self, rate, burst=1, pool_size=SWEEP_WORKERS):
+        self.limiter = RateLimiter(rate, burst)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, url, **kwargs):
+        self.limiter.acquire()
+        kwargs.setdefault('timeout', (SWEEP_CONNECT_TIMEOUT, SWEEP_READ_TIMEOUT))
+        return self.session.get(url, **kwargs)
+
+
+def load_locations(path=LOCATIONS_FILE):
+    """
+    Load the list of locations to collect from the config file.
+    Falls back to the single LATITUDE/LONGITUDE site from .env if the file does not exist.
+    """
+    if not os.path.exists(path):
+        return [{
+            'name': os.getenv('LOCATION_NAME', 'default'),
+            'latitude': os.getenv('LATITUDE'),
+            'longitude': os.getenv('LONGITUDE'),
+        }]
+
+    with open(path) as f:
+        locations = json.load(f)
+
+    names = set()
+    for location in locations:
+        name = location.get('name', '')
+        if not LOCATION_NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid location name '{name}' in {path}. Use letters, digits, '-' and '_' only.")
+        if name in names:
+            raise ValueError(f"Duplicate location name '{name}' in {path}.")
+        if 'latitude' not in location or 'longitude' not in location:
+            raise ValueError(f"Location '{name}' in {path} needs a latitude and a longitude.")
+        names.add(name)
+    return locations
+
+
+def save_snapshot(data, directory, location, filename):
+    """
+    Write a compact JSON snapshot (current or forecast data) to the location's subdirectory.
+    """
+    directory = location_root(directory, location['name'])
+    os.makedirs(directory, exist_ok=True)
+    filepath = os.path.join(directory, filename)
+    with open(filepath, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    return filepath
+
+
+def run_sweep(jobs, locations, max_workers=SWEEP_WORKERS):
+    """
+    Run every job for every location on a bounded thread pool.
+    Each job is called as job(location) and handles its own errors.
+    """
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sweep') as executor:
+        futures = [executor.submit(job, location) for location in locations for job in jobs]
+        for future in futures:
+            future.result()
+    print(f'Sweep finished: {len(futures)} jobs for {len(locations)} locations in {time.time() - start_time:.1f}s')
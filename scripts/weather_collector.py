@@ -1,75 +1,119 @@
 import os
-import requests
-import json
+import time
+import pandas as pd
 from dotenv import load_dotenv
+from feature_store import feature_matrix, write_records
+from history_store import append_records, location_root, read_watermark
+from stream_records import iter_records, record_chunks, response_body
+from sweep import RateLimitedSession, SWEEP_WORKERS, load_locations, run_sweep, save_snapshot
 
 # Load environment variables from .env file
 load_dotenv()
 
 VISUAL_CROSSING_API_KEY = os.getenv('VISUAL_CROSSING_API_KEY')
-LATITUDE = os.getenv('LATITUDE')
-LONGITUDE = os.getenv('LONGITUDE')
-LOCATION = f"{LATITUDE},{LONGITUDE}"
 
-# Visual Crossing Timeline Weather API URLs
-WEATHER_CURRENT_URL = f'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{LOCATION}/today?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=current'
-WEATHER_FORECAST_URL = f'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{LOCATION}?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=days,hours'
+# Visual Crossing Timeline Weather API (overridable, e.g. to point at benchmarks/stub_upstream.py)
+WEATHER_TIMELINE_URL = os.getenv('VISUAL_CROSSING_BASE_URL', 'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline').rstrip('/')
 
-# Directories
+# Requests per second shared by all workers
+VISUAL_CROSSING_RATE_LIMIT = float(os.getenv('VISUAL_CROSSING_RATE_LIMIT', '5'))
+session = RateLimitedSession(VISUAL_CROSSING_RATE_LIMIT, burst=SWEEP_WORKERS)
+
+# First date to collect when the historical store is empty
+HISTORY_START = os.getenv('HISTORY_START', '2024-11-01')
+
+# Directories, with one location=<name> subdirectory per site
 WEATHER_CURRENT_DIR = 'data/weather/current/'
 WEATHER_FORECAST_DIR = 'data/weather/forecast/'
 WEATHER_HISTORICAL_DIR = 'data/weather/historical/'
 
-# Ensure directories exist
-for directory in [WEATHER_CURRENT_DIR, WEATHER_FORECAST_DIR, WEATHER_HISTORICAL_DIR]:
-    os.makedirs(directory, exist_ok=True)
+# Historical hours are stored in day partitions keyed on 'datetimeEpoch' (epoch seconds)
+WEATHER_TIMESTAMP = 'datetimeEpoch'
+WEATHER_COLUMNS = ['temp', 'dew', 'humidity', 'windgust', 'windspeed', 'winddir', 'pressure',
+                   'cloudcover', 'visibility', 'solarradiation', 'solarenergy', 'uvindex']
 
-def fetch_weather_current():
+def timeline_url(location, period=''):
+    url = f"{WEATHER_TIMELINE_URL}/{location['latitude']},{location['longitude']}"
+    return f'{url}/{period}' if period else url
+
+def fetch_weather_current(location):
+    url = f'{timeline_url(location, "today")}?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=current'
     try:
-        response = requests.get(WEATHER_CURRENT_URL)
+        response = session.get(url)
         response.raise_for_status()
         data = response.json()
-        filename = f'weather_current.json'
-        filepath = os.path.join(WEATHER_CURRENT_DIR, filename)
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
+        filepath = save_snapshot(data, WEATHER_CURRENT_DIR, location, 'weather_current.json')
         print(f'Weather current data saved to {filepath}')
     except Exception as e:
-        print(f'Error fetching current weather data: {e}')
+        print(f"Error fetching current weather data for {location['name']}: {e}")
 
-def fetch_weather_forecast():
+def fetch_weather_forecast(location):
+    url = f'{timeline_url(location)}?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=days,hours'
     try:
-        response = requests.get(WEATHER_FORECAST_URL)
+        response = session.get(url)
         response.raise_for_status()
         data = response.json()
-        filename = f'weather_forecast.json'
-        filepath = os.path.join(WEATHER_FORECAST_DIR, filename)
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
+        filepath = save_snapshot(data, WEATHER_FORECAST_DIR, location, 'weather_forecast.json')
         print(f'Weather forecast data saved to {filepath}')
     except Exception as e:
-        print(f'Error fetching weather forecast data: {e}')
+        print(f"Error fetching weather forecast data for {location['name']}: {e}")
+
+def historical_weather_url(location, start_date, end_date):
+    return f'{timeline_url(location, f"{start_date}/{end_date}")}?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=days,hours&timezone=Z'
 
-def fetch_historical_weather(start_date, end_date):
+def weather_record_chunks(body):
+    """
+    Parse a timeline response body (a binary file-like object) incrementally
+    into chunks of hourly rows with a fixed, typed schema, keeping only hours
+    that have already happened.
+    """
+    now = time.time()
+    for records in record_chunks(iter_records(body, 'days.item.hours.item'), WEATHER_TIMESTAMP, WEATHER_COLUMNS):
+        yield records[records[WEATHER_TIMESTAMP] <= now]
+
+def store_historical_weather(location, records):
+    """
+    Append records to the location's historical store and write the model
+    features to its memory-mapped feature store. Returns the number of new hours.
     """
-    Fetch historical weather data between start_date and end_date.
+    new_rows = append_records(location_root(WEATHER_HISTORICAL_DIR, location['name']), records, WEATHER_TIMESTAMP)
+    write_records(feature_matrix(location['name']), records, WEATHER_TIMESTAMP)
+    return new_rows
+
+def fetch_historical_weather(location, start_date, end_date):
+    """
+    Fetch historical weather data between start_date and end_date
+    and append the hourly records to the location's partitioned historical store.
     Dates should be in 'YYYY-MM-DD' format.
     """
-    url = f'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{LOCATION}/{start_date}/{end_date}?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=days,hours&timezone=Z'
+    url = historical_weather_url(location, start_date, end_date)
+    root = location_root(WEATHER_HISTORICAL_DIR, location['name'])
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-        data = response.json()
-        filename = f'weather_historical.json'
-        filepath = os.path.join(WEATHER_HISTORICAL_DIR, filename)
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4)
-        print(f'Historical Weather data saved to {filepath}')
+        hours = new_rows = 0
+        with session.get(url, stream=True) as response:
+            response.raise_for_status()
+            for records in weather_record_chunks(response_body(response)):
+                hours += len(records)
+                new_rows += store_historical_weather(location, records)
+        if not hours:
+            print(f"No historical weather hours returned for {location['name']}.")
+            return
+        print(f'Historical Weather data: {new_rows} new hours appended to {root}')
     except Exception as e:
-        print(f'Error fetching historical weather data: {e}')
+        print(f"Error fetching historical weather data for {location['name']}: {e}")
+
+def update_historical_weather(location):
+    """
+    Fetch only the days from the location's last stored hour (the watermark) up to today.
+    The watermark day is fetched again to complete it; duplicates are replaced.
+    """
+    watermark = read_watermark(location_root(WEATHER_HISTORICAL_DIR, location['name']), WEATHER_TIMESTAMP)
+    if watermark is None:
+        start_date = HISTORY_START
+    else:
+        start_date = pd.to_datetime(watermark, unit='s').strftime('%Y-%m-%d')
+    end_date = pd.Timestamp.now(tz='UTC').strftime('%Y-%m-%d')
+    fetch_historical_weather(location, start_date, end_date)
 
 if __name__ == '__main__':
-    fetch_weather_current()
-    fetch_weather_forecast()
-    # Example: Fetch historical data from November 1, 2024, to December 1, 2024
-    fetch_historical_weather('2024-11-01', '2024-12-01')
+    run_sweep([fetch_weather_current, fetch_weather_forecast, update_historical_weather], load_locations())
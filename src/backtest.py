@@ -0,0 +1,121 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from aqi import AQI_LEVELS, POLLUTANTS, aqi_indices
+from feature_store import FEATURE_STORE_DIR, open_location, store_locations, valid_window_starts
+from features import SEQ_LENGTH
+from preprocessing import Preprocessor
+from runners import DEFAULT_MODEL_PATHS, load_runner
+from sequences import windows_view
+
+# Model artifacts and report (relative to the project root)
+FEATURE_SCALER_PATH = "models/feature_scaler.joblib"
+TARGET_SCALER_PATH = "models/target_scaler.joblib"
+REPORT_PATH = "reports/backtest.json"
+
+def backtest_location(runner, preprocessor, location, start_epoch, end_epoch, batch_size, root=FEATURE_STORE_DIR):
+    """
+    Predict every hour of the range that has a complete 24-hour window.
+    Returns (actual, predicted) pollutant arrays shaped (n, 6) on the original scale.
+    """
+    opened = open_location(location, root)
+    if opened is None:
+        return np.empty((0, len(POLLUTANTS))), np.empty((0, len(POLLUTANTS)))
+    epochs, features, targets = opened
+    starts = valid_window_starts(features, targets, SEQ_LENGTH)
+    target_epochs = epochs[starts + SEQ_LENGTH]
+    starts = starts[(target_epochs >= start_epoch) & (target_epochs < end_epoch)]
+
+    windows = windows_view(features, SEQ_LENGTH)
+    predicted = np.empty((len(starts), len(POLLUTANTS)))
+    buffer = np.empty((batch_size, SEQ_LENGTH, features.shape[1]), dtype=preprocessor.dtype)
+    for i in range(0, len(starts), batch_size):
+        batch = starts[i:i + batch_size]
+        X = preprocessor.transform_features(windows[batch], out=buffer[:len(batch)])
+        predicted[i:i + len(batch)] = preprocessor.inverse_targets(runner.predict(X))
+    return np.asarray(targets[starts + SEQ_LENGTH], dtype=np.float64), predicted
+
+def score(actual, predicted):
+    """
+    Vectorized per-pollutant MSE/MAE and AQI-class accuracy with a confusion matrix
+    (rows: actual level, columns: predicted level).
+    """
+    if len(actual) == 0:
+        return {'hours': 0}
+    errors = predicted - actual
+    mse = np.mean(np.square(errors), axis=0)
+    mae = np.mean(np.abs(errors), axis=0)
+
+    actual_levels = aqi_indices(actual)
+    predicted_levels = aqi_indices(predicted)
+    confusion = np.bincount(actual_levels * len(AQI_LEVELS) + predicted_levels, minlength=len(AQI_LEVELS) ** 2)
+    return {
+        'hours': int(len(actual)),
+        'pollutants': {
+            pollutant: {'mse': float(mse[i]), 'mae': float(mae[i])} for i, pollutant in enumerate(POLLUTANTS)
+        },
+        'average_mse': float(mse.mean()),
+        'average_mae': float(mae.mean()),
+        'aqi_accuracy': float(np.mean(actual_levels == predicted_levels)),
+        'aqi_levels': AQI_LEVELS,
+        'aqi_confusion': confusion.reshape(len(AQI_LEVELS), len(AQI_LEVELS)).tolist(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Backtest the model over every hour of a date range in large batches.')
+    parser.add_argument('--start', required=True, help='First UTC day (YYYY-MM-DD).')
+    parser.add_argument('--end', required=True, help='Last UTC day, inclusive (YYYY-MM-DD).')
+    parser.add_argument('--locations', nargs='*', help='Locations to backtest (default: all in the feature store).')
+    parser.add_argument('--backend', default=os.getenv('MODEL_BACKEND', 'keras'), help='Model backend (keras or onnx).')
+    parser.add_argument('--model', help='Model artifact (default: the backend default under models/).')
+    parser.add_argument('--batch-size', type=int, default=1024)
+    parser.add_argument('--output', default=REPORT_PATH)
+    args = parser.parse_args()
+
+    start_epoch = int(pd.Timestamp(args.start, tz='UTC').timestamp())
+    end_epoch = int((pd.Timestamp(args.end, tz='UTC') + pd.Timedelta(days=1)).timestamp())
+    model_path = args.model or DEFAULT_MODEL_PATHS[args.backend]
+
+    runner = load_runner(args.backend, model_path)
+    preprocessor = Preprocessor.from_scalers(joblib.load(FEATURE_SCALER_PATH), joblib.load(TARGET_SCALER_PATH))
+
+    start_time = time.time()
+    results = {}
+    for location in args.locations or store_locations():
+        results[location] = backtest_location(runner, preprocessor, location, start_epoch, end_epoch, args.batch_size)
+    elapsed = time.time() - start_time
+
+    actual = np.concatenate([result[0] for result in results.values()]) if results else np.empty((0, len(POLLUTANTS)))
+    predicted = np.concatenate([result[1] for result in results.values()]) if results else np.empty((0, len(POLLUTANTS)))
+    report = {
+        'model': {'backend': args.backend, 'path': model_path},
+        'range': {'start': args.start, 'end': args.end},
+        'elapsed_seconds': elapsed,
+        'hours_per_second': len(actual) / elapsed if elapsed > 0 else None,
+        'overall': score(actual, predicted),
+        'locations': {location: score(*result) for location, result in results.items()},
+    }
+
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    overall = report['overall']
+    print(f"Backtested {overall['hours']} hours over {len(results)} locations in {elapsed:.2f}s")
+    if overall['hours']:
+        for pollutant, metrics in overall['pollutants'].items():
+            print(f"Pollutant {pollutant} - MSE: {metrics['mse']:.4f}, MAE: {metrics['mae']:.4f}")
+        print(f"AQI level accuracy: {overall['aqi_accuracy']:.2%}")
+    print(f'Report saved to {args.output}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+import argparse
+import json
+import os
+
+import joblib
+import numpy as np
+import pyarrow.parquet as pq
+from sklearn.preprocessing import StandardScaler
+
+from dataset import FEATURES, SEQ_LENGTH, TARGETS, TIMESTAMP
+from merge import MERGED_PATH
+from sequences import sequence_index
+
+# Sequence artifacts (DVC `features` stage output)
+FEATURES_DIR = 'data/features'
+FEATURE_SCALER_PATH = 'models/feature_scaler.joblib'
+TARGET_SCALER_PATH = 'models/target_scaler.joblib'
+
+# Rows converted per Parquet batch
+BATCH_ROWS = 65536
+
+def feature_paths(features_dir=FEATURES_DIR):
+    """
+    Paths of the arrays written by this stage.
+
+    features.npy (R, F) and targets.npy (R, T) hold the raw float32 rows,
+    timestamps.npy their epochs. A window starting at row s covers rows
+    s .. s+SEQ_LENGTH-1 and predicts row s+SEQ_LENGTH, so the sequences are
+    stored as int64 start rows (train_windows.npy, test_windows.npy) instead
+    of 24 copies of every row.
+    """
+    names = ['features', 'targets', 'timestamps', 'train_windows', 'test_windows']
+    paths = {name: os.path.join(features_dir, f'{name}.npy') for name in names}
+    paths['locations'] = os.path.join(features_dir, 'locations.json')
+    return paths
+
+def window_starts(locations, timestamps):
+    """
+    Start rows of all windows that stay within one location and span no missing hour.
+    Also returns {location: [first_row, end_row)} for the sorted rows.
+    """
+    names, first_rows = np.unique(locations, return_index=True)
+    order = np.argsort(first_rows)
+    bounds = list(first_rows[order]) + [len(locations)]
+    segments = {}
+    starts = []
+    for i, name in enumerate(names[order]):
+        first, end = int(bounds[i]), int(bounds[i + 1])
+        segments[str(name)] = [first, end]
+        starts.append(sequence_index(timestamps[first:end], SEQ_LENGTH) + first)
+    return (np.concatenate(starts) if starts else np.empty(0, dtype=np.int64)), segments
+
+def build_features(merged_path=MERGED_PATH, features_dir=FEATURES_DIR, train_ratio=0.8):
+    """
+    Convert the merged dataset into memory-mappable arrays, split the windows
+    chronologically and fit the scalers, without loading all rows at once.
+    """
+    parquet = pq.ParquetFile(merged_path)
+    rows = parquet.metadata.num_rows
+    if rows == 0:
+        raise SystemExit(f'{merged_path} is empty. Collect or backfill history first.')
+    paths = feature_paths(features_dir)
+    os.makedirs(features_dir, exist_ok=True)
+
+    # Only the index columns are read whole; features and targets are streamed into memmaps
+    index = pq.read_table(merged_path, columns=['location', TIMESTAMP])
+    locations = index.column('location').to_numpy()
+    timestamps = index.column(TIMESTAMP).to_numpy().astype(np.int64)
+    np.save(paths['timestamps'], timestamps)
+
+    features = np.lib.format.open_memmap(paths['features'], mode='w+', dtype=np.float32, shape=(rows, len(FEATURES)))
+    targets = np.lib.format.open_memmap(paths['targets'], mode='w+', dtype=np.float32, shape=(rows, len(TARGETS)))
+    feature_scaler, target_scaler = StandardScaler(), StandardScaler()
+    offset = 0
+    for batch in parquet.iter_batches(batch_size=BATCH_ROWS, columns=FEATURES + TARGETS):
+        batch = batch.to_pandas()
+        end = offset + len(batch)
+        features[offset:end] = batch[FEATURES].to_numpy()
+        targets[offset:end] = batch[TARGETS].to_numpy()
+        feature_scaler.partial_fit(batch[FEATURES].to_numpy())
+        target_scaler.partial_fit(batch[TARGETS].to_numpy())
+        offset = end
+    features.flush()
+    targets.flush()
+
+    # Chronological split on the time of each window's target hour
+    starts, segments = window_starts(locations, timestamps)
+    target_times = timestamps[starts + SEQ_LENGTH]
+    split_epoch = timestamps.min() + train_ratio * (timestamps.max() - timestamps.min())
+    np.save(paths['train_windows'], starts[target_times < split_epoch])
+    np.save(paths['test_windows'], starts[target_times >= split_epoch])
+    with open(paths['locations'], 'w') as f:
+        json.dump(segments, f, indent=4)
+
+    os.makedirs(os.path.dirname(FEATURE_SCALER_PATH), exist_ok=True)
+    joblib.dump(feature_scaler, FEATURE_SCALER_PATH)
+    joblib.dump(target_scaler, TARGET_SCALER_PATH)
+    print(f'{rows} rows, {len(starts)} windows ({int((target_times < split_epoch).sum())} train) written to {features_dir}')
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the training sequence arrays and fit the scalers.')
+    parser.add_argument('--merged', default=MERGED_PATH)
+    parser.add_argument('--output', default=FEATURES_DIR)
+    parser.add_argument('--train-ratio', type=float, default=0.8, help='Share of the time range used for training.')
+    args = parser.parse_args()
+    build_features(args.merged, args.output, args.train_ratio)
+
+if __name__ == '__main__':
+    main()
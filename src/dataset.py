@@ -0,0 +1,158 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+from feature_store import FEATURE_COLUMNS, FEATURE_STORE_DIR, TARGET_COLUMNS, open_location, store_locations, valid_window_starts
+from features import FEATURES, SEQ_LENGTH
+from history_store import list_locations, list_partitions, location_root, read_range
+from sequences import sequence_index, windows_view
+
+TARGETS = TARGET_COLUMNS
+assert FEATURE_COLUMNS == FEATURES, 'The feature store columns must match the model features'
+
+# Historical stores written by the collectors (relative to the project root)
+AIR_QUALITY_HISTORICAL_DIR = 'data/air_quality/historical'
+WEATHER_HISTORICAL_DIR = 'data/weather/historical'
+
+# Merged rows are keyed on this column (epoch seconds, UTC)
+TIMESTAMP = 'timestamp'
+
+# Days of history read at a time; bounds memory per location
+BLOCK_DAYS = 30
+
+# Rows further than this many standard deviations from the mean are dropped, as in the notebook
+OUTLIER_Z = 3.0
+
+
+def training_locations():
+    """
+    Locations with both air quality and weather history.
+    """
+    return sorted(set(list_locations(AIR_QUALITY_HISTORICAL_DIR)) & set(list_locations(WEATHER_HISTORICAL_DIR)))
+
+
+def read_merged(location, start=None, end=None):
+    """
+    Hourly weather features joined with the pollutant targets of one location,
+    for start <= timestamp < end (epoch seconds). Rows with missing values are dropped.
+    """
+    air = read_range(location_root(AIR_QUALITY_HISTORICAL_DIR, location), 'dt', start, end, columns=TARGETS)
+    weather = read_range(location_root(WEATHER_HISTORICAL_DIR, location), 'datetimeEpoch', start, end, columns=FEATURES)
+    merged = pd.merge(
+        weather.rename(columns={'datetimeEpoch': TIMESTAMP}),
+        air.rename(columns={'dt': TIMESTAMP}),
+        on=TIMESTAMP, how='inner'
+    )
+    merged[TIMESTAMP] = merged[TIMESTAMP].astype(np.int64)
+    return merged.dropna().sort_values(TIMESTAMP).reset_index(drop=True)
+
+
+def iter_merged_blocks(location, block_days=BLOCK_DAYS):
+    """
+    Yield the merged history of a location in chronological blocks of block_days day partitions.
+    """
+    days = list_partitions(location_root(AIR_QUALITY_HISTORICAL_DIR, location))
+    for i in range(0, len(days), block_days):
+        start = int(pd.Timestamp(days[i], tz='UTC').timestamp())
+        end = int((pd.Timestamp(days[min(i + block_days, len(days)) - 1], tz='UTC') + pd.Timedelta(days=1)).timestamp())
+        block = read_merged(location, start, end)
+        if not block.empty:
+            yield block
+
+
+def iter_sequence_blocks(location, seq_length=SEQ_LENGTH, block_days=BLOCK_DAYS, row_filter=None):
+    """
+    Yield (X, y, target_epochs) for the windows of a location, one block at a time.
+
+    Only one block of windows is materialized at a time, and no window spans
+    a missing hour. The last seq_length rows of each block are carried into the
+    next one so windows crossing a block boundary are not lost. row_filter, if
+    given, drops rows (e.g. outliers) from each block before windowing.
+    """
+    tail = None
+    for block in iter_merged_blocks(location, block_days):
+        if row_filter is not None:
+            block = row_filter(block)
+        if tail is not None:
+            block = pd.concat([tail, block], ignore_index=True)
+        tail = block.iloc[-seq_length:]
+        if len(block) <= seq_length:
+            continue
+
+        epochs = block[TIMESTAMP].to_numpy()
+        starts = sequence_index(epochs, seq_length)
+        if len(starts) == 0:
+            continue
+        X = windows_view(block[FEATURES].to_numpy(dtype=np.float32), seq_length)
+        y = block[TARGETS].to_numpy(dtype=np.float32)[seq_length:]
+        yield X[starts], y[starts], epochs[seq_length:][starts]
+
+
+def fit_outlier_filter(locations, block_days=BLOCK_DAYS, z=OUTLIER_Z):
+    """
+    Stream the history once to get the mean/std of every column, and return a
+    function that drops rows with any feature or target more than z standard
+    deviations from the mean.
+    """
+    feature_stats, target_stats = StandardScaler(), StandardScaler()
+    for location in locations:
+        for block in iter_merged_blocks(location, block_days):
+            feature_stats.partial_fit(block[FEATURES].to_numpy())
+            target_stats.partial_fit(block[TARGETS].to_numpy())
+
+    def row_filter(block):
+        if not hasattr(feature_stats, 'mean_'):
+            return block
+        feature_z = np.abs(block[FEATURES].to_numpy() - feature_stats.mean_) / feature_stats.scale_
+        target_z = np.abs(block[TARGETS].to_numpy() - target_stats.mean_) / target_stats.scale_
+        return block[(feature_z <= z).all(axis=1) & (target_z <= z).all(axis=1)]
+
+    return row_filter
+
+
+def partial_fit_rows(scaler, array, mask, chunk_rows=65536):
+    """
+    partial_fit the scaler on the rows allowed by mask, one chunk of the memmap at a time.
+    """
+    for i in range(0, len(array), chunk_rows):
+        rows = np.asarray(array[i:i + chunk_rows])[mask[i:i + chunk_rows]]
+        if len(rows):
+            scaler.partial_fit(rows)
+
+
+def load_store_windows(locations=None, seq_length=SEQ_LENGTH, outlier_z=OUTLIER_Z, root=FEATURE_STORE_DIR):
+    """
+    Open the memory-mapped feature store of each location and find its valid windows.
+
+    Rows with a missing value, or with any value more than outlier_z standard
+    deviations from the mean of all locations, are unusable, and windows never
+    include them. Returns a list of (location, epochs, features, targets, starts, usable)
+    where features and targets are read-only memmap views.
+    """
+    stores = []
+    for location in locations or store_locations(root):
+        opened = open_location(location, root)
+        if opened is not None:
+            stores.append((location, *opened))
+
+    feature_stats, target_stats = StandardScaler(), StandardScaler()
+    complete = []
+    for _, _, features, targets in stores:
+        mask = ~np.isnan(features).any(axis=1) & ~np.isnan(targets).any(axis=1)
+        partial_fit_rows(feature_stats, features, mask)
+        partial_fit_rows(target_stats, targets, mask)
+        complete.append(mask)
+
+    windows = []
+    for (location, epochs, features, targets), mask in zip(stores, complete):
+        if mask.any():
+            with np.errstate(invalid='ignore'):
+                mask = mask & (np.abs(features - feature_stats.mean_) <= outlier_z * feature_stats.scale_).all(axis=1)
+                mask = mask & (np.abs(targets - target_stats.mean_) <= outlier_z * target_stats.scale_).all(axis=1)
+        windows.append((location, epochs, features, targets, valid_window_starts(features, targets, seq_length, mask), mask))
+    return windows
@@ -0,0 +1,42 @@
+import argparse
+import json
+import os
+
+import joblib
+import numpy as np
+from tensorflow.keras.models import load_model
+
+from build_features import FEATURES_DIR, feature_paths
+from train import FEATURE_SCALER_PATH, MODEL_PATH, TARGET_SCALER_PATH, evaluate, make_feature_dataset
+
+# Test-set metrics (DVC `evaluate` stage metrics file)
+METRICS_PATH = 'reports/metrics.json'
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate the trained model on the held-out windows.')
+    parser.add_argument('--features-dir', default=FEATURES_DIR)
+    parser.add_argument('--output', default=METRICS_PATH)
+    parser.add_argument('--batch-size', type=int, default=256)
+    args = parser.parse_args()
+
+    model = load_model(MODEL_PATH)
+    feature_scaler, target_scaler = joblib.load(FEATURE_SCALER_PATH), joblib.load(TARGET_SCALER_PATH)
+    test_ds = make_feature_dataset(args.features_dir, 'test', feature_scaler, target_scaler, False, args.batch_size)
+    per_target = evaluate(model, test_ds, target_scaler)
+
+    for target, metrics in per_target.items():
+        print(f"Pollutant {target} - MSE: {metrics['mse']:.4f}, MAE: {metrics['mae']:.4f}")
+
+    report = {
+        'windows': int(len(np.load(feature_paths(args.features_dir)['test_windows'], mmap_mode='r'))),
+        'average_mse': float(np.mean([m['mse'] for m in per_target.values()])) if per_target else None,
+        'average_mae': float(np.mean([m['mae'] for m in per_target.values()])) if per_target else None,
+        'pollutants': {target: {k: float(v) for k, v in metrics.items()} for target, metrics in per_target.items()},
+    }
+    os.makedirs(os.path.dirname(args.output), exist_ok=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"Average MSE: {report['average_mse']}, Average MAE: {report['average_mae']} (saved to {args.output})")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import tensorflow as tf
+from tensorflow.keras.models import load_model
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from features import FEATURES, SEQ_LENGTH
+from runners import OnnxRunner
+
+# Model paths (relative to the project root)
+KERAS_MODEL_PATH = "models/model.keras"
+ONNX_MODEL_PATH = "models/model.onnx"
+
+def export_onnx(model, output_path, opset=13):
+    """
+    Convert a Keras model to ONNX with a dynamic batch dimension.
+    """
+    # tf2onnx is only needed at export time, not for serving
+    import tf2onnx
+
+    input_signature = [tf.TensorSpec((None, SEQ_LENGTH, len(FEATURES)), tf.float32, name='input')]
+    inference_fn = tf.function(lambda x: model(x, training=False), input_signature=input_signature)
+    tf2onnx.convert.from_function(inference_fn, input_signature=input_signature, opset=opset, output_path=output_path)
+
+def verify_parity(model, runner, batch_sizes=(1, 8, 64), atol=1e-4):
+    """
+    Compare exported predictions with Keras on random inputs.
+    Returns the largest absolute difference seen.
+    """
+    rng = np.random.default_rng(0)
+    max_diff = 0.0
+    for batch_size in batch_sizes:
+        X = rng.standard_normal((batch_size, SEQ_LENGTH, len(FEATURES))).astype(np.float32)
+        diff = float(np.max(np.abs(runner.predict(X) - model.predict_on_batch(X))))
+        print(f"Batch size {batch_size}: max abs difference {diff:.2e}")
+        max_diff = max(max_diff, diff)
+    if max_diff > atol:
+        raise ValueError(f"Exported model differs from Keras by {max_diff:.2e} (tolerance {atol:.0e}).")
+    return max_diff
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Keras LSTM to ONNX and verify numerical parity.")
+    parser.add_argument('--model', default=KERAS_MODEL_PATH, help="Path to the Keras model")
+    parser.add_argument('--output', default=ONNX_MODEL_PATH, help="Path of the exported ONNX model")
+    parser.add_argument('--opset', type=int, default=13, help="ONNX opset version")
+    parser.add_argument('--atol', type=float, default=1e-4, help="Maximum allowed absolute difference")
+    args = parser.parse_args()
+
+    model = load_model(args.model)
+    export_onnx(model, args.output, opset=args.opset)
+    print(f"Exported {args.model} to {args.output}")
+
+    verify_parity(model, OnnxRunner(args.output), atol=args.atol)
+    print("Parity check passed.")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import os
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dataset import BLOCK_DAYS, FEATURES, OUTLIER_Z, TARGETS, TIMESTAMP, fit_outlier_filter, iter_merged_blocks, training_locations
+
+# Merged, outlier-filtered rows of every location (DVC `merge` stage output)
+MERGED_PATH = 'data/processed/merged.parquet'
+
+SCHEMA = pa.schema(
+    [('location', pa.string()), (TIMESTAMP, pa.int64())]
+    + [(column, pa.float64()) for column in FEATURES + TARGETS]
+)
+
+def merge(output_path=MERGED_PATH, block_days=BLOCK_DAYS, outlier_z=OUTLIER_Z):
+    """
+    Join weather and air quality history, drop outliers and write all locations
+    to one Parquet file sorted by (location, timestamp), one block at a time.
+    Returns the number of rows written.
+    """
+    locations = training_locations()
+    row_filter = fit_outlier_filter(locations, block_days, outlier_z)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    rows = 0
+    with pq.ParquetWriter(output_path, SCHEMA, compression='zstd') as writer:
+        for location in locations:
+            for block in iter_merged_blocks(location, block_days):
+                block = row_filter(block)
+                block.insert(0, 'location', location)
+                writer.write_table(pa.Table.from_pandas(block[SCHEMA.names], schema=SCHEMA, preserve_index=False))
+                rows += len(block)
+    print(f'Merged {rows} rows from {len(locations)} locations into {output_path}')
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description='Merge the weather and air quality history into one outlier-filtered dataset.')
+    parser.add_argument('--output', default=MERGED_PATH)
+    parser.add_argument('--block-days', type=int, default=BLOCK_DAYS, help='Days of history read at a time.')
+    parser.add_argument('--outlier-z', type=float, default=OUTLIER_Z, help='Rows beyond this z-score are dropped.')
+    args = parser.parse_args()
+    merge(args.output, args.block_days, args.outlier_z)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+# Spacing of consecutive records in the historical data (hourly)
+STEP_SECONDS = 3600
+
+
+def to_epochs(timestamps):
+    """
+    Convert a timestamp column (datetime64 or epoch seconds) to int64 epoch seconds.
+    """
+    timestamps = pd.Series(timestamps)
+    if pd.api.types.is_datetime64_any_dtype(timestamps):
+        return timestamps.to_numpy(dtype='datetime64[s]').astype(np.int64)
+    return timestamps.to_numpy(dtype=np.int64)
+
+
+def windows_view(values, seq_length):
+    """
+    Zero-copy (n, seq_length, F) view of every window of values that is followed by a target row.
+    Window i covers rows i .. i+seq_length-1 and predicts row i+seq_length.
+    """
+    return sliding_window_view(values[:-1], seq_length, axis=0).transpose(0, 2, 1)
+
+
+def sequence_index(epochs, seq_length, step=STEP_SECONDS):
+    """
+    Start rows of the windows that do not span a missing hour: the window and
+    its target row must be seq_length + 1 consecutive records `step` seconds apart.
+    """
+    epochs = np.asarray(epochs)
+    if len(epochs) <= seq_length:
+        return np.empty(0, dtype=np.int64)
+    contiguous = np.diff(epochs) == step
+    # Number of gaps before each row; a window is valid if none fall inside it
+    gaps = np.concatenate(([0], np.cumsum(~contiguous)))
+    return np.flatnonzero(gaps[seq_length:] == gaps[:-seq_length])
+
+
+def create_sequences(df, seq_length, features, targets, timestamp_column=None, step=STEP_SECONDS, copy=False):
+    """
+    Create sequences of data for LSTM.
+
+    :param df: DataFrame containing the data, sorted by time
+    :param seq_length: Number of past time steps to include in each sequence
+    :param features: List of feature column names
+    :param targets: List of target column names
+    :param timestamp_column: Optional time column; windows spanning a missing hour are skipped
+    :param step: Expected spacing of the timestamps in seconds
+    :param copy: Return a writable, contiguous X instead of a read-only view
+    :return: Tuple of numpy arrays (X, y) with shapes (n, seq_length, F) and (n, T)
+
+    X is a view on a single copy of the feature columns when no window is
+    skipped; otherwise only the valid windows are gathered.
+    """
+    values = df[features].to_numpy()
+    target_values = df[targets].to_numpy()
+    if len(df) <= seq_length:
+        return np.empty((0, seq_length, len(features)), dtype=values.dtype), np.empty((0, len(targets)), dtype=target_values.dtype)
+
+    X = windows_view(values, seq_length)
+    y = target_values[seq_length:]
+
+    if timestamp_column is not None:
+        starts = sequence_index(to_epochs(df[timestamp_column]), seq_length, step)
+        if len(starts) < len(X):
+            X, y = X[starts], y[starts]
+
+    if copy:
+        X = np.ascontiguousarray(X)
+    return X, y
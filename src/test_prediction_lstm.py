@@ -1,10 +1,17 @@
 import os
+import sys
 import requests
 from dotenv import load_dotenv
 import pandas as pd
 import joblib
 from tensorflow.keras.models import load_model
 
+# Share the window extraction used by the Flask app
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'app'))
+from aqi import determine_aqi
+from features import FEATURES, extract_past_24_hours
+from preprocessing import Preprocessor
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -19,15 +26,6 @@ FEATURE_SCALER_PATH = "../models/feature_scaler.joblib"
 TARGET_SCALER_PATH = "../models/target_scaler.joblib"
 MODEL_PATH = "../models/model.keras"
 
-# AQI Classification Ranges
-AQI_RANGES = [
-    {"level": "Good", "so2": (0, 20), "no2": (0, 40), "pm10": (0, 20), "pm2_5": (0, 10), "o3": (0, 60), "co": (0, 4400)},
-    {"level": "Fair", "so2": (20, 80), "no2": (40, 70), "pm10": (20, 50), "pm2_5": (10, 25), "o3": (60, 100), "co": (4400, 9400)},
-    {"level": "Moderate", "so2": (80, 250), "no2": (70, 150), "pm10": (50, 100), "pm2_5": (25, 50), "o3": (100, 140), "co": (9400, 12400)},
-    {"level": "Poor", "so2": (250, 350), "no2": (150, 200), "pm10": (100, 200), "pm2_5": (50, 75), "o3": (140, 180), "co": (12400, 15400)},
-    {"level": "Very Poor", "so2": (350, float('inf')), "no2": (200, float('inf')), "pm10": (200, float('inf')), "pm2_5": (75, float('inf')), "o3": (180, float('inf')), "co": (15400, float('inf'))},
-]
-
 # Define targets
 TARGETS = ['components.so2', 'components.no2', 'components.pm10', 'components.pm2_5', 'components.o3', 'components.co']
 
@@ -36,7 +34,7 @@ def fetch_weather_data(start_date, end_date):
     Fetch historical weather data between start_date and end_date.
     Dates should be in 'YYYY-MM-DD' format.
     """
-    url = f'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{LOCATION}/{start_date}/{end_date}?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=hours&elements=datetime,temp,dew,humidity,windspeed,windgust,winddir,pressure,solarenergy,cloudcover,solarradiation,uvindex'
+    url = f'https://weather.visualcrossing.com/VisualCrossingWebServices/rest/services/timeline/{LOCATION}/{start_date}/{end_date}?unitGroup=metric&key={VISUAL_CROSSING_API_KEY}&include=hours&elements=datetime,datetimeEpoch,temp,dew,humidity,windspeed,windgust,winddir,pressure,solarenergy,cloudcover,solarradiation,uvindex'
     try:
         response = requests.get(url)
         response.raise_for_status()
@@ -46,83 +44,21 @@ def fetch_weather_data(start_date, end_date):
         print(f'Error fetching weather data: {e}')
         return None
 
-def extract_past_24_hours(data, target_date, target_hour):
+def load_preprocessor():
     """
-    Extract the past 24 hours of data up to the target_date and target_hour.
+    Load the scalers once and compile them into a Preprocessor.
     """
-    # Combine hours from both days
-    all_hours = []
-    for day in data.get('days', []):
-        for hour_data in day.get('hours', []):
-            # Combine date and time
-            datetime_str = f"{day['datetime']}T{hour_data['datetime']}"
-            timestamp = pd.to_datetime(datetime_str)
-            all_hours.append({**hour_data, 'timestamp': timestamp})
-    
-    # Sort all_hours by timestamp
-    all_hours = sorted(all_hours, key=lambda x: x['timestamp'])
-    
-    # Convert to DataFrame
-    df = pd.DataFrame(all_hours)
-    
-    # Convert target_date and target_hour to timestamp
-    target_datetime_str = f"{target_date}T{target_hour:02d}:00:00"
-    target_timestamp = pd.to_datetime(target_datetime_str)
-    
-    # Find the index where timestamp == target_timestamp
-    target_index = df.index[df['timestamp'] == target_timestamp].tolist()
-    if not target_index:
-        print("Specified datetime not found in the fetched data.")
-        return None
-    target_index = target_index[0]
-    
-    # Extract the past 24 hours
-    start_index = target_index - 23  # inclusive of target_index
-    if start_index < 0:
-        print("Not enough historical data to extract past 24 hours.")
-        return None
-    past_24_hours = df.iloc[start_index:target_index + 1]
-    
-    return past_24_hours
+    feature_scaler = joblib.load(FEATURE_SCALER_PATH)
+    target_scaler = joblib.load(TARGET_SCALER_PATH)
+    return Preprocessor.from_scalers(feature_scaler, target_scaler)
 
-def preprocess_data(past_24_hours):
+def preprocess_data(past_24_hours, preprocessor):
     """
     Preprocess the past 24 hours data:
-    - Select required features
     - Scale features
-    - Reshape for model input
+    - Reshape for model input, (1, 24, 8)
     """
-    required_features = ['temp', 'dew', 'humidity', 'windspeed', 'windgust', 'winddir', 'pressure', 'solarenergy']
-    if not all(feature in past_24_hours.columns for feature in required_features):
-        print("Missing required features in the data.")
-        return None
-    
-    X = past_24_hours[required_features].values  # Shape: (24, 8)
-    
-    # Load scalers
-    feature_scaler = joblib.load(FEATURE_SCALER_PATH)
-    
-    # Scale features
-    X_scaled = feature_scaler.transform(X)  # Shape: (24, 8)
-    
-    # Reshape to (1, 24, 8)
-    X_scaled = X_scaled.reshape(1, 24, 8)
-    
-    return X_scaled
-
-def determine_aqi(pollutant_values):
-    """
-    Determine AQI level based on pollutant values.
-    """
-    for aqi in AQI_RANGES:
-        if (aqi["so2"][0] <= pollutant_values["so2"] < aqi["so2"][1] and
-            aqi["no2"][0] <= pollutant_values["no2"] < aqi["no2"][1] and
-            aqi["pm10"][0] <= pollutant_values["pm10"] < aqi["pm10"][1] and
-            aqi["pm2_5"][0] <= pollutant_values["pm2_5"] < aqi["pm2_5"][1] and
-            aqi["o3"][0] <= pollutant_values["o3"] < aqi["o3"][1] and
-            aqi["co"][0] <= pollutant_values["co"] < aqi["co"][1]):
-            return aqi["level"]
-    return "Very Poor"
+    return preprocessor.transform_features(past_24_hours)
 
 def main():
     # User-specified date and hour
@@ -145,12 +81,11 @@ def main():
         return
     
     print("Past 24 Hours Data:")
-    print(past_24_hours[['timestamp', 'temp', 'dew', 'humidity', 'windspeed', 'windgust', 'winddir', 'pressure', 'solarenergy']])
+    print(pd.DataFrame(past_24_hours, columns=FEATURES))
     
     # Preprocess data
-    X_scaled = preprocess_data(past_24_hours)
-    if X_scaled is None:
-        return
+    preprocessor = load_preprocessor()
+    X_scaled = preprocess_data(past_24_hours, preprocessor)
     
     # Load the local model
     try:
@@ -163,8 +98,7 @@ def main():
     y_pred_scaled = best_model.predict(X_scaled)
     
     # Inverse transform predictions
-    target_scaler = joblib.load(TARGET_SCALER_PATH)
-    y_pred = target_scaler.inverse_transform(y_pred_scaled)
+    y_pred = preprocessor.inverse_targets(y_pred_scaled)
     
     # Print predicted pollutant values
     pollutant_values = {
@@ -0,0 +1,253 @@
+import argparse
+import os
+
+import joblib
+import numpy as np
+import tensorflow as tf
+from sklearn.preprocessing import StandardScaler
+from tensorflow.keras.callbacks import EarlyStopping, ReduceLROnPlateau
+from tensorflow.keras.layers import LSTM, InputLayer, Dense, Dropout
+from tensorflow.keras.models import Sequential
+from tensorflow.keras.optimizers import Adam
+
+from build_features import FEATURES_DIR, feature_paths
+from dataset import (BLOCK_DAYS, FEATURES, OUTLIER_Z, SEQ_LENGTH, TARGETS, TIMESTAMP, partial_fit_rows, fit_outlier_filter,
+                     iter_merged_blocks, iter_sequence_blocks, load_store_windows, training_locations)
+from sequences import windows_view
+
+# Output paths (relative to the project root)
+MODEL_PATH = "models/model.keras"
+FEATURE_SCALER_PATH = "models/feature_scaler.joblib"
+TARGET_SCALER_PATH = "models/target_scaler.joblib"
+
+def fit_scalers(locations, block_days=BLOCK_DAYS, outlier_z=OUTLIER_Z):
+    """
+    Fit the scalers in two streaming passes over the history, one block in memory at a time.
+
+    The first pass gives the raw mean/std used to drop outliers; the second fits
+    the feature and target scalers on the remaining rows with partial_fit.
+    Returns (feature_scaler, target_scaler, row_filter, (first_epoch, last_epoch)).
+    """
+    row_filter = fit_outlier_filter(locations, block_days, outlier_z)
+
+    feature_scaler, target_scaler = StandardScaler(), StandardScaler()
+    first_epoch, last_epoch = None, None
+    for location in locations:
+        for block in iter_merged_blocks(location, block_days):
+            block = row_filter(block)
+            if block.empty:
+                continue
+            feature_scaler.partial_fit(block[FEATURES].to_numpy())
+            target_scaler.partial_fit(block[TARGETS].to_numpy())
+            first_epoch = block[TIMESTAMP].iloc[0] if first_epoch is None else min(first_epoch, block[TIMESTAMP].iloc[0])
+            last_epoch = block[TIMESTAMP].iloc[-1] if last_epoch is None else max(last_epoch, block[TIMESTAMP].iloc[-1])
+
+    return feature_scaler, target_scaler, row_filter, (first_epoch, last_epoch)
+
+def make_dataset(locations, feature_scaler, target_scaler, row_filter, split_epoch, training,
+                 batch_size=32, block_days=BLOCK_DAYS, shuffle_buffer=4096):
+    """
+    tf.data pipeline of scaled (X, y) batches read lazily from the partitioned history.
+
+    Locations are read in parallel (interleave), each yielding blocks of raw
+    windows; scaling runs as a parallel map and batches are prefetched.
+    Windows whose target is before split_epoch are the training set, the rest the test set.
+    """
+    feature_mean, feature_scale = feature_scaler.mean_.astype(np.float32), feature_scaler.scale_.astype(np.float32)
+    target_mean, target_scale = target_scaler.mean_.astype(np.float32), target_scaler.scale_.astype(np.float32)
+
+    def blocks(location):
+        for X, y, epochs in iter_sequence_blocks(location.decode(), SEQ_LENGTH, block_days, row_filter):
+            keep = epochs < split_epoch if training else epochs >= split_epoch
+            if keep.any():
+                yield X[keep], y[keep]
+
+    signature = (
+        tf.TensorSpec((None, SEQ_LENGTH, len(FEATURES)), tf.float32),
+        tf.TensorSpec((None, len(TARGETS)), tf.float32),
+    )
+
+    def scale(X, y):
+        return (X - feature_mean) / feature_scale, (y - target_mean) / target_scale
+
+    dataset = tf.data.Dataset.from_tensor_slices(locations).interleave(
+        lambda location: tf.data.Dataset.from_generator(blocks, output_signature=signature, args=(location,)),
+        cycle_length=len(locations),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not training
+    )
+    dataset = dataset.map(scale, num_parallel_calls=tf.data.AUTOTUNE).unbatch()
+    if training:
+        dataset = dataset.shuffle(shuffle_buffer)
+    return dataset.batch(batch_size).prefetch(tf.data.AUTOTUNE)
+
+def make_window_dataset(sources, index, feature_scaler, target_scaler, training, batch_size=32):
+    """
+    tf.data pipeline of scaled (X, y) batches gathered from memory-mapped rows.
+
+    sources is a list of (features, targets) arrays and index an (n, 2) array of
+    (source, start row) pairs; window rows are only read when their batch is
+    gathered, so just the index is held in memory. The index is shuffled in
+    full each epoch when training.
+    """
+    windows = [windows_view(features, SEQ_LENGTH) for features, _ in sources]
+    targets = [targets for _, targets in sources]
+
+    feature_mean, feature_scale = feature_scaler.mean_.astype(np.float32), feature_scaler.scale_.astype(np.float32)
+    target_mean, target_scale = target_scaler.mean_.astype(np.float32), target_scaler.scale_.astype(np.float32)
+
+    def gather(batch):
+        X = np.empty((len(batch), SEQ_LENGTH, len(FEATURES)), dtype=np.float32)
+        y = np.empty((len(batch), len(TARGETS)), dtype=np.float32)
+        for source in np.unique(batch[:, 0]):
+            selected = batch[:, 0] == source
+            X[selected] = windows[source][batch[selected, 1]]
+            y[selected] = targets[source][batch[selected, 1] + SEQ_LENGTH]
+        return X, y
+
+    def load(batch):
+        X, y = tf.numpy_function(gather, [batch], (tf.float32, tf.float32))
+        X.set_shape((None, SEQ_LENGTH, len(FEATURES)))
+        y.set_shape((None, len(TARGETS)))
+        return (X - feature_mean) / feature_scale, (y - target_mean) / target_scale
+
+    dataset = tf.data.Dataset.from_tensor_slices(np.asarray(index, dtype=np.int64).reshape(-1, 2))
+    if training:
+        dataset = dataset.shuffle(len(index), reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size).map(load, num_parallel_calls=tf.data.AUTOTUNE, deterministic=not training)
+    return dataset.prefetch(tf.data.AUTOTUNE)
+
+def make_feature_dataset(features_dir, split, feature_scaler, target_scaler, training, batch_size=32):
+    """
+    tf.data pipeline over the `features` stage arrays (memory-mapped) for the train or test split.
+    """
+    paths = feature_paths(features_dir)
+    sources = [(np.load(paths['features'], mmap_mode='r'), np.load(paths['targets'], mmap_mode='r'))]
+    starts = np.load(paths[f'{split}_windows'])
+    index = np.column_stack([np.zeros_like(starts), starts])
+    return make_window_dataset(sources, index, feature_scaler, target_scaler, training, batch_size)
+
+def store_datasets(stores, train_ratio, batch_size=32):
+    """
+    Fit the scalers on the usable rows of the memory-mapped feature store and
+    return (feature_scaler, target_scaler, train_ds, test_ds), split chronologically.
+    """
+    feature_scaler, target_scaler = StandardScaler(), StandardScaler()
+    for _, _, features, targets, _, usable in stores:
+        partial_fit_rows(feature_scaler, features, usable)
+        partial_fit_rows(target_scaler, targets, usable)
+
+    first_epoch = min(epochs[0] for _, epochs, *_ in stores)
+    last_epoch = max(epochs[-1] for _, epochs, *_ in stores)
+    split_epoch = first_epoch + train_ratio * (last_epoch - first_epoch)
+
+    sources, train_index, test_index = [], [], []
+    for source, (_, epochs, features, targets, starts, _) in enumerate(stores):
+        sources.append((features, targets))
+        is_train = epochs[starts + SEQ_LENGTH] < split_epoch
+        train_index.append(np.column_stack([np.full(is_train.sum(), source), starts[is_train]]))
+        test_index.append(np.column_stack([np.full((~is_train).sum(), source), starts[~is_train]]))
+
+    train_ds = make_window_dataset(sources, np.concatenate(train_index), feature_scaler, target_scaler, True, batch_size)
+    test_ds = make_window_dataset(sources, np.concatenate(test_index), feature_scaler, target_scaler, False, batch_size)
+    return feature_scaler, target_scaler, train_ds, test_ds
+
+def build_lstm_model(input_shape, output_size, units=128, dropout=0.2, learning_rate=0.001):
+    """
+    Build and compile an LSTM model (same architecture as src/lstm.ipynb).
+    """
+    model = Sequential()
+    model.add(InputLayer(shape=input_shape))
+    model.add(LSTM(units, activation='tanh', return_sequences=True))
+    model.add(Dropout(dropout))
+    model.add(LSTM(units, activation='tanh', return_sequences=True))
+    model.add(Dropout(dropout))
+    model.add(LSTM(units, activation='tanh'))
+    model.add(Dropout(dropout))
+    model.add(Dense(output_size, activation='linear'))  # Linear activation for regression
+    model.compile(optimizer=Adam(learning_rate=learning_rate), loss='mse', metrics=['mae'])
+    return model
+
+def evaluate(model, dataset, target_scaler):
+    """
+    Per-pollutant MSE and MAE on the original scale, accumulated batch by batch.
+    """
+    squared = np.zeros(len(TARGETS))
+    absolute = np.zeros(len(TARGETS))
+    count = 0
+    for X, y in dataset:
+        y_true = target_scaler.inverse_transform(y.numpy())
+        y_pred = target_scaler.inverse_transform(model.predict_on_batch(X))
+        squared += ((y_true - y_pred) ** 2).sum(axis=0)
+        absolute += np.abs(y_true - y_pred).sum(axis=0)
+        count += len(y_true)
+    if count == 0:
+        return {}
+    return {target: {'mse': squared[i] / count, 'mae': absolute[i] / count} for i, target in enumerate(TARGETS)}
+
+def train(model, dataset, epochs):
+    early_stop = EarlyStopping(monitor='loss', patience=5, restore_best_weights=True)
+    reduce_lr = ReduceLROnPlateau(monitor='loss', factor=0.1, patience=3, verbose=1)
+    model.fit(dataset, epochs=epochs, callbacks=[early_stop, reduce_lr], verbose=1)
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the LSTM on the partitioned history without loading it all into memory.')
+    parser.add_argument('--epochs', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=32)
+    parser.add_argument('--learning-rate', type=float, default=0.001)
+    parser.add_argument('--units', type=int, default=128)
+    parser.add_argument('--dropout', type=float, default=0.2)
+    parser.add_argument('--features-dir', nargs='?', const=FEATURES_DIR,
+                        help='Train on the `features` stage arrays and scalers (DVC pipeline) instead of streaming the history.')
+    parser.add_argument('--feature-store', action='store_true',
+                        help='Train on the memory-mapped feature store written by the collectors.')
+    parser.add_argument('--train-ratio', type=float, default=0.8, help='Share of the time range used for training.')
+    parser.add_argument('--block-days', type=int, default=BLOCK_DAYS, help='Days of history read at a time.')
+    parser.add_argument('--shuffle-buffer', type=int, default=4096, help='Windows held for shuffling.')
+    parser.add_argument('--locations', nargs='*', help='Locations to train on (default: all with history).')
+    args = parser.parse_args()
+
+    model = build_lstm_model((SEQ_LENGTH, len(FEATURES)), len(TARGETS), args.units, args.dropout, args.learning_rate)
+    os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
+
+    if args.features_dir:
+        # Scalers and the split come from the features stage; evaluation is its own stage
+        feature_scaler, target_scaler = joblib.load(FEATURE_SCALER_PATH), joblib.load(TARGET_SCALER_PATH)
+        train_ds = make_feature_dataset(args.features_dir, 'train', feature_scaler, target_scaler, True, args.batch_size)
+        train(model, train_ds, args.epochs)
+        model.save(MODEL_PATH)
+        print(f'Model saved to {MODEL_PATH}')
+        return
+
+    if args.feature_store:
+        stores = [store for store in load_store_windows(args.locations) if len(store[4])]
+        if not stores:
+            raise SystemExit('No windows in the feature store. Run the collectors or scripts/feature_store.py first.')
+        print(f'Training on the feature store of {len(stores)} locations: {", ".join(store[0] for store in stores)}')
+        feature_scaler, target_scaler, train_ds, test_ds = store_datasets(stores, args.train_ratio, args.batch_size)
+    else:
+        locations = args.locations or training_locations()
+        if not locations:
+            raise SystemExit('No historical data found. Run the collectors or scripts/backfill.py first.')
+        print(f'Training on {len(locations)} locations: {", ".join(locations)}')
+
+        feature_scaler, target_scaler, row_filter, (first_epoch, last_epoch) = fit_scalers(locations, args.block_days)
+        if first_epoch is None:
+            raise SystemExit('No rows left after removing outliers.')
+        split_epoch = first_epoch + args.train_ratio * (last_epoch - first_epoch)
+
+        dataset_args = dict(batch_size=args.batch_size, block_days=args.block_days, shuffle_buffer=args.shuffle_buffer)
+        train_ds = make_dataset(locations, feature_scaler, target_scaler, row_filter, split_epoch, True, **dataset_args)
+        test_ds = make_dataset(locations, feature_scaler, target_scaler, row_filter, split_epoch, False, **dataset_args)
+    train(model, train_ds, args.epochs)
+
+    for target, metrics in evaluate(model, test_ds, target_scaler).items():
+        print(f"Pollutant {target} - MSE: {metrics['mse']:.4f}, MAE: {metrics['mae']:.4f}")
+
+    model.save(MODEL_PATH)
+    joblib.dump(feature_scaler, FEATURE_SCALER_PATH)
+    joblib.dump(target_scaler, TARGET_SCALER_PATH)
+    print(f'Model saved to {MODEL_PATH}, scalers to {FEATURE_SCALER_PATH} and {TARGET_SCALER_PATH}')
+
+if __name__ == '__main__':
+    main()